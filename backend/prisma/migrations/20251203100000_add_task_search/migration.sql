@@ -0,0 +1,17 @@
+-- Extension trigramme pour la recherche approximative
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- AlterTable: vecteur plein texte généré (titre poids A, description poids B, français + anglais)
+ALTER TABLE "tasks" ADD COLUMN IF NOT EXISTS "search_vector" tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('french', coalesce("title", '')), 'A') ||
+        setweight(to_tsvector('english', coalesce("title", '')), 'A') ||
+        setweight(to_tsvector('french', coalesce("description", '')), 'B') ||
+        setweight(to_tsvector('english', coalesce("description", '')), 'B')
+    ) STORED;
+
+-- CreateIndex
+CREATE INDEX IF NOT EXISTS "tasks_search_vector_idx" ON "tasks" USING GIN ("search_vector");
+
+-- CreateIndex: trigrammes sur le titre (similarité et ILIKE)
+CREATE INDEX IF NOT EXISTS "tasks_title_trgm_idx" ON "tasks" USING GIN ("title" gin_trgm_ops);
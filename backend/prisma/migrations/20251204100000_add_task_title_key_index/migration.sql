@@ -0,0 +1,2 @@
+-- CreateIndex: titre normalisé par utilisateur (détection des doublons à l'import)
+CREATE INDEX IF NOT EXISTS "tasks_user_id_title_key_idx" ON "tasks" ("user_id", lower(btrim("title")));
@@ -0,0 +1,173 @@
+-- CreateTable: compteurs de tâches par utilisateur
+CREATE TABLE "user_task_stats" (
+    "user_id" TEXT NOT NULL,
+    "total" INTEGER NOT NULL DEFAULT 0,
+    "active" INTEGER NOT NULL DEFAULT 0,
+    "completed" INTEGER NOT NULL DEFAULT 0,
+    "updated_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "user_task_stats_pkey" PRIMARY KEY ("user_id")
+);
+
+-- CreateTable: activité quotidienne par utilisateur (jour UTC)
+CREATE TABLE "task_daily_stats" (
+    "day" DATE NOT NULL,
+    "user_id" TEXT NOT NULL,
+    "created" INTEGER NOT NULL DEFAULT 0,
+    "completed" INTEGER NOT NULL DEFAULT 0,
+    "deleted" INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT "task_daily_stats_pkey" PRIMARY KEY ("day", "user_id")
+);
+
+-- CreateIndex
+CREATE INDEX "user_task_stats_total_idx" ON "user_task_stats"("total" DESC);
+
+-- CreateIndex
+CREATE INDEX "task_daily_stats_user_id_idx" ON "task_daily_stats"("user_id");
+
+-- AddForeignKey
+ALTER TABLE "user_task_stats" ADD CONSTRAINT "user_task_stats_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "task_daily_stats" ADD CONSTRAINT "task_daily_stats_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- Triggers par instruction (tables de transition) : un createMany de N lignes
+-- ne produit qu'une mise à jour par utilisateur et par jour.
+-- Les lignes d'un utilisateur en cours de suppression (cascade) sont ignorées.
+
+CREATE OR REPLACE FUNCTION "task_stats_after_insert"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO "user_task_stats" ("user_id", "total", "active", "completed", "updated_at")
+    SELECT n."user_id",
+           count(*),
+           count(*) FILTER (WHERE n."status" = 'active'),
+           count(*) FILTER (WHERE n."status" = 'completed'),
+           CURRENT_TIMESTAMP
+    FROM new_rows n
+    GROUP BY n."user_id"
+    ON CONFLICT ("user_id") DO UPDATE SET
+        "total" = "user_task_stats"."total" + EXCLUDED."total",
+        "active" = "user_task_stats"."active" + EXCLUDED."active",
+        "completed" = "user_task_stats"."completed" + EXCLUDED."completed",
+        "updated_at" = EXCLUDED."updated_at";
+
+    INSERT INTO "task_daily_stats" ("day", "user_id", "created")
+    SELECT n."created_at"::date, n."user_id", count(*)
+    FROM new_rows n
+    GROUP BY 1, 2
+    ON CONFLICT ("day", "user_id") DO UPDATE SET
+        "created" = "task_daily_stats"."created" + EXCLUDED."created";
+
+    INSERT INTO "task_daily_stats" ("day", "user_id", "completed")
+    SELECT n."completed_at"::date, n."user_id", count(*)
+    FROM new_rows n
+    WHERE n."completed_at" IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT ("day", "user_id") DO UPDATE SET
+        "completed" = "task_daily_stats"."completed" + EXCLUDED."completed";
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION "task_stats_after_update"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO "user_task_stats" ("user_id", "total", "active", "completed", "updated_at")
+    SELECT d."user_id", d."total", d."active", d."completed", CURRENT_TIMESTAMP
+    FROM (
+        SELECT x."user_id", sum(x."total") AS "total", sum(x."active") AS "active", sum(x."completed") AS "completed"
+        FROM (
+            SELECT n."user_id", 1 AS "total",
+                   (n."status" = 'active')::int AS "active",
+                   (n."status" = 'completed')::int AS "completed"
+            FROM new_rows n
+            UNION ALL
+            SELECT o."user_id", -1,
+                   -(o."status" = 'active')::int,
+                   -(o."status" = 'completed')::int
+            FROM old_rows o
+        ) x
+        GROUP BY x."user_id"
+    ) d
+    WHERE (d."total" <> 0 OR d."active" <> 0 OR d."completed" <> 0)
+      AND EXISTS (SELECT 1 FROM "users" u WHERE u."id" = d."user_id")
+    ON CONFLICT ("user_id") DO UPDATE SET
+        "total" = "user_task_stats"."total" + EXCLUDED."total",
+        "active" = "user_task_stats"."active" + EXCLUDED."active",
+        "completed" = "user_task_stats"."completed" + EXCLUDED."completed",
+        "updated_at" = EXCLUDED."updated_at";
+
+    INSERT INTO "task_daily_stats" ("day", "user_id", "completed")
+    SELECT n."completed_at"::date, n."user_id", count(*)
+    FROM new_rows n
+    JOIN old_rows o ON o."id" = n."id"
+    WHERE n."completed_at" IS NOT NULL
+      AND o."completed_at" IS DISTINCT FROM n."completed_at"
+    GROUP BY 1, 2
+    ON CONFLICT ("day", "user_id") DO UPDATE SET
+        "completed" = "task_daily_stats"."completed" + EXCLUDED."completed";
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION "task_stats_after_delete"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE "user_task_stats" s SET
+        "total" = s."total" - d."total",
+        "active" = s."active" - d."active",
+        "completed" = s."completed" - d."completed",
+        "updated_at" = CURRENT_TIMESTAMP
+    FROM (
+        SELECT o."user_id",
+               count(*) AS "total",
+               count(*) FILTER (WHERE o."status" = 'active') AS "active",
+               count(*) FILTER (WHERE o."status" = 'completed') AS "completed"
+        FROM old_rows o
+        GROUP BY o."user_id"
+    ) d
+    WHERE s."user_id" = d."user_id";
+
+    INSERT INTO "task_daily_stats" ("day", "user_id", "deleted")
+    SELECT (now() AT TIME ZONE 'UTC')::date, o."user_id", count(*)
+    FROM old_rows o
+    WHERE EXISTS (SELECT 1 FROM "users" u WHERE u."id" = o."user_id")
+    GROUP BY 2
+    ON CONFLICT ("day", "user_id") DO UPDATE SET
+        "deleted" = "task_daily_stats"."deleted" + EXCLUDED."deleted";
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER "tasks_stats_insert" AFTER INSERT ON "tasks"
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_stats_after_insert"();
+
+CREATE TRIGGER "tasks_stats_update" AFTER UPDATE ON "tasks"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_stats_after_update"();
+
+CREATE TRIGGER "tasks_stats_delete" AFTER DELETE ON "tasks"
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_stats_after_delete"();
+
+-- Initialisation à partir des données existantes
+INSERT INTO "user_task_stats" ("user_id", "total", "active", "completed")
+SELECT u."id",
+       count(t."id"),
+       count(t."id") FILTER (WHERE t."status" = 'active'),
+       count(t."id") FILTER (WHERE t."status" = 'completed')
+FROM "users" u
+LEFT JOIN "tasks" t ON t."user_id" = u."id"
+GROUP BY u."id";
+
+INSERT INTO "task_daily_stats" ("day", "user_id", "created", "completed")
+SELECT x."day", x."user_id", sum(x."created"), sum(x."completed")
+FROM (
+    SELECT t."created_at"::date AS "day", t."user_id", 1 AS "created", 0 AS "completed" FROM "tasks" t
+    UNION ALL
+    SELECT t."completed_at"::date, t."user_id", 0, 1 FROM "tasks" t WHERE t."completed_at" IS NOT NULL
+) x
+GROUP BY x."day", x."user_id";
@@ -0,0 +1,57 @@
+-- AlterTable: version de synchronisation = identifiant (xid8) de la dernière transaction
+-- ayant écrit la tâche, posé par trigger. Une transaction encore en cours a toujours un
+-- identifiant >= pg_snapshot_xmin(pg_current_snapshot()) : ce minimum sert de point de reprise.
+ALTER TABLE "tasks" ADD COLUMN "sync_version" BIGINT DEFAULT 0;
+
+-- CreateTable: tâches supprimées, pour la synchronisation incrémentale
+CREATE TABLE "task_tombstones" (
+    "task_id" TEXT NOT NULL,
+    "user_id" TEXT NOT NULL,
+    "sync_version" BIGINT NOT NULL,
+    "deleted_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "task_tombstones_pkey" PRIMARY KEY ("task_id")
+);
+
+-- CreateIndex
+CREATE INDEX "tasks_user_id_sync_version_idx" ON "tasks"("user_id", "sync_version");
+
+-- CreateIndex
+CREATE INDEX "task_tombstones_user_id_sync_version_idx" ON "task_tombstones"("user_id", "sync_version");
+
+-- CreateIndex
+CREATE INDEX "task_tombstones_deleted_at_idx" ON "task_tombstones"("deleted_at");
+
+-- AddForeignKey
+ALTER TABLE "task_tombstones" ADD CONSTRAINT "task_tombstones_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+CREATE OR REPLACE FUNCTION "task_sync_set_version"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW."sync_version" := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$;
+
+-- Les tâches d'un utilisateur en cours de suppression (cascade) ne laissent pas de trace.
+CREATE OR REPLACE FUNCTION "task_sync_after_delete"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO "task_tombstones" ("task_id", "user_id", "sync_version", "deleted_at")
+    SELECT o."id", o."user_id", pg_current_xact_id()::text::bigint, CURRENT_TIMESTAMP
+    FROM old_rows o
+    WHERE EXISTS (SELECT 1 FROM "users" u WHERE u."id" = o."user_id")
+    ON CONFLICT ("task_id") DO UPDATE SET
+        "sync_version" = EXCLUDED."sync_version",
+        "deleted_at" = EXCLUDED."deleted_at";
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER "tasks_sync_version"
+    BEFORE INSERT OR UPDATE ON "tasks"
+    FOR EACH ROW EXECUTE FUNCTION "task_sync_set_version"();
+
+CREATE TRIGGER "tasks_sync_delete"
+    AFTER DELETE ON "tasks"
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_sync_after_delete"();
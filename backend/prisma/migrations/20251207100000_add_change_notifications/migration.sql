@@ -0,0 +1,118 @@
+-- Notifications de changement (canal task_changes) pour le flux SSE /api/v1/events.
+-- Triggers par instruction : un createMany de N lignes produit une notification par owner,
+-- envoyée par PostgreSQL au COMMIT (rien n'est publié si la transaction est annulée).
+-- Au-delà de 40 éléments, la notification ne porte que le nombre (payload limité à 8000 octets).
+
+CREATE OR REPLACE FUNCTION "change_stream_publish"("entity" TEXT, "action" TEXT, "changes" JSONB) RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT x."owner_id", count(*) AS "n", jsonb_agg(x."item") FILTER (WHERE x."rn" <= 40) AS "items"
+        FROM (
+            SELECT c->>'o' AS "owner_id",
+                   c - 'o' AS "item",
+                   row_number() OVER (PARTITION BY c->>'o') AS "rn"
+            FROM jsonb_array_elements("changes") c
+        ) x
+        GROUP BY x."owner_id"
+    LOOP
+        PERFORM pg_notify('task_changes', jsonb_build_object(
+            'o', r."owner_id",
+            'e', "entity",
+            'a', "action",
+            'n', r."n",
+            'i', CASE WHEN r."n" <= 40 THEN r."items" END
+        )::text);
+    END LOOP;
+END;
+$$;
+
+-- Tâches : i = id, c = catégorie, p = catégorie précédente (déplacement)
+CREATE OR REPLACE FUNCTION "task_changes_after_insert"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM "change_stream_publish"('task', 'created', (
+        SELECT jsonb_agg(jsonb_build_object('o', n."user_id", 'i', n."id", 'c', n."category_id"))
+        FROM new_rows n
+    ));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION "task_changes_after_update"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM "change_stream_publish"('task', 'updated', (
+        SELECT jsonb_agg(jsonb_strip_nulls(jsonb_build_object(
+            'o', n."user_id",
+            'i', n."id",
+            'c', n."category_id",
+            'p', CASE WHEN o."category_id" IS DISTINCT FROM n."category_id" THEN o."category_id" END
+        )))
+        FROM new_rows n
+        JOIN old_rows o ON o."id" = n."id"
+    ));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION "task_changes_after_delete"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM "change_stream_publish"('task', 'deleted', (
+        SELECT jsonb_agg(jsonb_build_object('o', o."user_id", 'i', o."id", 'c', o."category_id"))
+        FROM old_rows o
+    ));
+    RETURN NULL;
+END;
+$$;
+
+-- Catégories : i = id
+CREATE OR REPLACE FUNCTION "category_changes_after_insert"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM "change_stream_publish"('category', 'created', (
+        SELECT jsonb_agg(jsonb_build_object('o', n."user_id", 'i', n."id")) FROM new_rows n
+    ));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION "category_changes_after_update"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM "change_stream_publish"('category', 'updated', (
+        SELECT jsonb_agg(jsonb_build_object('o', n."user_id", 'i', n."id")) FROM new_rows n
+    ));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION "category_changes_after_delete"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM "change_stream_publish"('category', 'deleted', (
+        SELECT jsonb_agg(jsonb_build_object('o', o."user_id", 'i', o."id")) FROM old_rows o
+    ));
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER "tasks_changes_insert" AFTER INSERT ON "tasks"
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_changes_after_insert"();
+
+CREATE TRIGGER "tasks_changes_update" AFTER UPDATE ON "tasks"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_changes_after_update"();
+
+CREATE TRIGGER "tasks_changes_delete" AFTER DELETE ON "tasks"
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "task_changes_after_delete"();
+
+CREATE TRIGGER "categories_changes_insert" AFTER INSERT ON "categories"
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "category_changes_after_insert"();
+
+CREATE TRIGGER "categories_changes_update" AFTER UPDATE ON "categories"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "category_changes_after_update"();
+
+CREATE TRIGGER "categories_changes_delete" AFTER DELETE ON "categories"
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "category_changes_after_delete"();
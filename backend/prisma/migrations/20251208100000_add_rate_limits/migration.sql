@@ -0,0 +1,14 @@
+-- CreateTable: compteurs du rate limiting partagés entre les workers (mode cluster).
+-- UNLOGGED : pas de WAL, la table est vidée après un crash de PostgreSQL, ce qui
+-- revient à remettre les fenêtres à zéro.
+CREATE UNLOGGED TABLE "rate_limits" (
+    "key" TEXT NOT NULL,
+    "hits" INTEGER NOT NULL DEFAULT 0,
+    -- Fin de la fenêtre courante, en millisecondes depuis l'epoch (horloge des workers)
+    "reset_at" BIGINT NOT NULL,
+
+    CONSTRAINT "rate_limits_pkey" PRIMARY KEY ("key")
+);
+
+-- CreateIndex
+CREATE INDEX "rate_limits_reset_at_idx" ON "rate_limits"("reset_at");
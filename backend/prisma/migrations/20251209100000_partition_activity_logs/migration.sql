@@ -0,0 +1,120 @@
+-- Journal d'activité partitionné par mois sur created_at :
+-- - les lectures bornées dans le temps ne parcourent que les partitions concernées
+-- - la rétention supprime une partition entière (voir services/activityLogRetention)
+-- - details passe de TEXT (JSON sérialisé) à JSONB
+
+-- Ancienne table, recopiée puis supprimée en fin de migration
+ALTER TABLE "activity_logs" RENAME TO "activity_logs_legacy";
+ALTER TABLE "activity_logs_legacy" RENAME CONSTRAINT "activity_logs_pkey" TO "activity_logs_legacy_pkey";
+DROP INDEX IF EXISTS "activity_logs_owner_id_idx";
+DROP INDEX IF EXISTS "activity_logs_actor_id_idx";
+DROP INDEX IF EXISTS "activity_logs_created_at_idx";
+DROP INDEX IF EXISTS "activity_logs_owner_id_created_at_idx";
+DROP INDEX IF EXISTS "activity_logs_target_owner_id_idx";
+
+-- CreateTable: la clé de partitionnement fait partie de la clé primaire
+CREATE TABLE "activity_logs" (
+    "id" TEXT NOT NULL,
+    "owner_id" TEXT NOT NULL,
+    "actor_id" TEXT NOT NULL,
+    "target_owner_id" TEXT,
+    "action" TEXT NOT NULL,
+    "entity_type" TEXT NOT NULL,
+    "entity_id" TEXT,
+    "entity_title" TEXT NOT NULL,
+    "details" JSONB,
+    "created_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "activity_logs_pkey" PRIMARY KEY ("id", "created_at")
+) PARTITION BY RANGE ("created_at");
+
+-- Lignes hors des partitions mensuelles (rapatriées à la création de la partition du mois)
+CREATE TABLE "activity_logs_default" PARTITION OF "activity_logs" DEFAULT;
+
+-- CreateIndex (créés sur chaque partition)
+CREATE INDEX "activity_logs_owner_id_created_at_idx" ON "activity_logs"("owner_id", "created_at");
+
+-- CreateIndex
+CREATE INDEX "activity_logs_actor_id_idx" ON "activity_logs"("actor_id");
+
+-- CreateIndex
+CREATE INDEX "activity_logs_target_owner_id_idx" ON "activity_logs"("target_owner_id");
+
+-- AddForeignKey
+ALTER TABLE "activity_logs" ADD CONSTRAINT "activity_logs_owner_id_fkey" FOREIGN KEY ("owner_id") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "activity_logs" ADD CONSTRAINT "activity_logs_actor_id_fkey" FOREIGN KEY ("actor_id") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "activity_logs" ADD CONSTRAINT "activity_logs_target_owner_id_fkey" FOREIGN KEY ("target_owner_id") REFERENCES "users"("id") ON DELETE SET NULL ON UPDATE CASCADE;
+
+-- Crée la partition du mois contenant "month" (activity_logs_pAAAAMM) si elle n'existe pas.
+-- Les lignes de ce mois tombées dans la partition par défaut y sont déplacées.
+CREATE OR REPLACE FUNCTION "activity_logs_create_partition"("month" TIMESTAMP) RETURNS BOOLEAN LANGUAGE plpgsql AS $$
+DECLARE
+    range_start TIMESTAMP := date_trunc('month', "month");
+    range_end TIMESTAMP := date_trunc('month', "month") + INTERVAL '1 month';
+    partition_name TEXT := 'activity_logs_p' || to_char(date_trunc('month', "month"), 'YYYYMM');
+BEGIN
+    -- Un seul créateur à la fois (plusieurs workers)
+    PERFORM pg_advisory_xact_lock(hashtext('activity_logs_partitions'));
+
+    IF to_regclass(quote_ident(partition_name)) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE "activity_logs" INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM "activity_logs_default" WHERE "created_at" >= %L AND "created_at" < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+        range_start, range_end, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE "activity_logs" ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, range_start, range_end
+    );
+    RETURN TRUE;
+END;
+$$;
+
+-- Crée les partitions du mois de "from_month" au mois courant + "months_ahead"
+CREATE OR REPLACE FUNCTION "activity_logs_ensure_partitions"("from_month" TIMESTAMP, "months_ahead" INTEGER) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    current_month TIMESTAMP := date_trunc('month', "from_month");
+    last_month TIMESTAMP := date_trunc('month', now()::timestamp) + make_interval(months => "months_ahead");
+    created INTEGER := 0;
+BEGIN
+    WHILE current_month <= last_month LOOP
+        IF "activity_logs_create_partition"(current_month) THEN
+            created := created + 1;
+        END IF;
+        current_month := current_month + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- Partitions des mois déjà journalisés, du mois courant et des deux suivants
+SELECT "activity_logs_ensure_partitions"(
+    COALESCE((SELECT min("created_at") FROM "activity_logs_legacy"), now()::timestamp),
+    2
+);
+
+-- details : JSON sérialisé -> JSONB (une valeur illisible est conservée comme chaîne JSON)
+CREATE OR REPLACE FUNCTION "activity_logs_details_to_jsonb"("details" TEXT) RETURNS JSONB LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    RETURN "details"::jsonb;
+EXCEPTION WHEN others THEN
+    RETURN to_jsonb("details");
+END;
+$$;
+
+INSERT INTO "activity_logs" ("id", "owner_id", "actor_id", "target_owner_id", "action", "entity_type", "entity_id", "entity_title", "details", "created_at")
+SELECT "id", "owner_id", "actor_id", "target_owner_id", "action", "entity_type", "entity_id", "entity_title",
+       "activity_logs_details_to_jsonb"("details"), "created_at"
+FROM "activity_logs_legacy";
+
+DROP FUNCTION "activity_logs_details_to_jsonb"(TEXT);
+
+-- DropTable
+DROP TABLE "activity_logs_legacy";
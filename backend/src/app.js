@@ -0,0 +1,114 @@
+const express = require('express');
+const cors = require('cors');
+const helmet = require('helmet');
+const rateLimit = require('express-rate-limit');
+const cluster = require('cluster');
+
+const authRoutes = require('./routes/auth.routes');
+const tasksRoutes = require('./routes/tasks.routes');
+const categoriesRoutes = require('./routes/categories.routes');
+const adminRoutes = require('./routes/admin.routes');
+const delegationRoutes = require('./routes/delegation.routes');
+const activityRoutes = require('./routes/activity.routes');
+const tokensRoutes = require('./routes/tokens.routes');
+const eventsRoutes = require('./routes/events.routes');
+const { setupMcpRoutes } = require('./mcp/server');
+const { getMcpSessionStats } = require('./mcp/sessionManager');
+const errorHandler = require('./middleware/errorHandler');
+const { requestMetrics, metricsHandler } = require('./middleware/metrics');
+const { getAuthCacheStats } = require('./services/authCache');
+const { getDelegationCacheStats } = require('./services/delegationResolver');
+const { getActivityLogStats } = require('./services/activityLog');
+const { getChangeStreamStats } = require('./services/changeStream');
+const { createRateLimitStore } = require('./services/rateLimitStore');
+const { registerCollector, gaugesFromStats } = require('./services/metrics');
+
+const app = express();
+
+// Requêtes par IP et par fenêtre de 15 minutes (à relever pour les bancs de charge, voir benchmark.py)
+const RATE_LIMIT_MAX = parseInt(process.env.RATE_LIMIT_MAX || '100', 10);
+
+// Trust proxy (required when behind nginx/reverse proxy)
+// En mode cluster, le processus principal ajoute un saut de proxy devant chaque worker
+app.set('trust proxy', cluster.isWorker ? 2 : 1);
+
+// Security middleware
+app.use(helmet());
+app.use(cors({
+  origin: process.env.FRONTEND_URL || '*',
+  credentials: true
+}));
+
+// Métriques : durée par route et requêtes en cours ; /metrics hors rate limiting (scraping)
+app.use(requestMetrics);
+app.get('/metrics', metricsHandler);
+
+// Compteurs de /health exposés aussi sur /metrics
+registerCollector(() => [
+  ...gaugesFromStats('taskmanager_auth_cache', getAuthCacheStats(), 'Cache d\'authentification (voir /health)'),
+  ...gaugesFromStats('taskmanager_delegation_cache', getDelegationCacheStats(), 'Cache des délégations (voir /health)'),
+  ...gaugesFromStats('taskmanager_activity_log', getActivityLogStats(), 'Writer du journal d\'activité (voir /health)'),
+  ...gaugesFromStats('taskmanager_mcp_sessions', getMcpSessionStats(), 'Sessions MCP (voir /health)'),
+  ...gaugesFromStats('taskmanager_change_stream', getChangeStreamStats(), 'Flux de changements (voir /health)')
+]);
+
+// Rate limiting
+const limiter = rateLimit({
+  windowMs: 15 * 60 * 1000, // 15 minutes
+  max: RATE_LIMIT_MAX, // limit each IP to RATE_LIMIT_MAX requests per windowMs
+  message: { error: 'Trop de requêtes, veuillez réessayer plus tard.' },
+  // Compteurs partagés entre workers (voir RATE_LIMIT_STORE)
+  store: createRateLimitStore('rl:api:'),
+  // Choix délibéré : store indisponible = laisser passer plutôt que bloquer toute l'API.
+  // Le limiteur de connexion (routes/auth) reste fermé en cas d'erreur du store.
+  passOnStoreError: true
+});
+app.use(limiter);
+
+// MCP Server routes (SSE) - AVANT le body parser pour que le stream reste lisible
+setupMcpRoutes(app);
+
+// Body parser (après MCP pour ne pas consommer le body)
+// Les imports en streaming lisent eux-mêmes le corps brut de la requête
+const isStreamingImport = (req) => req.path.includes('/import/stream/');
+app.use(express.json({ type: (req) => Boolean(req.is('application/json')) && !isStreamingImport(req) }));
+app.use(express.urlencoded({ extended: true }));
+
+// Health check
+app.get('/health', (req, res) => {
+  res.json({
+    status: 'ok',
+    timestamp: new Date().toISOString(),
+    caches: {
+      auth: getAuthCacheStats(),
+      delegations: getDelegationCacheStats()
+    },
+    activityLog: getActivityLogStats(),
+    mcpSessions: getMcpSessionStats(),
+    changeStream: getChangeStreamStats(),
+    process: {
+      pid: process.pid,
+      worker: cluster.isWorker ? cluster.worker.id : null
+    }
+  });
+});
+
+// Routes
+app.use('/api/v1/auth', authRoutes);
+app.use('/api/v1/tasks', tasksRoutes);
+app.use('/api/v1/categories', categoriesRoutes);
+app.use('/api/v1/admin', adminRoutes);
+app.use('/api/v1/delegations', delegationRoutes);
+app.use('/api/v1/activity', activityRoutes);
+app.use('/api/v1/tokens', tokensRoutes);
+app.use('/api/v1/events', eventsRoutes);
+
+// 404 handler
+app.use((req, res) => {
+  res.status(404).json({ error: 'Route non trouvée' });
+});
+
+// Error handler
+app.use(errorHandler);
+
+module.exports = app;
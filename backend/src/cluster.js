@@ -0,0 +1,351 @@
+const cluster = require('cluster');
+const http = require('http');
+const os = require('os');
+const {
+  METRICS_ENABLED,
+  collectMetrics,
+  renderMetrics,
+  withLabel,
+  isMetricsRequestAuthorized
+} = require('./services/metrics');
+const { SharedState } = require('./services/clusterState');
+const { MCP_MAX_SESSIONS_PER_USER, MCP_MAX_SESSIONS_PER_TOKEN } = require('./mcp/sessionManager');
+
+const PORT = process.env.PORT || 3000;
+
+// Nombre de workers : 1 (défaut, pas de cluster), un entier, ou "auto" (un par cœur disponible)
+const parseWorkerCount = (value) => {
+  if (!value) return 1;
+  if (value === 'auto') return os.availableParallelism ? os.availableParallelism() : os.cpus().length;
+  return Math.max(parseInt(value, 10) || 1, 1);
+};
+
+const CLUSTER_WORKERS = parseWorkerCount(process.env.CLUSTER_WORKERS);
+// Délai laissé aux requêtes en cours et aux écritures différées avant un arrêt forcé
+const SHUTDOWN_TIMEOUT_MS = parseInt(process.env.SHUTDOWN_TIMEOUT_MS || '10000', 10);
+const RESPAWN_DELAY_MS = 1000;
+
+// En-têtes propres à une connexion, non retransmis
+const HOP_BY_HOP_HEADERS = ['connection', 'keep-alive', 'proxy-connection', 'upgrade', 'te', 'trailer'];
+
+// Au-delà, le sessionId n'est plus cherché dans le début du flux SSE
+const SSE_SNIFF_MAX_BYTES = 4096;
+
+// Attente maximale des métriques des workers pour GET /metrics
+const METRICS_GATHER_TIMEOUT_MS = 2000;
+
+// Attente maximale des accusés de réception d'une diffusion (broadcastAndWait)
+const BROADCAST_ACK_TIMEOUT_MS = 2000;
+
+/**
+ * Processus principal : démarre les workers et leur transmet les requêtes reçues sur PORT.
+ * Les requêtes d'une session MCP (en-tête mcp-session-id, ou ?sessionId= de /mcp/messages)
+ * vont au worker qui la détient ; les autres sont réparties à tour de rôle.
+ * L'état qui doit valoir pour tout le cluster (plafonds de flux et de sessions, import en cours
+ * et sa progression) est tenu ici et consulté par IPC (voir services/clusterState).
+ */
+const runPrimary = () => {
+  // workerId -> { id, port } des workers prêts
+  const ready = new Map();
+  // sessionId MCP -> { workerId, userId, tokenId, lastActivityAt }
+  const sessions = new Map();
+  const sharedState = new SharedState();
+  // ackId -> diffusion en attente des accusés de réception des workers
+  const pendingBroadcasts = new Map();
+  let broadcastAckId = 0;
+  const agent = new http.Agent({ keepAlive: true });
+  // requestId -> collecte des métriques en cours
+  const pendingMetrics = new Map();
+  let metricsRequestId = 0;
+  let nextWorker = 0;
+  let started = false;
+  let shuttingDown = false;
+
+  const forkWorker = () => {
+    const worker = cluster.fork();
+    worker.on('message', (message) => onWorkerMessage(worker, message));
+  };
+
+  const ownSession = (sessionId, workerId, info) => {
+    const session = sessions.get(sessionId) || { userId: null, tokenId: null, lastActivityAt: Date.now() };
+    sessions.set(sessionId, { ...session, ...info, workerId });
+  };
+
+  // Plafonds MCP sur tout le cluster (chaque worker les applique aussi à ses propres sessions) :
+  // les sessions les moins récemment utilisées sont fermées par le worker qui les détient
+  const enforceSessionLimit = (sessionId, matches, max) => {
+    if (max <= 0) return;
+
+    const owned = [...sessions].filter(([id, session]) => id !== sessionId && matches(session));
+    if (owned.length < max) return;
+
+    owned
+      .sort(([, a], [, b]) => a.lastActivityAt - b.lastActivityAt)
+      .slice(0, owned.length - max + 1)
+      .forEach(([id, session]) => {
+        sessions.delete(id);
+        const owner = cluster.workers[session.workerId];
+        if (owner && owner.isConnected()) owner.send({ type: 'broadcast', event: 'mcp:evict', payload: id });
+      });
+  };
+
+  // Diffusion avec attente : le demandeur reçoit sa réponse quand les autres workers l'ont traitée
+  const relayAndWait = (origin, message, others) => {
+    const reply = () => {
+      if (origin.isConnected()) origin.send({ type: 'reply', requestId: message.requestId, payload: true });
+    };
+    if (others.length === 0) return reply();
+
+    const ackId = ++broadcastAckId;
+    const pending = {
+      waiting: new Set(others.map(other => other.id)),
+      finish: () => {
+        clearTimeout(timer);
+        pendingBroadcasts.delete(ackId);
+        reply();
+      }
+    };
+    // Un worker qui ne répond pas n'est pas attendu indéfiniment
+    const timer = setTimeout(pending.finish, BROADCAST_ACK_TIMEOUT_MS);
+    pendingBroadcasts.set(ackId, pending);
+
+    const relayed = { type: 'broadcast', event: message.event, payload: message.payload, ackId };
+    for (const other of others) other.send(relayed);
+  };
+
+  const onWorkerMessage = (worker, message) => {
+    if (!message || typeof message !== 'object') return;
+
+    switch (message.type) {
+      case 'listening':
+        if (shuttingDown) return;
+        ready.set(worker.id, { id: worker.id, port: message.port });
+        if (!started && ready.size === CLUSTER_WORKERS) {
+          started = true;
+          console.log(`🚀 Server running on port ${PORT} (${CLUSTER_WORKERS} workers)`);
+        }
+        break;
+      case 'mcp-session-opened': {
+        const { sessionId, userId, tokenId } = message;
+        ownSession(sessionId, worker.id, { userId, tokenId });
+        enforceSessionLimit(sessionId, session => session.userId === userId, MCP_MAX_SESSIONS_PER_USER);
+        if (tokenId) {
+          enforceSessionLimit(sessionId, session => session.tokenId === tokenId, MCP_MAX_SESSIONS_PER_TOKEN);
+        }
+        break;
+      }
+      case 'mcp-session-closed':
+        if (sessions.get(message.sessionId)?.workerId === worker.id) sessions.delete(message.sessionId);
+        break;
+      case 'metrics': {
+        const pending = pendingMetrics.get(message.requestId);
+        if (!pending) break;
+        pending.families.push(...withLabel(message.families, 'worker', String(worker.id)));
+        if (--pending.waiting === 0) pending.finish();
+        break;
+      }
+      case 'broadcast': {
+        // Invalidations de cache, files à écrire... : relayées aux autres workers
+        const others = Object.values(cluster.workers).filter(other => other.id !== worker.id && other.isConnected());
+        if (message.requestId) {
+          relayAndWait(worker, message, others);
+        } else {
+          for (const other of others) other.send(message);
+        }
+        break;
+      }
+      case 'broadcast-ack': {
+        const pending = pendingBroadcasts.get(message.ackId);
+        if (pending && pending.waiting.delete(worker.id) && pending.waiting.size === 0) pending.finish();
+        break;
+      }
+      default:
+        // Slots et valeurs partagés (services/clusterState)
+        sharedState.handle(worker, message);
+        break;
+    }
+  };
+
+  cluster.on('exit', (worker, code, signal) => {
+    ready.delete(worker.id);
+    for (const [sessionId, session] of sessions) {
+      if (session.workerId === worker.id) sessions.delete(sessionId);
+    }
+    sharedState.dropWorker(worker.id);
+    for (const pending of pendingBroadcasts.values()) {
+      if (pending.waiting.delete(worker.id) && pending.waiting.size === 0) pending.finish();
+    }
+
+    if (shuttingDown) {
+      if (Object.keys(cluster.workers).length === 0) process.exit(0);
+      return;
+    }
+
+    console.error(`Worker ${worker.process.pid} arrêté (${signal || code}), redémarrage...`);
+    setTimeout(forkWorker, RESPAWN_DELAY_MS);
+  });
+
+  const sessionIdOf = (req) => {
+    if (req.headers['mcp-session-id']) return req.headers['mcp-session-id'];
+    if (req.url.startsWith('/mcp/messages')) {
+      return new URL(req.url, 'http://localhost').searchParams.get('sessionId');
+    }
+    return null;
+  };
+
+  const pickWorker = (req) => {
+    const sessionId = sessionIdOf(req);
+    const session = sessionId && sessions.get(sessionId);
+    const owner = session && ready.get(session.workerId);
+    if (owner) {
+      session.lastActivityAt = Date.now();
+      return owner;
+    }
+
+    // Session inconnue : n'importe quel worker, qui répondra que la session n'existe pas
+    const workers = [...ready.values()];
+    if (workers.length === 0) return null;
+    nextWorker = (nextWorker + 1) % workers.length;
+    return workers[nextWorker];
+  };
+
+  const stripHopByHop = (headers) => {
+    const result = { ...headers };
+    for (const name of HOP_BY_HOP_HEADERS) delete result[name];
+    return result;
+  };
+
+  // Le worker annonce la session en tête du flux SSE (event: endpoint, .../mcp/messages?sessionId=...)
+  const learnSseSession = (proxyRes, workerId) => {
+    let head = '';
+    const onData = (chunk) => {
+      head += chunk.toString('latin1');
+      const match = /sessionId=([\w-]+)/.exec(head);
+      if (match) ownSession(match[1], workerId);
+      if (match || head.length > SSE_SNIFF_MAX_BYTES) proxyRes.off('data', onData);
+    };
+    proxyRes.on('data', onData);
+  };
+
+  // Métriques de tous les workers, chaque série étiquetée par worker
+  const gatherMetrics = () => new Promise((resolve) => {
+    const requestId = ++metricsRequestId;
+    const workers = [...ready.keys()].map(id => cluster.workers[id]).filter(w => w && w.isConnected());
+    const pending = {
+      families: withLabel(collectMetrics(), 'worker', 'primary'),
+      waiting: workers.length,
+      finish: () => {
+        clearTimeout(timer);
+        pendingMetrics.delete(requestId);
+        resolve(pending.families);
+      }
+    };
+    // Un worker qui ne répond pas est omis
+    const timer = setTimeout(pending.finish, METRICS_GATHER_TIMEOUT_MS);
+
+    if (workers.length === 0) return pending.finish();
+    pendingMetrics.set(requestId, pending);
+    for (const worker of workers) worker.send({ type: 'metrics-request', requestId });
+  });
+
+  const serveMetrics = async (req, res) => {
+    if (!isMetricsRequestAuthorized(req)) {
+      res.writeHead(401, { 'Content-Type': 'application/json' });
+      return res.end(JSON.stringify({ error: 'Token d\'authentification requis.' }));
+    }
+
+    const families = await gatherMetrics();
+    res.writeHead(200, { 'Content-Type': 'text/plain; version=0.0.4; charset=utf-8' });
+    res.end(renderMetrics(families));
+  };
+
+  const forward = (req, res) => {
+    if (METRICS_ENABLED && req.method === 'GET' && req.url.split('?')[0] === '/metrics') {
+      return serveMetrics(req, res);
+    }
+
+    const target = pickWorker(req);
+    if (!target) {
+      res.writeHead(503, { 'Content-Type': 'application/json', 'Retry-After': '1' });
+      return res.end(JSON.stringify({ error: 'Service temporairement indisponible.' }));
+    }
+
+    const headers = stripHopByHop(req.headers);
+    const clientIp = req.socket.remoteAddress;
+    headers['x-forwarded-for'] = headers['x-forwarded-for'] ? `${headers['x-forwarded-for']}, ${clientIp}` : clientIp;
+
+    const proxyReq = http.request({
+      host: '127.0.0.1',
+      port: target.port,
+      method: req.method,
+      path: req.url,
+      headers,
+      agent
+    }, (proxyRes) => {
+      // Session Streamable HTTP : connue avant que le client ne reçoive son identifiant
+      const sessionId = proxyRes.headers['mcp-session-id'];
+      if (sessionId) ownSession(sessionId, target.id);
+      if (req.method === 'GET' && req.url.startsWith('/mcp/sse') && proxyRes.statusCode === 200) {
+        learnSseSession(proxyRes, target.id);
+      }
+
+      res.writeHead(proxyRes.statusCode, stripHopByHop(proxyRes.headers));
+      proxyRes.pipe(res);
+    });
+
+    proxyReq.on('error', (error) => {
+      console.error(`Erreur proxy vers le worker ${target.id}:`, error.message);
+      if (!res.headersSent) {
+        res.writeHead(502, { 'Content-Type': 'application/json' });
+        res.end(JSON.stringify({ error: 'Erreur de communication avec le serveur.' }));
+      } else {
+        res.destroy();
+      }
+    });
+
+    // Client parti (ex. flux SSE fermé) : le worker doit le voir aussi
+    res.on('close', () => {
+      if (!res.writableFinished) proxyReq.destroy();
+    });
+
+    req.pipe(proxyReq);
+  };
+
+  const server = http.createServer(forward);
+
+  // Arrêt propre : plus de nouvelles requêtes, chaque worker termine les siennes puis s'arrête
+  const shutdown = (signal) => {
+    if (shuttingDown) return;
+    shuttingDown = true;
+    console.log(`${signal} reçu, arrêt du cluster...`);
+
+    server.close();
+    server.closeIdleConnections();
+    ready.clear();
+
+    const workers = Object.values(cluster.workers);
+    if (workers.length === 0) process.exit(0);
+    for (const worker of workers) {
+      if (worker.isConnected()) worker.send({ type: 'shutdown' });
+    }
+
+    const forceExit = setTimeout(() => {
+      console.error('Arrêt forcé des workers');
+      for (const worker of Object.values(cluster.workers)) worker.process.kill('SIGKILL');
+      process.exit(1);
+    }, SHUTDOWN_TIMEOUT_MS + RESPAWN_DELAY_MS);
+    forceExit.unref();
+  };
+
+  process.on('SIGTERM', () => shutdown('SIGTERM'));
+  process.on('SIGINT', () => shutdown('SIGINT'));
+
+  for (let i = 0; i < CLUSTER_WORKERS; i++) forkWorker();
+  server.listen(PORT);
+};
+
+module.exports = {
+  CLUSTER_WORKERS,
+  SHUTDOWN_TIMEOUT_MS,
+  runPrimary
+};
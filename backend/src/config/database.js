@@ -1,7 +1,29 @@
 const { PrismaClient } = require('@prisma/client');
+const { METRICS_ENABLED, SLOW_QUERY_MS, observeQuery } = require('../services/metrics');
 
-const prisma = new PrismaClient({
+const client = new PrismaClient({
   log: process.env.NODE_ENV === 'development' ? ['query', 'error', 'warn'] : ['error']
 });
 
+// Durée de chaque requête (modèles et requêtes brutes) : métriques /metrics et journal des requêtes lentes
+const prisma = METRICS_ENABLED || SLOW_QUERY_MS > 0
+  ? client.$extends({
+    query: {
+      async $allOperations ({ model, operation, args, query }) {
+        const start = process.hrtime.bigint();
+        let failed = false;
+        try {
+          return await query(args);
+        } catch (error) {
+          failed = true;
+          throw error;
+        } finally {
+          const durationMs = Number(process.hrtime.bigint() - start) / 1e6;
+          observeQuery({ model, operation, args, durationMs, failed });
+        }
+      }
+    }
+  })
+  : client;
+
 module.exports = prisma;
@@ -1,27 +1,80 @@
-const { PrismaClient } = require('@prisma/client');
+const prisma = require('../config/database');
+const { resolveDelegation } = require('../services/delegationResolver');
+const { keysetPaginate, andWhere, clampLimit, cursorPageMeta } = require('../utils/pagination');
+const { logActivity, flushAllActivityLogs } = require('../services/activityLog');
 
-const prisma = new PrismaClient();
+// Relations incluses dans chaque entrée du journal
+const userSummary = {
+  select: {
+    id: true,
+    username: true,
+    firstName: true,
+    lastName: true
+  }
+};
+
+const activityInclude = {
+  owner: userSummary,
+  actor: userSummary,
+  targetOwner: userSummary
+};
+
+// Tri keyset sur l'index (ownerId, createdAt)
+const ACTIVITY_SORT_KEYS = [
+  { field: 'createdAt', direction: 'desc', type: 'date' },
+  { field: 'id', direction: 'desc' }
+];
+
+const formatLog = (log, userId) => ({
+  id: log.id,
+  owner: log.owner,
+  actor: log.actor,
+  targetOwner: log.targetOwner,
+  action: log.action,
+  entityType: log.entityType,
+  entityId: log.entityId,
+  entityTitle: log.entityTitle,
+  details: log.details ?? null,
+  createdAt: log.createdAt,
+  isOwnAction: log.actorId === userId,
+  isForOther: log.targetOwnerId !== null
+});
+
+/**
+ * Fenêtre ?since= / ?until= (dates ISO) sur createdAt : seules les partitions mensuelles
+ * concernées sont lues
+ */
+const parseWindow = (since, until) => {
+  const window = {};
+  for (const [key, value] of [['gte', since], ['lt', until]]) {
+    if (!value) continue;
+    const date = new Date(value);
+    if (Number.isNaN(date.getTime())) {
+      throw Object.assign(new Error(`Date invalide: ${value}`), { status: 400 });
+    }
+    window[key] = date;
+  }
+  return Object.keys(window).length > 0 ? window : null;
+};
 
 // Récupérer le journal d'activité
 const getActivityLog = async (req, res) => {
   try {
     const userId = req.user.id;
-    const { ownerId, page = 1, limit = 50 } = req.query;
+    const { ownerId, page = 1, limit, cursor, pagination, count, since, until } = req.query;
+
+    // Écrire les entrées encore en file (tous les workers) pour que le journal soit à jour
+    await flushAllActivityLogs();
 
-    const skip = (parseInt(page) - 1) * parseInt(limit);
-    const take = parseInt(limit);
+    const take = clampLimit(limit);
+    const currentPage = Math.max(parseInt(page, 10) || 1, 1);
+    const skip = (currentPage - 1) * take;
 
     let whereClause = {};
 
     if (ownerId && ownerId !== userId) {
       // Voir le journal d'un owner qu'on gère
-      const delegation = await prisma.taskDelegation.findFirst({
-        where: {
-          ownerId,
-          delegateId: userId,
-          status: 'accepted'
-        }
-      });
+      const delegation = await resolveDelegation(userId, ownerId, req);
 
       if (!delegation) {
         return res.status(403).json({ error: 'Accès non autorisé.' });
@@ -32,35 +85,36 @@ const getActivityLog = async (req, res) => {
       whereClause.ownerId = userId;
     }
 
+    const createdAt = parseWindow(since, until);
+    if (createdAt) whereClause.createdAt = createdAt;
+
+    // Pagination par curseur : ?pagination=cursor puis ?cursor=nextCursor
+    if (pagination === 'cursor' || cursor) {
+      const keyset = keysetPaginate({ keys: ACTIVITY_SORT_KEYS, cursor, limit: take });
+
+      const [rows, total] = await Promise.all([
+        prisma.activityLog.findMany({
+          where: andWhere(whereClause, keyset.where),
+          include: activityInclude,
+          orderBy: keyset.orderBy,
+          take: keyset.take
+        }),
+        count === 'exact' ? prisma.activityLog.count({ where: whereClause }) : null
+      ]);
+
+      const { items, nextCursor } = keyset.page(rows);
+
+      // Mode curseur : mêmes métadonnées que les autres listes (nextCursor, limit, total?)
+      return res.json({
+        logs: items.map(log => formatLog(log, userId)),
+        ...cursorPageMeta({ nextCursor, limit: take, total })
+      });
+    }
+
     const [logs, total] = await Promise.all([
       prisma.activityLog.findMany({
         where: whereClause,
-        include: {
-          owner: {
-            select: {
-              id: true,
-              username: true,
-              firstName: true,
-              lastName: true
-            }
-          },
-          actor: {
-            select: {
-              id: true,
-              username: true,
-              firstName: true,
-              lastName: true
-            }
-          },
-          targetOwner: {
-            select: {
-              id: true,
-              username: true,
-              firstName: true,
-              lastName: true
-            }
-          }
-        },
+        include: activityInclude,
         orderBy: { createdAt: 'desc' },
         skip,
         take
@@ -69,48 +123,28 @@ const getActivityLog = async (req, res) => {
     ]);
 
     res.json({
-      logs: logs.map(log => ({
-        id: log.id,
-        owner: log.owner,
-        actor: log.actor,
-        targetOwner: log.targetOwner,
-        action: log.action,
-        entityType: log.entityType,
-        entityId: log.entityId,
-        entityTitle: log.entityTitle,
-        details: log.details ? JSON.parse(log.details) : null,
-        createdAt: log.createdAt,
-        isOwnAction: log.actorId === userId,
-        isForOther: log.targetOwnerId !== null
-      })),
+      logs: logs.map(log => formatLog(log, userId)),
       pagination: {
-        page: parseInt(page),
-        limit: parseInt(limit),
+        page: currentPage,
+        limit: take,
         total,
         totalPages: Math.ceil(total / take)
       }
     });
   } catch (error) {
+    if (error.status === 400) {
+      return res.status(400).json({ error: error.message });
+    }
     console.error('Erreur getActivityLog:', error);
     res.status(500).json({ error: 'Erreur serveur.' });
   }
 };
 
 // Fonction utilitaire pour créer une entrée dans le journal
-const createActivityLog = async ({ ownerId, actorId, action, entityType, entityId, entityTitle, details, targetOwnerId }) => {
+const createActivityLog = async (entry) => {
   try {
-    await prisma.activityLog.create({
-      data: {
-        ownerId,
-        actorId,
-        action,
-        entityType,
-        entityId,
-        entityTitle,
-        details: details ? JSON.stringify(details) : null,
-        targetOwnerId: targetOwnerId || null
-      }
-    });
+    // Écrit selon ACTIVITY_LOG_MODE (par défaut : file en mémoire écrite par lots)
+    await logActivity(entry);
   } catch (error) {
     console.error('Erreur createActivityLog:', error);
     // On ne lance pas d'erreur pour ne pas bloquer l'action principale
@@ -1,6 +1,11 @@
 const bcrypt = require('bcrypt');
 const { z } = require('zod');
 const prisma = require('../config/database');
+const { invalidateUser } = require('../services/authCache');
+const { invalidateDelegationsForUser } = require('../services/delegationResolver');
+const { keysetPaginate, andWhere, clampLimit, cursorPageMeta } = require('../utils/pagination');
+const { streamTaskExport } = require('../services/taskExport');
+const { getDashboardTaskStats, reconcileTaskStats } = require('../services/statsRollup');
 
 // Validation schemas
 const updateUserSchema = z.object({
@@ -9,6 +14,12 @@ const updateUserSchema = z.object({
   canCreateApiTokens: z.boolean().optional()
 });
 
+// Tri keyset de la liste des utilisateurs
+const USER_SORT_KEYS = [
+  { field: 'createdAt', direction: 'desc', type: 'date' },
+  { field: 'id', direction: 'desc' }
+];
+
 const changePasswordSchema = z.object({
   newPassword: z.string().min(6, 'Mot de passe minimum 6 caractères')
 });
@@ -16,53 +27,19 @@ const changePasswordSchema = z.object({
 // Get global statistics
 const getStats = async (req, res, next) => {
   try {
+    // Les compteurs de tâches viennent des tables d'agrégats (maintenues par triggers)
     const [
       totalUsers,
       activeUsers,
-      totalTasks,
-      activeTasks,
-      completedTasks,
-      totalCategories
+      totalCategories,
+      taskStats
     ] = await Promise.all([
       prisma.user.count({ where: { role: 'user' } }),
       prisma.user.count({ where: { role: 'user', isActive: true } }),
-      prisma.task.count(),
-      prisma.task.count({ where: { status: 'active' } }),
-      prisma.task.count({ where: { status: 'completed' } }),
-      prisma.category.count()
+      prisma.category.count(),
+      getDashboardTaskStats({ days: 30, top: 5 })
     ]);
 
-    // Tasks created per day (last 30 days)
-    const thirtyDaysAgo = new Date();
-    thirtyDaysAgo.setDate(thirtyDaysAgo.getDate() - 30);
-
-    const tasksPerDay = await prisma.task.groupBy({
-      by: ['createdAt'],
-      _count: { id: true },
-      where: {
-        createdAt: { gte: thirtyDaysAgo }
-      },
-      orderBy: { createdAt: 'asc' }
-    });
-
-    // Top users by task count
-    const topUsers = await prisma.user.findMany({
-      where: { role: 'user' },
-      select: {
-        id: true,
-        username: true,
-        firstName: true,
-        lastName: true,
-        _count: {
-          select: { tasks: true }
-        }
-      },
-      orderBy: {
-        tasks: { _count: 'desc' }
-      },
-      take: 5
-    });
-
     res.json({
       users: {
         total: totalUsers,
@@ -70,19 +47,21 @@ const getStats = async (req, res, next) => {
         inactive: totalUsers - activeUsers
       },
       tasks: {
-        total: totalTasks,
-        active: activeTasks,
-        completed: completedTasks,
-        completionRate: totalTasks > 0 ? Math.round((completedTasks / totalTasks) * 100 * 10) / 10 : 0
+        total: taskStats.total,
+        active: taskStats.active,
+        completed: taskStats.completed,
+        completionRate: taskStats.total > 0 ? Math.round((taskStats.completed / taskStats.total) * 100 * 10) / 10 : 0
       },
       categories: {
         total: totalCategories
       },
-      topUsers: topUsers.map(u => ({
+      // Tâches créées / terminées / supprimées par jour (30 derniers jours, UTC)
+      tasksPerDay: taskStats.perDay,
+      topUsers: taskStats.topUsers.map(({ user: u, total }) => ({
         id: u.id,
         username: u.username,
         name: `${u.firstName || ''} ${u.lastName || ''}`.trim() || u.username,
-        taskCount: u._count.tasks
+        taskCount: total
       }))
     });
   } catch (error) {
@@ -90,10 +69,20 @@ const getStats = async (req, res, next) => {
   }
 };
 
+// Recalcul des statistiques agrégées
+const reconcileStats = async (req, res, next) => {
+  try {
+    const result = await reconcileTaskStats();
+    res.json({ result });
+  } catch (error) {
+    next(error);
+  }
+};
+
 // Get all users
 const getUsers = async (req, res, next) => {
   try {
-    const { search = '', role = 'all', status = 'all' } = req.query;
+    const { search = '', role = 'all', status = 'all', limit, cursor } = req.query;
 
     const where = {
       // Exclude the default admin from the list
@@ -119,8 +108,14 @@ const getUsers = async (req, res, next) => {
       ];
     }
 
-    const users = await prisma.user.findMany({
-      where,
+    // Pagination par curseur optionnelle (?limit=N puis ?cursor=nextCursor)
+    const take = clampLimit(limit);
+    const keyset = limit || cursor
+      ? keysetPaginate({ keys: USER_SORT_KEYS, cursor, limit: take })
+      : null;
+
+    const rows = await prisma.user.findMany({
+      where: keyset ? andWhere(where, keyset.where) : where,
       select: {
         id: true,
         email: true,
@@ -140,9 +135,12 @@ const getUsers = async (req, res, next) => {
           }
         }
       },
-      orderBy: { createdAt: 'desc' }
+      orderBy: keyset ? keyset.orderBy : { createdAt: 'desc' },
+      ...(keyset && { take: keyset.take })
     });
 
+    const { items: users, nextCursor } = keyset ? keyset.page(rows) : { items: rows, nextCursor: null };
+
     res.json({
       users: users.map(u => ({
         ...u,
@@ -150,7 +148,8 @@ const getUsers = async (req, res, next) => {
         categoryCount: u._count.categories,
         apiTokenCount: u._count.apiTokens,
         _count: undefined
-      }))
+      })),
+      ...(keyset && cursorPageMeta({ nextCursor, limit: take }))
     });
   } catch (error) {
     next(error);
@@ -243,6 +242,8 @@ const updateUser = async (req, res, next) => {
       }
     });
 
+    invalidateUser(user.id);
+
     res.json({ user });
   } catch (error) {
     next(error);
@@ -274,6 +275,8 @@ const changeUserPassword = async (req, res, next) => {
       data: { passwordHash }
     });
 
+    invalidateUser(req.params.id);
+
     res.json({ message: 'Mot de passe modifié avec succès.' });
   } catch (error) {
     next(error);
@@ -340,6 +343,9 @@ const deleteUser = async (req, res, next) => {
       where: { id: req.params.id }
     });
 
+    invalidateUser(req.params.id);
+    invalidateDelegationsForUser(req.params.id);
+
     if (exportData) {
       res.json({
         message: 'Utilisateur supprimé avec succès.',
@@ -360,88 +366,26 @@ const exportUserTasks = async (req, res, next) => {
 
     const user = await prisma.user.findUnique({
       where: { id: req.params.id },
-      include: {
-        tasks: {
-          include: { category: true },
-          orderBy: { createdAt: 'desc' }
-        }
-      }
+      select: { id: true, username: true, email: true }
     });
 
     if (!user) {
       return res.status(404).json({ error: 'Utilisateur non trouvé.' });
     }
 
-    const exportData = user.tasks.map(task => ({
-      id: task.id,
-      title: task.title,
-      description: task.description,
-      status: task.status,
-      importance: task.importance,
-      category: task.category ? {
-        name: task.category.name,
-        color: task.category.color
-      } : null,
-      dueDate: task.dueDate,
-      dueTime: task.dueTime,
-      completedAt: task.completedAt,
-      createdAt: task.createdAt,
-      updatedAt: task.updatedAt
-    }));
-
-    if (format === 'xml') {
-      const escapeXml = (str) => {
-        if (!str) return '';
-        return String(str)
-          .replace(/&/g, '&amp;')
-          .replace(/</g, '&lt;')
-          .replace(/>/g, '&gt;')
-          .replace(/"/g, '&quot;')
-          .replace(/'/g, '&apos;');
-      };
-
-      let xml = '<?xml version="1.0" encoding="UTF-8"?>\n<export>\n';
-      xml += `  <user>\n`;
-      xml += `    <username>${escapeXml(user.username)}</username>\n`;
-      xml += `    <email>${escapeXml(user.email)}</email>\n`;
-      xml += `  </user>\n`;
-      xml += `  <tasks>\n`;
-
-      for (const task of exportData) {
-        xml += '    <task>\n';
-        xml += `      <id>${escapeXml(task.id)}</id>\n`;
-        xml += `      <title>${escapeXml(task.title)}</title>\n`;
-        xml += `      <description>${escapeXml(task.description || '')}</description>\n`;
-        xml += `      <status>${escapeXml(task.status)}</status>\n`;
-        xml += `      <importance>${escapeXml(task.importance)}</importance>\n`;
-        if (task.category) {
-          xml += `      <category>\n`;
-          xml += `        <name>${escapeXml(task.category.name)}</name>\n`;
-          xml += `        <color>${escapeXml(task.category.color)}</color>\n`;
-          xml += `      </category>\n`;
-        }
-        xml += `      <createdAt>${task.createdAt ? task.createdAt.toISOString() : ''}</createdAt>\n`;
-        xml += '    </task>\n';
-      }
-
-      xml += '  </tasks>\n</export>';
-
-      res.set('Content-Type', 'application/xml');
-      res.set('Content-Disposition', `attachment; filename="${user.username}-tasks-export.xml"`);
-      res.send(xml);
-    } else {
-      res.set('Content-Type', 'application/json');
-      res.set('Content-Disposition', `attachment; filename="${user.username}-tasks-export.json"`);
-      res.json({
-        exportDate: new Date().toISOString(),
+    // Lecture par lots et écriture au fil de l'eau (gzip si accepté)
+    await streamTaskExport(req, res, {
+      userId: user.id,
+      format,
+      filename: `${user.username}-tasks-export`,
+      header: {
         user: {
           username: user.username,
           email: user.email
-        },
-        totalTasks: exportData.length,
-        tasks: exportData
-      });
-    }
+        }
+      },
+      xmlRoot: 'export'
+    });
   } catch (error) {
     next(error);
   }
@@ -449,6 +393,7 @@ const exportUserTasks = async (req, res, next) => {
 
 module.exports = {
   getStats,
+  reconcileStats,
   getUsers,
   getUser,
   updateUser,
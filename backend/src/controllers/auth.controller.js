@@ -2,6 +2,8 @@ const bcrypt = require('bcrypt');
 const { z } = require('zod');
 const prisma = require('../config/database');
 const { generateToken } = require('../utils/jwt');
+const { invalidateUser } = require('../services/authCache');
+const { resolveDelegation } = require('../services/delegationResolver');
 
 // Validation schemas
 const registerSchema = z.object({
@@ -156,6 +158,8 @@ const updateProfile = async (req, res, next) => {
       }
     });
 
+    invalidateUser(req.user.id);
+
     res.json({ user });
   } catch (error) {
     next(error);
@@ -210,6 +214,8 @@ const updateEmail = async (req, res, next) => {
       }
     });
 
+    invalidateUser(req.user.id);
+
     res.json({ user: updatedUser, message: 'Email mis à jour avec succès.' });
   } catch (error) {
     next(error);
@@ -241,6 +247,8 @@ const updatePassword = async (req, res, next) => {
       }
     });
 
+    invalidateUser(req.user.id);
+
     res.json({ message: 'Mot de passe mis à jour avec succès.', mustChangePassword: false });
   } catch (error) {
     next(error);
@@ -255,13 +263,7 @@ const updateDefaultContext = async (req, res, next) => {
     // Valider que le contexte est soit "self", soit un UUID d'un owner délégué valide
     if (defaultContext !== 'self') {
       // Vérifier que l'utilisateur a une délégation acceptée pour ce owner
-      const delegation = await prisma.taskDelegation.findFirst({
-        where: {
-          ownerId: defaultContext,
-          delegateId: userId,
-          status: 'accepted'
-        }
-      });
+      const delegation = await resolveDelegation(userId, defaultContext, req);
 
       if (!delegation) {
         return res.status(400).json({ error: 'Contexte invalide ou délégation non acceptée.' });
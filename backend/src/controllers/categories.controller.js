@@ -1,34 +1,8 @@
 const { z } = require('zod');
 const prisma = require('../config/database');
-const { createActivityLog } = require('./activity.controller');
-
-// Helper: Créer les logs d'activité pour owner ET actor (si différents)
-const logActivityForBoth = async ({ ownerId, actorId, action, entityType, entityId, entityTitle, details }) => {
-  // Toujours créer le log pour le owner
-  await createActivityLog({
-    ownerId,
-    actorId,
-    action,
-    entityType,
-    entityId,
-    entityTitle,
-    details
-  });
-
-  // Si l'acteur est différent du owner, créer aussi un log pour l'acteur
-  if (actorId !== ownerId) {
-    await createActivityLog({
-      ownerId: actorId, // Le log appartient à l'acteur
-      actorId,
-      action,
-      entityType,
-      entityId,
-      entityTitle,
-      details,
-      targetOwnerId: ownerId // Référence au propriétaire pour contexte
-    });
-  }
-};
+const { resolveAccess, hasPermission } = require('../services/delegationResolver');
+const { withActivityLog } = require('../services/activityLog');
+const { sendIfNotModified } = require('../services/taskSync');
 
 // Validation schemas
 const createCategorySchema = z.object({
@@ -44,46 +18,6 @@ const updateCategorySchema = z.object({
   icon: z.string().max(50).optional().nullable()
 });
 
-// Helper: Vérifier les permissions de délégation pour les catégories
-const checkCategoryDelegationPermission = async (actorId, ownerId, permission) => {
-  if (actorId === ownerId) return true;
-
-  const delegation = await prisma.taskDelegation.findFirst({
-    where: {
-      ownerId,
-      delegateId: actorId,
-      status: 'accepted'
-    }
-  });
-
-  if (!delegation) return false;
-
-  switch (permission) {
-    case 'view':
-      return true;
-    case 'create':
-      return delegation.canCreateCategories;
-    default:
-      return false;
-  }
-};
-
-// Helper: Obtenir les catégories cachées pour un délégué
-const getHiddenCategoryIds = async (actorId, ownerId) => {
-  if (actorId === ownerId) return [];
-
-  const delegation = await prisma.taskDelegation.findFirst({
-    where: {
-      ownerId,
-      delegateId: actorId,
-      status: 'accepted'
-    }
-  });
-
-  if (!delegation || !delegation.hiddenCategoryIds) return [];
-  return delegation.hiddenCategoryIds.split(',').filter(Boolean);
-};
-
 const getCategories = async (req, res, next) => {
   try {
     const { ownerId } = req.query;
@@ -91,15 +25,18 @@ const getCategories = async (req, res, next) => {
     const targetOwnerId = ownerId || actorId;
 
     // Vérifier les permissions si on accède aux catégories de quelqu'un d'autre
-    if (targetOwnerId !== actorId) {
-      const hasAccess = await checkCategoryDelegationPermission(actorId, targetOwnerId, 'view');
-      if (!hasAccess) {
-        return res.status(403).json({ error: 'Accès non autorisé.' });
-      }
+    const access = await resolveAccess(actorId, targetOwnerId, req);
+    if (!hasPermission(access, 'view')) {
+      return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
-    // Récupérer les catégories cachées pour ce délégué
-    const hiddenCategoryIds = await getHiddenCategoryIds(actorId, targetOwnerId);
+    // Catégories cachées pour ce délégué
+    const hiddenCategoryIds = access.hiddenCategoryIdList;
+
+    // Liste inchangée depuis l'ETag du client (noms, couleurs, nombre de tâches) : 304
+    if (await sendIfNotModified(req, res, { ownerId: targetOwnerId, hiddenCategoryIds })) {
+      return;
+    }
 
     const whereClause = { userId: targetOwnerId };
     if (hiddenCategoryIds.length > 0) {
@@ -140,14 +77,13 @@ const getCategory = async (req, res, next) => {
     }
 
     // Vérifier les permissions
-    const hasAccess = await checkCategoryDelegationPermission(actorId, category.userId, 'view');
-    if (!hasAccess) {
+    const access = await resolveAccess(actorId, category.userId, req);
+    if (!hasPermission(access, 'view')) {
       return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
     // Vérifier si la catégorie est cachée
-    const hiddenCategoryIds = await getHiddenCategoryIds(actorId, category.userId);
-    if (hiddenCategoryIds.includes(category.id)) {
+    if (access.hiddenCategoryIds.has(category.id)) {
       return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
@@ -164,11 +100,9 @@ const createCategory = async (req, res, next) => {
     const targetOwnerId = data.ownerId || actorId;
 
     // Vérifier les permissions si on crée pour quelqu'un d'autre
-    if (targetOwnerId !== actorId) {
-      const hasPermission = await checkCategoryDelegationPermission(actorId, targetOwnerId, 'create');
-      if (!hasPermission) {
-        return res.status(403).json({ error: 'Vous n\'avez pas la permission de créer des catégories.' });
-      }
+    const access = await resolveAccess(actorId, targetOwnerId, req);
+    if (!hasPermission(access, 'createCategory')) {
+      return res.status(403).json({ error: 'Vous n\'avez pas la permission de créer des catégories.' });
     }
 
     // Check if category with same name exists
@@ -183,24 +117,25 @@ const createCategory = async (req, res, next) => {
       return res.status(409).json({ error: 'Une catégorie avec ce nom existe déjà.' });
     }
 
-    const category = await prisma.category.create({
-      data: {
-        userId: targetOwnerId,
-        name: data.name,
-        color: data.color,
-        icon: data.icon || null
-      }
-    });
-
-    // Log d'activité (pour owner ET actor si différents)
-    await logActivityForBoth({
-      ownerId: targetOwnerId,
-      actorId,
-      action: 'created_category',
-      entityType: 'category',
-      entityId: category.id,
-      entityTitle: category.name
-    });
+    // Mutation et log d'activité (pour owner ET actor si différents)
+    const category = await withActivityLog(
+      (db) => db.category.create({
+        data: {
+          userId: targetOwnerId,
+          name: data.name,
+          color: data.color,
+          icon: data.icon || null
+        }
+      }),
+      (category) => ({
+        ownerId: targetOwnerId,
+        actorId,
+        action: 'created_category',
+        entityType: 'category',
+        entityId: category.id,
+        entityTitle: category.name
+      })
+    );
 
     res.status(201).json({ category });
   } catch (error) {
@@ -242,24 +177,25 @@ const updateCategory = async (req, res, next) => {
       }
     }
 
-    const category = await prisma.category.update({
-      where: { id: req.params.id },
-      data: {
-        ...(data.name && { name: data.name }),
-        ...(data.color && { color: data.color }),
-        ...(data.icon !== undefined && { icon: data.icon })
-      }
-    });
-
-    // Log d'activité
-    await createActivityLog({
-      ownerId: existing.userId,
-      actorId,
-      action: 'updated_category',
-      entityType: 'category',
-      entityId: category.id,
-      entityTitle: category.name
-    });
+    // Mutation et log d'activité
+    const category = await withActivityLog(
+      (db) => db.category.update({
+        where: { id: req.params.id },
+        data: {
+          ...(data.name && { name: data.name }),
+          ...(data.color && { color: data.color }),
+          ...(data.icon !== undefined && { icon: data.icon })
+        }
+      }),
+      (category) => ({
+        ownerId: existing.userId,
+        actorId,
+        action: 'updated_category',
+        entityType: 'category',
+        entityId: category.id,
+        entityTitle: category.name
+      })
+    );
 
     res.json({ category });
   } catch (error) {
@@ -288,19 +224,20 @@ const deleteCategory = async (req, res, next) => {
     const categoryName = existing.name;
 
     // Delete will set categoryId to null on tasks (SetNull)
-    await prisma.category.delete({
-      where: { id: req.params.id }
-    });
-
-    // Log d'activité
-    await createActivityLog({
-      ownerId: existing.userId,
-      actorId,
-      action: 'deleted_category',
-      entityType: 'category',
-      entityId: existing.id,
-      entityTitle: categoryName
-    });
+    // Mutation et log d'activité
+    await withActivityLog(
+      (db) => db.category.delete({
+        where: { id: req.params.id }
+      }),
+      () => ({
+        ownerId: existing.userId,
+        actorId,
+        action: 'deleted_category',
+        entityType: 'category',
+        entityId: existing.id,
+        entityTitle: categoryName
+      })
+    );
 
     res.status(204).send();
   } catch (error) {
@@ -1,5 +1,6 @@
 const { PrismaClient } = require('@prisma/client');
 const { z } = require('zod');
+const { resolveDelegation, invalidateDelegation } = require('../services/delegationResolver');
 
 const prisma = new PrismaClient();
 
@@ -220,6 +221,8 @@ const createDelegation = async (req, res) => {
       }
     });
 
+    invalidateDelegation(ownerId, delegate.id);
+
     res.status(201).json({
       delegation: {
         id: delegation.id,
@@ -285,6 +288,8 @@ const updateDelegation = async (req, res) => {
       }
     });
 
+    invalidateDelegation(updated.ownerId, updated.delegateId);
+
     res.json({
       delegation: {
         id: updated.id,
@@ -326,6 +331,8 @@ const deleteDelegation = async (req, res) => {
       where: { id }
     });
 
+    invalidateDelegation(delegation.ownerId, delegation.delegateId);
+
     res.json({ message: 'Délégation supprimée.' });
   } catch (error) {
     console.error('Erreur deleteDelegation:', error);
@@ -379,6 +386,8 @@ const acceptDelegation = async (req, res) => {
       }
     });
 
+    invalidateDelegation(updated.ownerId, updated.delegateId);
+
     res.json({
       delegation: {
         id: updated.id,
@@ -421,6 +430,8 @@ const rejectDelegation = async (req, res) => {
       where: { id }
     });
 
+    invalidateDelegation(delegation.ownerId, delegation.delegateId);
+
     res.json({ message: 'Invitation refusée.' });
   } catch (error) {
     console.error('Erreur rejectDelegation:', error);
@@ -451,6 +462,8 @@ const leaveDelegation = async (req, res) => {
       where: { id }
     });
 
+    invalidateDelegation(delegation.ownerId, delegation.delegateId);
+
     res.json({ message: 'Vous avez quitté cette délégation.' });
   } catch (error) {
     console.error('Erreur leaveDelegation:', error);
@@ -465,22 +478,14 @@ const getOwnerTasks = async (req, res) => {
     const userId = req.user.id;
 
     // Vérifier que l'utilisateur a une délégation acceptée pour cet owner
-    const delegation = await prisma.taskDelegation.findFirst({
-      where: {
-        ownerId,
-        delegateId: userId,
-        status: 'accepted'
-      }
-    });
+    const delegation = await resolveDelegation(userId, ownerId, req);
 
     if (!delegation) {
       return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
-    // Récupérer les catégories cachées
-    const hiddenCategoryIds = delegation.hiddenCategoryIds
-      ? delegation.hiddenCategoryIds.split(',').filter(Boolean)
-      : [];
+    // Catégories cachées (déjà parsées par le resolver)
+    const hiddenCategoryIds = delegation.hiddenCategoryIdList;
 
     // Récupérer les tâches en excluant celles des catégories cachées
     const whereClause = {
@@ -534,22 +539,14 @@ const getOwnerCategories = async (req, res) => {
     const userId = req.user.id;
 
     // Vérifier que l'utilisateur a une délégation acceptée pour cet owner
-    const delegation = await prisma.taskDelegation.findFirst({
-      where: {
-        ownerId,
-        delegateId: userId,
-        status: 'accepted'
-      }
-    });
+    const delegation = await resolveDelegation(userId, ownerId, req);
 
     if (!delegation) {
       return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
-    // Récupérer les catégories cachées
-    const hiddenCategoryIds = delegation.hiddenCategoryIds
-      ? delegation.hiddenCategoryIds.split(',').filter(Boolean)
-      : [];
+    // Catégories cachées (déjà parsées par le resolver)
+    const hiddenCategoryIds = delegation.hiddenCategoryIdList;
 
     // Récupérer les catégories en excluant les cachées
     const categories = await prisma.category.findMany({
@@ -0,0 +1,182 @@
+const prisma = require('../config/database');
+const { resolveAccess } = require('../services/delegationResolver');
+const { subscribe, CHANGE_STREAM_ENABLED } = require('../services/changeStream');
+const { acquireSlot, releaseSlot } = require('../services/clusterState');
+
+// Flux ouverts simultanément par utilisateur (dans tout le cluster, voir services/clusterState)
+const EVENTS_MAX_STREAMS_PER_USER = parseInt(process.env.EVENTS_MAX_STREAMS_PER_USER || '5', 10);
+const HEARTBEAT_MS = 25000;
+
+// Au-delà, le client ne lit plus assez vite : le flux est fermé (il se reconnectera)
+const MAX_BUFFERED_BYTES = 1024 * 1024;
+
+// Regroupement des resync d'un owner envoyés à un délégué (changements en masse successifs)
+const RESYNC_DEBOUNCE_MS = 2000;
+
+// Fonctions de fermeture des flux ouverts (arrêt du serveur)
+const activeStreams = new Set();
+
+// Événement sans ids (changement en masse) pour un délégué ayant des catégories cachées
+const RESYNC = Symbol('resync');
+
+/**
+ * Filtre un événement pour un abonné. Pour un délégué, les catégories cachées et les tâches
+ * qui y restent sont retirées ; une tâche qui y entre est signalée (elle disparaît de sa vue).
+ * Retourne null si rien n'est visible, ou si la délégation n'existe plus.
+ * Un changement en masse (sans ids) ne peut pas être filtré : pour un délégué ayant des
+ * catégories cachées, retourne RESYNC (resync de l'owner, sans action ni nombre de lignes).
+ */
+const visibleEvent = (event, access) => {
+  if (!access) return null;
+  if (!event.items && access.hiddenCategoryIds.size > 0) return RESYNC;
+
+  let ids = null;
+  if (event.items) {
+    const hidden = access.hiddenCategoryIds;
+    const visible = event.entity === 'category'
+      ? event.items.filter(item => !hidden.has(item.id))
+      : event.items.filter(item => !(item.categoryId && hidden.has(item.categoryId)) ||
+          (item.previousCategoryId && !hidden.has(item.previousCategoryId)));
+
+    if (visible.length === 0) return null;
+    ids = visible.map(item => item.id);
+  }
+
+  return {
+    ownerId: event.ownerId,
+    action: event.action,
+    count: ids ? ids.length : event.count,
+    // null : trop de changements, relire la liste (GET /tasks?since=)
+    ids
+  };
+};
+
+const writeEvent = (res, name, data) => {
+  res.write(`event: ${name}\ndata: ${JSON.stringify(data)}\n\n`);
+};
+
+// Flux SSE des changements de tâches et catégories des owners suivis
+const streamEvents = async (req, res, next) => {
+  try {
+    if (!CHANGE_STREAM_ENABLED) {
+      return res.status(503).json({ error: 'Flux de changements désactivé.' });
+    }
+
+    const actorId = req.user.id;
+    const { ownerId } = req.query;
+
+    // Owners suivis : celui demandé, ou soi-même et tous ceux qui nous ont délégué leurs tâches
+    let ownerIds;
+    if (ownerId && ownerId !== actorId) {
+      const access = await resolveAccess(actorId, ownerId, req);
+      if (!access) {
+        return res.status(403).json({ error: 'Accès non autorisé.' });
+      }
+      ownerIds = [ownerId];
+    } else if (ownerId) {
+      ownerIds = [actorId];
+    } else {
+      const delegations = await prisma.taskDelegation.findMany({
+        where: { delegateId: actorId, status: 'accepted' },
+        select: { ownerId: true }
+      });
+      ownerIds = [actorId, ...delegations.map(d => d.ownerId)];
+    }
+
+    const slotKey = `events:${actorId}`;
+    if (!(await acquireSlot(slotKey, EVENTS_MAX_STREAMS_PER_USER))) {
+      return res.status(429).json({ error: 'Trop de flux ouverts pour cet utilisateur.' });
+    }
+
+    res.writeHead(200, {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache, no-transform',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    });
+    res.write('retry: 5000\n\n');
+    writeEvent(res, 'ready', { owners: ownerIds });
+
+    const owners = new Set(ownerIds);
+    // ownerId -> resync en attente (voir RESYNC_DEBOUNCE_MS)
+    const pendingResyncs = new Map();
+    let closed = false;
+
+    const close = () => {
+      if (closed) return;
+      closed = true;
+      activeStreams.delete(close);
+      unsubscribe();
+      clearInterval(heartbeat);
+      for (const timer of pendingResyncs.values()) clearTimeout(timer);
+      pendingResyncs.clear();
+
+      releaseSlot(slotKey);
+
+      res.end();
+    };
+
+    const unsubscribe = subscribe(async (event) => {
+      if (closed) return;
+
+      // Connexion LISTEN perdue : des événements ont pu manquer
+      if (event.resync) {
+        writeEvent(res, 'resync', {});
+        return;
+      }
+
+      if (!owners.has(event.ownerId)) return;
+
+      try {
+        // Pas de mémoïsation sur req : une délégation révoquée coupe le flux de cet owner
+        const access = await resolveAccess(actorId, event.ownerId);
+        if (!access) {
+          owners.delete(event.ownerId);
+          writeEvent(res, 'revoked', { ownerId: event.ownerId });
+          if (owners.size === 0) close();
+          return;
+        }
+
+        const data = visibleEvent(event, access);
+        if (!data || closed) return;
+
+        if (data === RESYNC) {
+          if (pendingResyncs.has(event.ownerId)) return;
+          const timer = setTimeout(() => {
+            pendingResyncs.delete(event.ownerId);
+            if (!closed) writeEvent(res, 'resync', { ownerId: event.ownerId });
+          }, RESYNC_DEBOUNCE_MS);
+          timer.unref();
+          pendingResyncs.set(event.ownerId, timer);
+          return;
+        }
+
+        writeEvent(res, event.entity === 'category' ? 'categories' : 'tasks', data);
+        if (res.writableLength > MAX_BUFFERED_BYTES) close();
+      } catch (error) {
+        console.error('Erreur flux de changements:', error);
+      }
+    });
+
+    const heartbeat = setInterval(() => res.write(': ping\n\n'), HEARTBEAT_MS);
+    heartbeat.unref();
+
+    activeStreams.add(close);
+    req.on('close', close);
+    if (req.destroyed) close();
+  } catch (error) {
+    next(error);
+  }
+};
+
+/**
+ * Ferme tous les flux ouverts ; les clients se reconnecteront (sur un autre worker en mode cluster)
+ */
+const closeAllEventStreams = () => {
+  for (const close of [...activeStreams]) close();
+};
+
+module.exports = {
+  streamEvents,
+  closeAllEventStreams
+};
@@ -1,6 +1,15 @@
 const { z } = require('zod');
 const prisma = require('../config/database');
 const { createActivityLog } = require('./activity.controller');
+const {
+  IMPORT_CHUNK_SIZE,
+  CONFLICT_POLICIES,
+  runBulkImport,
+  runStreamingImport,
+  getImportProgress
+} = require('../services/bulkImport');
+const { findDuplicates } = require('../services/importDuplicates');
+const { parseTasks, readTaskBatches } = require('../utils/importParsers');
 
 // Schema pour la résolution des conflits
 const conflictResolutionSchema = z.object({
@@ -15,69 +24,118 @@ const conflictResolutionSchema = z.object({
   }))
 });
 
+// Nombre maximum de conflits détaillés retournés par une analyse en streaming
+const STREAM_ANALYSIS_SAMPLE_SIZE = 100;
+
 /**
- * Parse le contenu XML en tableau de tâches
+ * Format d'un import en streaming : ?format=xml|json, sinon déduit du Content-Type
  */
-const parseXmlContent = (xmlContent) => {
-  const tasks = [];
-
-  // Regex pour extraire les tâches
-  const taskRegex = /<task>([\s\S]*?)<\/task>/g;
-  let match;
-
-  while ((match = taskRegex.exec(xmlContent)) !== null) {
-    const taskXml = match[1];
-
-    const getValue = (tag) => {
-      const regex = new RegExp(`<${tag}>([\\s\\S]*?)<\\/${tag}>`);
-      const m = taskXml.match(regex);
-      return m ? m[1].trim() : null;
-    };
-
-    // Extraire la catégorie
-    let category = null;
-    const categoryMatch = taskXml.match(/<category>([\s\S]*?)<\/category>/);
-    if (categoryMatch && categoryMatch[1].trim()) {
-      const catContent = categoryMatch[1];
-      const catName = catContent.match(/<name>([\s\S]*?)<\/name>/);
-      const catColor = catContent.match(/<color>([\s\S]*?)<\/color>/);
-      if (catName) {
-        category = {
-          name: catName[1].trim(),
-          color: catColor ? catColor[1].trim() : '#6366f1'
-        };
-      }
-    }
+const streamFormat = (req) => {
+  if (req.query.format === 'xml' || req.query.format === 'json') return req.query.format;
+  return req.is(['application/xml', 'text/xml']) ? 'xml' : 'json';
+};
 
-    tasks.push({
-      id: getValue('id'),
-      title: getValue('title'),
-      description: getValue('description') || null,
-      status: getValue('status') || 'active',
-      importance: getValue('importance') || 'normal',
-      category,
-      dueDate: getValue('dueDate') || null,
-      dueTime: getValue('dueTime') || null,
-      completedAt: getValue('completedAt') || null,
-      createdAt: getValue('createdAt'),
-      updatedAt: getValue('updatedAt')
-    });
-  }
+const importSummary = (task) => ({
+  title: task.title,
+  description: task.description,
+  status: task.status,
+  importance: task.importance,
+  category: task.category,
+  dueDate: task.dueDate,
+  dueTime: task.dueTime
+});
+
+const isEnabled = (value) => value === true || value === 'true' || value === '1';
+
+/**
+ * Sépare les tâches d'un fichier en nouvelles tâches et conflits (une requête par lot de titres)
+ */
+const analyzeTasks = async (userId, tasksToImport, options) => {
+  const duplicates = await findDuplicates(userId, tasksToImport, options);
+  const conflicts = [];
+  const newTasks = [];
+
+  tasksToImport.forEach((task, index) => {
+    if (!task || !task.title) return; // Skip tasks without title
+
+    const duplicate = duplicates[index];
+    if (duplicate) {
+      conflicts.push({
+        index,
+        matchType: duplicate.matchType,
+        importTask: importSummary(task),
+        existingTasks: duplicate.existingTasks
+      });
+    } else {
+      newTasks.push({
+        index,
+        task: importSummary(task)
+      });
+    }
+  });
 
-  return tasks;
+  return { conflicts, newTasks };
 };
 
 /**
- * Unescape les entités XML
+ * Analyse un fichier lu en streaming, lot par lot : seuls les compteurs
+ * et un échantillon des conflits sont conservés en mémoire.
  */
-const unescapeXml = (str) => {
-  if (!str) return str;
-  return str
-    .replace(/&amp;/g, '&')
-    .replace(/&lt;/g, '<')
-    .replace(/&gt;/g, '>')
-    .replace(/&quot;/g, '"')
-    .replace(/&apos;/g, "'");
+const analyzeStream = async (userId, req) => {
+  const options = { fuzzy: isEnabled(req.query.fuzzy) };
+  const summary = {
+    totalInFile: 0,
+    newTasks: 0,
+    conflicts: 0,
+    invalid: 0,
+    analysis: {
+      conflicts: [],
+      conflictsTruncated: false
+    }
+  };
+
+  for await (const batch of readTaskBatches(req, streamFormat(req), IMPORT_CHUNK_SIZE)) {
+    const duplicates = await findDuplicates(userId, batch, options);
+
+    for (const [position, task] of batch.entries()) {
+      const index = summary.totalInFile++;
+
+      if (!task || !task.title) {
+        summary.invalid++;
+        continue;
+      }
+
+      const duplicate = duplicates[position];
+      if (!duplicate) {
+        summary.newTasks++;
+        continue;
+      }
+
+      summary.conflicts++;
+      if (summary.analysis.conflicts.length < STREAM_ANALYSIS_SAMPLE_SIZE) {
+        summary.analysis.conflicts.push({
+          index,
+          matchType: duplicate.matchType,
+          importTask: importSummary(task),
+          existingTasks: duplicate.existingTasks
+        });
+      } else {
+        summary.analysis.conflictsTruncated = true;
+      }
+    }
+  }
+
+  return summary;
+};
+
+const parseConflictPolicy = (req) => {
+  const onConflict = req.query.onConflict || 'skip';
+  if (!CONFLICT_POLICIES.includes(onConflict)) {
+    const error = new Error(`onConflict doit valoir ${CONFLICT_POLICIES.join(', ')}.`);
+    error.status = 400;
+    throw error;
+  }
+  return onConflict;
 };
 
 /**
@@ -87,7 +145,7 @@ const unescapeXml = (str) => {
 const analyzeImport = async (req, res, next) => {
   try {
     const userId = req.user.id;
-    const { content, format = 'json' } = req.body;
+    const { content, format = 'json', fuzzy = false } = req.body;
 
     if (!content) {
       return res.status(400).json({ error: 'Contenu du fichier requis.' });
@@ -97,17 +155,7 @@ const analyzeImport = async (req, res, next) => {
 
     // Parser le contenu selon le format
     if (format === 'xml') {
-      tasksToImport = parseXmlContent(content);
-      // Unescape les valeurs XML
-      tasksToImport = tasksToImport.map(task => ({
-        ...task,
-        title: unescapeXml(task.title),
-        description: unescapeXml(task.description),
-        category: task.category ? {
-          name: unescapeXml(task.category.name),
-          color: task.category.color
-        } : null
-      }));
+      tasksToImport = parseTasks(content, 'xml');
     } else {
       // JSON format
       try {
@@ -122,68 +170,8 @@ const analyzeImport = async (req, res, next) => {
       return res.status(400).json({ error: 'Aucune tâche trouvée dans le fichier.' });
     }
 
-    // Récupérer les tâches existantes de l'utilisateur
-    const existingTasks = await prisma.task.findMany({
-      where: { userId },
-      select: { id: true, title: true, status: true, importance: true }
-    });
-
-    // Créer un map des titres existants
-    const existingTitleMap = new Map();
-    existingTasks.forEach(task => {
-      const key = task.title.toLowerCase().trim();
-      if (!existingTitleMap.has(key)) {
-        existingTitleMap.set(key, []);
-      }
-      existingTitleMap.get(key).push(task);
-    });
-
-    // Analyser chaque tâche
-    const conflicts = [];
-    const newTasks = [];
-
-    tasksToImport.forEach((task, index) => {
-      if (!task.title) return; // Skip tasks without title
-
-      const titleKey = task.title.toLowerCase().trim();
-      const existing = existingTitleMap.get(titleKey);
-
-      if (existing && existing.length > 0) {
-        // Conflit détecté
-        conflicts.push({
-          index,
-          importTask: {
-            title: task.title,
-            description: task.description,
-            status: task.status,
-            importance: task.importance,
-            category: task.category,
-            dueDate: task.dueDate,
-            dueTime: task.dueTime
-          },
-          existingTasks: existing.map(e => ({
-            id: e.id,
-            title: e.title,
-            status: e.status,
-            importance: e.importance
-          }))
-        });
-      } else {
-        // Nouvelle tâche
-        newTasks.push({
-          index,
-          task: {
-            title: task.title,
-            description: task.description,
-            status: task.status,
-            importance: task.importance,
-            category: task.category,
-            dueDate: task.dueDate,
-            dueTime: task.dueTime
-          }
-        });
-      }
-    });
+    // Analyser chaque tâche (doublons exacts, de titre, ou approximatifs si demandé)
+    const { conflicts, newTasks } = await analyzeTasks(userId, tasksToImport, { fuzzy: isEnabled(fuzzy) });
 
     res.json({
       totalInFile: tasksToImport.length,
@@ -218,72 +206,8 @@ const applyImport = async (req, res, next) => {
       return res.status(400).json({ error: 'Résolutions requises.' });
     }
 
-    const results = {
-      created: 0,
-      updated: 0,
-      skipped: 0,
-      errors: []
-    };
-
-    // Récupérer les catégories existantes
-    const existingCategories = await prisma.category.findMany({
-      where: { userId },
-      select: { id: true, name: true }
-    });
-    const categoryMap = new Map(
-      existingCategories.map(c => [c.name.toLowerCase(), c.id])
-    );
-
-    // Créer un map des résolutions par index
-    const conflictResolutions = new Map();
-    if (resolutions.conflicts) {
-      resolutions.conflicts.forEach(r => {
-        conflictResolutions.set(r.index, r);
-      });
-    }
-
-    // Set des indices de nouvelles tâches à importer
-    const newTaskIndices = new Set();
-    if (resolutions.newTasks) {
-      resolutions.newTasks.forEach(t => newTaskIndices.add(t.index));
-    }
-
-    // Traiter chaque tâche
-    for (let i = 0; i < rawTasks.length; i++) {
-      const task = rawTasks[i];
-
-      if (!task.title) {
-        results.errors.push({ index: i, error: 'Titre manquant' });
-        continue;
-      }
-
-      try {
-        // Vérifier si c'est un conflit
-        const resolution = conflictResolutions.get(i);
-
-        if (resolution) {
-          // Gérer le conflit selon la résolution
-          if (resolution.resolution === 'skip') {
-            results.skipped++;
-            continue;
-          } else if (resolution.resolution === 'overwrite' && resolution.existingTaskId) {
-            // Écraser la tâche existante
-            await updateExistingTask(userId, resolution.existingTaskId, task, categoryMap);
-            results.updated++;
-          } else if (resolution.resolution === 'duplicate') {
-            // Créer comme doublon
-            await createNewTask(userId, task, categoryMap);
-            results.created++;
-          }
-        } else if (newTaskIndices.has(i)) {
-          // Nouvelle tâche à créer
-          await createNewTask(userId, task, categoryMap);
-          results.created++;
-        }
-      } catch (err) {
-        results.errors.push({ index: i, title: task.title, error: err.message });
-      }
-    }
+    // Import ensembliste en une transaction (catégories, createMany, mises à jour groupées)
+    const results = await runBulkImport(userId, rawTasks, resolutions);
 
     // Log d'activité
     await createActivityLog({
@@ -304,86 +228,6 @@ const applyImport = async (req, res, next) => {
   }
 };
 
-/**
- * Crée une nouvelle tâche à partir des données d'import
- */
-const createNewTask = async (userId, taskData, categoryMap) => {
-  // Gérer la catégorie
-  let categoryId = null;
-  if (taskData.category && taskData.category.name) {
-    const catKey = taskData.category.name.toLowerCase();
-    if (categoryMap.has(catKey)) {
-      categoryId = categoryMap.get(catKey);
-    } else {
-      // Créer la catégorie
-      const newCat = await prisma.category.create({
-        data: {
-          userId,
-          name: taskData.category.name,
-          color: taskData.category.color || '#6366f1'
-        }
-      });
-      categoryMap.set(catKey, newCat.id);
-      categoryId = newCat.id;
-    }
-  }
-
-  // Créer la tâche
-  await prisma.task.create({
-    data: {
-      userId,
-      title: taskData.title,
-      description: taskData.description || null,
-      status: taskData.status || 'active',
-      importance: taskData.importance || 'normal',
-      categoryId,
-      dueDate: taskData.dueDate ? new Date(taskData.dueDate) : null,
-      dueTime: taskData.dueTime || null,
-      completedAt: taskData.completedAt ? new Date(taskData.completedAt) : null
-    }
-  });
-};
-
-/**
- * Met à jour une tâche existante avec les données d'import
- */
-const updateExistingTask = async (userId, taskId, taskData, categoryMap) => {
-  // Gérer la catégorie
-  let categoryId = null;
-  if (taskData.category && taskData.category.name) {
-    const catKey = taskData.category.name.toLowerCase();
-    if (categoryMap.has(catKey)) {
-      categoryId = categoryMap.get(catKey);
-    } else {
-      // Créer la catégorie
-      const newCat = await prisma.category.create({
-        data: {
-          userId,
-          name: taskData.category.name,
-          color: taskData.category.color || '#6366f1'
-        }
-      });
-      categoryMap.set(catKey, newCat.id);
-      categoryId = newCat.id;
-    }
-  }
-
-  // Mettre à jour la tâche
-  await prisma.task.update({
-    where: { id: taskId },
-    data: {
-      title: taskData.title,
-      description: taskData.description || null,
-      status: taskData.status || 'active',
-      importance: taskData.importance || 'normal',
-      categoryId,
-      dueDate: taskData.dueDate ? new Date(taskData.dueDate) : null,
-      dueTime: taskData.dueTime || null,
-      completedAt: taskData.completedAt ? new Date(taskData.completedAt) : null
-    }
-  });
-};
-
 /**
  * Import pour admin - analyse le fichier pour un utilisateur spécifique
  * POST /api/v1/admin/users/:id/import/analyze
@@ -391,7 +235,7 @@ const updateExistingTask = async (userId, taskId, taskData, categoryMap) => {
 const adminAnalyzeImport = async (req, res, next) => {
   try {
     const targetUserId = req.params.id;
-    const { content, format = 'json' } = req.body;
+    const { content, format = 'json', fuzzy = false } = req.body;
 
     // Vérifier que l'utilisateur cible existe
     const targetUser = await prisma.user.findUnique({
@@ -410,16 +254,7 @@ const adminAnalyzeImport = async (req, res, next) => {
 
     // Parser le contenu selon le format
     if (format === 'xml') {
-      tasksToImport = parseXmlContent(content);
-      tasksToImport = tasksToImport.map(task => ({
-        ...task,
-        title: unescapeXml(task.title),
-        description: unescapeXml(task.description),
-        category: task.category ? {
-          name: unescapeXml(task.category.name),
-          color: task.category.color
-        } : null
-      }));
+      tasksToImport = parseTasks(content, 'xml');
     } else {
       try {
         const parsed = JSON.parse(content);
@@ -433,64 +268,7 @@ const adminAnalyzeImport = async (req, res, next) => {
       return res.status(400).json({ error: 'Aucune tâche trouvée dans le fichier.' });
     }
 
-    // Récupérer les tâches existantes de l'utilisateur cible
-    const existingTasks = await prisma.task.findMany({
-      where: { userId: targetUserId },
-      select: { id: true, title: true, status: true, importance: true }
-    });
-
-    const existingTitleMap = new Map();
-    existingTasks.forEach(task => {
-      const key = task.title.toLowerCase().trim();
-      if (!existingTitleMap.has(key)) {
-        existingTitleMap.set(key, []);
-      }
-      existingTitleMap.get(key).push(task);
-    });
-
-    const conflicts = [];
-    const newTasks = [];
-
-    tasksToImport.forEach((task, index) => {
-      if (!task.title) return;
-
-      const titleKey = task.title.toLowerCase().trim();
-      const existing = existingTitleMap.get(titleKey);
-
-      if (existing && existing.length > 0) {
-        conflicts.push({
-          index,
-          importTask: {
-            title: task.title,
-            description: task.description,
-            status: task.status,
-            importance: task.importance,
-            category: task.category,
-            dueDate: task.dueDate,
-            dueTime: task.dueTime
-          },
-          existingTasks: existing.map(e => ({
-            id: e.id,
-            title: e.title,
-            status: e.status,
-            importance: e.importance
-          }))
-        });
-      } else {
-        newTasks.push({
-          index,
-          task: {
-            title: task.title,
-            description: task.description,
-            status: task.status,
-            importance: task.importance,
-            category: task.category,
-            dueDate: task.dueDate,
-            dueTime: task.dueTime
-          }
-        });
-      }
-    });
+    const { conflicts, newTasks } = await analyzeTasks(targetUserId, tasksToImport, { fuzzy: isEnabled(fuzzy) });
 
     res.json({
       targetUser: {
@@ -539,82 +317,141 @@ const adminApplyImport = async (req, res, next) => {
       return res.status(400).json({ error: 'Résolutions requises.' });
     }
 
-    const results = {
-      created: 0,
-      updated: 0,
-      skipped: 0,
-      errors: []
-    };
-
-    // Récupérer les catégories de l'utilisateur cible
-    const existingCategories = await prisma.category.findMany({
-      where: { userId: targetUserId },
-      select: { id: true, name: true }
+    const results = await runBulkImport(targetUserId, rawTasks, resolutions);
+
+    // Log d'activité pour l'admin
+    await createActivityLog({
+      ownerId: adminId,
+      actorId: adminId,
+      action: 'admin_imported_tasks',
+      entityType: 'user',
+      entityId: targetUserId,
+      entityTitle: `Import pour ${targetUser.username}`,
+      details: { created: results.created, updated: results.updated, skipped: results.skipped }
+    });
+
+    res.json({
+      success: true,
+      targetUser: {
+        id: targetUser.id,
+        username: targetUser.username
+      },
+      results
+    });
+  } catch (error) {
+    next(error);
+  }
+};
+
+/**
+ * Analyse un fichier envoyé en corps brut (XML ou JSON), sans le charger en mémoire
+ * POST /api/v1/tasks/import/stream/analyze?format=xml|json
+ */
+const streamAnalyzeImport = async (req, res, next) => {
+  try {
+    const summary = await analyzeStream(req.user.id, req);
+
+    if (summary.totalInFile === 0) {
+      return res.status(400).json({ error: 'Aucune tâche trouvée dans le fichier.' });
+    }
+
+    res.json(summary);
+  } catch (error) {
+    next(error);
+  }
+};
+
+/**
+ * Importe un fichier envoyé en corps brut, par lots bornés
+ * POST /api/v1/tasks/import/stream/apply?format=xml|json&onConflict=skip|overwrite|duplicate
+ */
+const streamApplyImport = async (req, res, next) => {
+  try {
+    const userId = req.user.id;
+    const onConflict = parseConflictPolicy(req);
+
+    const batches = readTaskBatches(req, streamFormat(req), IMPORT_CHUNK_SIZE);
+    const results = await runStreamingImport(userId, batches, { onConflict });
+
+    await createActivityLog({
+      ownerId: userId,
+      actorId: userId,
+      action: 'imported_tasks',
+      entityType: 'task',
+      entityTitle: `Import de ${results.created + results.updated} tâches`,
+      details: { created: results.created, updated: results.updated, skipped: results.skipped }
     });
-    const categoryMap = new Map(
-      existingCategories.map(c => [c.name.toLowerCase(), c.id])
-    );
-
-    const conflictResolutions = new Map();
-    if (resolutions.conflicts) {
-      resolutions.conflicts.forEach(r => {
-        conflictResolutions.set(r.index, r);
-      });
+
+    res.json({
+      success: true,
+      results
+    });
+  } catch (error) {
+    next(error);
+  }
+};
+
+/**
+ * Import pour admin - analyse en streaming pour un utilisateur spécifique
+ * POST /api/v1/admin/users/:id/import/stream/analyze
+ */
+const adminStreamAnalyzeImport = async (req, res, next) => {
+  try {
+    const targetUser = await prisma.user.findUnique({
+      where: { id: req.params.id },
+      select: { id: true, username: true, email: true }
+    });
+
+    if (!targetUser) {
+      return res.status(404).json({ error: 'Utilisateur non trouvé.' });
     }
 
-    const newTaskIndices = new Set();
-    if (resolutions.newTasks) {
-      resolutions.newTasks.forEach(t => newTaskIndices.add(t.index));
+    const summary = await analyzeStream(targetUser.id, req);
+
+    if (summary.totalInFile === 0) {
+      return res.status(400).json({ error: 'Aucune tâche trouvée dans le fichier.' });
     }
 
-    for (let i = 0; i < rawTasks.length; i++) {
-      const task = rawTasks[i];
+    res.json({ targetUser, ...summary });
+  } catch (error) {
+    next(error);
+  }
+};
 
-      if (!task.title) {
-        results.errors.push({ index: i, error: 'Titre manquant' });
-        continue;
-      }
+/**
+ * Import pour admin - application en streaming pour un utilisateur spécifique
+ * POST /api/v1/admin/users/:id/import/stream/apply
+ */
+const adminStreamApplyImport = async (req, res, next) => {
+  try {
+    const adminId = req.user.id;
+    const onConflict = parseConflictPolicy(req);
 
-      try {
-        const resolution = conflictResolutions.get(i);
-
-        if (resolution) {
-          if (resolution.resolution === 'skip') {
-            results.skipped++;
-            continue;
-          } else if (resolution.resolution === 'overwrite' && resolution.existingTaskId) {
-            await updateExistingTask(targetUserId, resolution.existingTaskId, task, categoryMap);
-            results.updated++;
-          } else if (resolution.resolution === 'duplicate') {
-            await createNewTask(targetUserId, task, categoryMap);
-            results.created++;
-          }
-        } else if (newTaskIndices.has(i)) {
-          await createNewTask(targetUserId, task, categoryMap);
-          results.created++;
-        }
-      } catch (err) {
-        results.errors.push({ index: i, title: task.title, error: err.message });
-      }
+    const targetUser = await prisma.user.findUnique({
+      where: { id: req.params.id },
+      select: { id: true, username: true }
+    });
+
+    if (!targetUser) {
+      return res.status(404).json({ error: 'Utilisateur non trouvé.' });
     }
 
-    // Log d'activité pour l'admin
+    const batches = readTaskBatches(req, streamFormat(req), IMPORT_CHUNK_SIZE);
+    const results = await runStreamingImport(targetUser.id, batches, { onConflict });
+
     await createActivityLog({
       ownerId: adminId,
       actorId: adminId,
       action: 'admin_imported_tasks',
       entityType: 'user',
-      entityId: targetUserId,
+      entityId: targetUser.id,
       entityTitle: `Import pour ${targetUser.username}`,
       details: { created: results.created, updated: results.updated, skipped: results.skipped }
     });
 
     res.json({
       success: true,
-      targetUser: {
-        id: targetUser.id,
-        username: targetUser.username
-      },
+      targetUser,
       results
     });
   } catch (error) {
@@ -622,9 +459,26 @@ const adminApplyImport = async (req, res, next) => {
   }
 };
 
+/**
+ * Progression de l'import en cours
+ * GET /api/v1/tasks/import/progress
+ */
+const importProgress = async (req, res, next) => {
+  try {
+    res.json({ progress: await getImportProgress(req.user.id) });
+  } catch (error) {
+    next(error);
+  }
+};
+
 module.exports = {
   analyzeImport,
   applyImport,
+  importProgress,
+  streamAnalyzeImport,
+  streamApplyImport,
   adminAnalyzeImport,
-  adminApplyImport
+  adminApplyImport,
+  adminStreamAnalyzeImport,
+  adminStreamApplyImport
 };
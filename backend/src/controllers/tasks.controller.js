@@ -1,34 +1,15 @@
 const { z } = require('zod');
 const prisma = require('../config/database');
-const { createActivityLog } = require('./activity.controller');
-
-// Helper: Créer les logs d'activité pour owner ET actor (si différents)
-const logActivityForBoth = async ({ ownerId, actorId, action, entityType, entityId, entityTitle, details }) => {
-  // Toujours créer le log pour le owner
-  await createActivityLog({
-    ownerId,
-    actorId,
-    action,
-    entityType,
-    entityId,
-    entityTitle,
-    details
-  });
-
-  // Si l'acteur est différent du owner, créer aussi un log pour l'acteur
-  if (actorId !== ownerId) {
-    await createActivityLog({
-      ownerId: actorId, // Le log appartient à l'acteur
-      actorId,
-      action,
-      entityType,
-      entityId,
-      entityTitle,
-      details,
-      targetOwnerId: ownerId // Référence au propriétaire pour contexte
-    });
-  }
-};
+const { resolveAccess, hasPermission } = require('../services/delegationResolver');
+const { withActivityLog } = require('../services/activityLog');
+const { keysetPaginate, andWhere, clampLimit, cursorPageMeta } = require('../utils/pagination');
+const { searchTasks, sortByRank } = require('../services/taskSearch');
+const { streamTaskExport } = require('../services/taskExport');
+const { getUserTaskStats, formatStats } = require('../services/taskStats');
+const { runTaskBatch, TASK_BATCH_MAX_OPERATIONS } = require('../services/taskBatch');
+const { getTaskChanges, sendIfNotModified } = require('../services/taskSync');
+const { listDelegatedTasks } = require('../services/delegatedTasks');
+const { createTaskProjection, isCompact, REST_DEFAULT_FIELDS } = require('../services/taskProjection');
 
 // Validation schemas
 const createTaskSchema = z.object({
@@ -51,48 +32,44 @@ const updateTaskSchema = z.object({
   dueTime: z.string().optional().nullable()
 });
 
-// Helper: Vérifier les permissions de délégation
-const checkDelegationPermission = async (actorId, ownerId, permission) => {
-  if (actorId === ownerId) return true;
+const batchSchema = z.object({
+  operations: z.array(z.any()).min(1, 'Aucune opération fournie.').max(TASK_BATCH_MAX_OPERATIONS),
+  atomic: z.boolean().default(false),
+  ownerId: z.string().uuid().optional() // Pour les délégués
+});
 
-  const delegation = await prisma.taskDelegation.findFirst({
-    where: {
-      ownerId,
-      delegateId: actorId,
-      status: 'accepted'
-    }
-  });
-
-  if (!delegation) return false;
-
-  switch (permission) {
-    case 'view':
-      return true;
-    case 'create':
-      return delegation.canCreateTasks;
-    case 'edit':
-      return delegation.canEditTasks;
-    case 'delete':
-      return delegation.canDeleteTasks;
-    default:
-      return false;
-  }
+/**
+ * Projection demandée (?fields=, ?compact=true) ou null pour les lignes complètes
+ */
+const parseProjection = (query, defaultFields) => {
+  const { fields, compact } = query;
+  if (!fields && !isCompact(compact)) return null;
+  return createTaskProjection({ fields, compact: isCompact(compact), defaultFields });
 };
 
-// Helper: Obtenir les catégories cachées pour un délégué
-const getHiddenCategoryIds = async (actorId, ownerId) => {
-  if (actorId === ownerId) return [];
-
-  const delegation = await prisma.taskDelegation.findFirst({
-    where: {
-      ownerId,
-      delegateId: actorId,
-      status: 'accepted'
-    }
-  });
+/**
+ * Lecture Prisma : colonnes projetées ou tâche complète avec sa catégorie
+ * (extraFields : colonnes nécessaires au tri et au curseur)
+ */
+const taskRead = (projection, extraFields) => (
+  projection ? { select: projection.select(extraFields) } : { include: { category: true } }
+);
+
+/**
+ * Réponse d'une liste : sérialiseur précompilé de la projection, ou res.json
+ */
+const sendTaskList = (res, projection, tasks, meta) => {
+  if (!projection) return res.json({ tasks, ...meta });
+  res.type('application/json').send(projection.render(tasks, meta));
+};
 
-  if (!delegation || !delegation.hiddenCategoryIds) return [];
-  return delegation.hiddenCategoryIds.split(',').filter(Boolean);
+// Type des clés de tri pour la pagination par curseur
+const TASK_SORT_KEYS = {
+  createdAt: { type: 'date' },
+  updatedAt: { type: 'date' },
+  dueDate: { type: 'date', nullable: true },
+  importance: {},
+  title: {}
 };
 
 const getTasks = async (req, res, next) => {
@@ -104,24 +81,49 @@ const getTasks = async (req, res, next) => {
       search = '',
       importance,
       categoryId,
-      limit = 50,
+      limit,
       offset = 0,
+      cursor,
+      pagination,
+      count,
+      since,
       ownerId // Pour les délégués
     } = req.query;
 
     const actorId = req.user.id;
     const targetOwnerId = ownerId || actorId;
 
+    // Champs renvoyés (?fields=id,title,...) et mode compact (catégories en table à part)
+    const projection = parseProjection(req.query, REST_DEFAULT_FIELDS);
+
+    // Taille de page bornée (voir PAGE_MAX_LIMIT), quel que soit le mode de pagination
+    const take = clampLimit(limit);
+    const skip = Math.max(parseInt(offset, 10) || 0, 0);
+
     // Vérifier les permissions si on accède aux tâches de quelqu'un d'autre
-    if (targetOwnerId !== actorId) {
-      const hasAccess = await checkDelegationPermission(actorId, targetOwnerId, 'view');
-      if (!hasAccess) {
-        return res.status(403).json({ error: 'Accès non autorisé.' });
-      }
+    const access = await resolveAccess(actorId, targetOwnerId, req);
+    if (!hasPermission(access, 'view')) {
+      return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
-    // Récupérer les catégories cachées
-    const hiddenCategoryIds = await getHiddenCategoryIds(actorId, targetOwnerId);
+    // Synchronisation incrémentale : ?since=0 puis ?since=nextSince (les autres filtres sont ignorés)
+    if (since !== undefined) {
+      const changes = await getTaskChanges({
+        ownerId: targetOwnerId,
+        since,
+        limit: req.query.limit,
+        hiddenCategoryIds: access.hiddenCategoryIds
+      });
+      return res.json(changes);
+    }
+
+    // Liste inchangée depuis l'ETag du client : 304 sans lire les tâches
+    if (await sendIfNotModified(req, res, { ownerId: targetOwnerId, hiddenCategoryIds: access.hiddenCategoryIdList })) {
+      return;
+    }
+
+    // Catégories cachées pour les délégués
+    const hiddenCategoryIds = access.hiddenCategoryIdList;
 
     // Build where clause
     const where = {
@@ -150,22 +152,20 @@ const getTasks = async (req, res, next) => {
       }
     }
 
-    if (search) {
-      const searchCondition = [
-        { title: { contains: search, mode: 'insensitive' } },
-        { description: { contains: search, mode: 'insensitive' } }
-      ];
-
-      if (where.OR) {
-        // Combiner avec les conditions existantes
-        where.AND = [
-          { OR: where.OR },
-          { OR: searchCondition }
-        ];
-        delete where.OR;
-      } else {
-        where.OR = searchCondition;
-      }
+    // Recherche plein texte (index tsvector + trigrammes)
+    // Les filtres sont repris dans la requête classée pour que la limite de résultats porte sur les tâches filtrées
+    let rankedIds = null;
+    const searchFilter = search
+      ? await searchTasks(targetOwnerId, search, {
+        status: where.status,
+        importance: where.importance,
+        categoryId: where.categoryId,
+        hiddenCategoryIds
+      })
+      : null;
+    if (searchFilter) {
+      where.AND = [searchFilter.where];
+      rankedIds = searchFilter.rankedIds;
     }
 
     // Build orderBy
@@ -177,8 +177,52 @@ const getTasks = async (req, res, next) => {
       updated_at: 'updatedAt'
     };
 
+    // Tri par pertinence : l'ensemble des résultats est borné par SEARCH_MAX_RESULTS
+    if (sort_by === 'relevance' && rankedIds && !cursor && pagination !== 'cursor') {
+      const matches = await prisma.task.findMany({
+        where,
+        ...taskRead(projection, [])
+      });
+
+      return sendTaskList(res, projection, sortByRank(matches, rankedIds).slice(skip, skip + take), {
+        total: matches.length,
+        limit: take,
+        offset: skip
+      });
+    }
+
+    const sortField = orderByMap[sort_by] || 'createdAt';
+    const direction = sort_order === 'asc' ? 'asc' : 'desc';
+
+    // Pagination par curseur (keyset) : ?pagination=cursor pour la première page, puis ?cursor=nextCursor
+    if (pagination === 'cursor' || cursor) {
+      const keyset = keysetPaginate({
+        keys: [
+          { field: sortField, direction, ...TASK_SORT_KEYS[sortField] },
+          { field: 'id', direction }
+        ],
+        cursor,
+        limit: take
+      });
+
+      // Le total est optionnel en mode curseur (?count=exact)
+      const [rows, total] = await Promise.all([
+        prisma.task.findMany({
+          where: andWhere(where, keyset.where),
+          orderBy: keyset.orderBy,
+          take: keyset.take,
+          ...taskRead(projection, [sortField])
+        }),
+        count === 'exact' ? prisma.task.count({ where }) : null
+      ]);
+
+      const { items, nextCursor } = keyset.page(rows);
+
+      return sendTaskList(res, projection, items, cursorPageMeta({ nextCursor, limit: take, total }));
+    }
+
     const orderBy = {
-      [orderByMap[sort_by] || 'createdAt']: sort_order === 'asc' ? 'asc' : 'desc'
+      [sortField]: direction
     };
 
     // Get tasks with pagination and include category
@@ -186,21 +230,55 @@ const getTasks = async (req, res, next) => {
       prisma.task.findMany({
         where,
         orderBy,
-        take: parseInt(limit),
-        skip: parseInt(offset),
-        include: {
-          category: true
-        }
+        take,
+        skip,
+        ...taskRead(projection, [])
       }),
       prisma.task.count({ where })
     ]);
 
-    res.json({
-      tasks,
+    sendTaskList(res, projection, tasks, {
       total,
-      limit: parseInt(limit),
-      offset: parseInt(offset)
+      limit: take,
+      offset: skip
+    });
+  } catch (error) {
+    next(error);
+  }
+};
+
+// Vue consolidée des tâches de tous les owners ayant délégué à l'utilisateur
+const getDelegatedTasks = async (req, res, next) => {
+  try {
+    const {
+      ownerIds, // Sous-ensemble d'owners, séparés par des virgules
+      status = 'all',
+      importance,
+      sort_by,
+      sort_order,
+      limit,
+      cursor,
+      count
+    } = req.query;
+
+    // ownerId (propriétaire de chaque tâche) fait partie des champs par défaut
+    const projection = parseProjection(req.query, [...REST_DEFAULT_FIELDS, 'ownerId']);
+
+    const { tasks, ...meta } = await listDelegatedTasks({
+      delegateId: req.user.id,
+      ownerIds: ownerIds ? String(ownerIds).split(',').filter(Boolean) : null,
+      status,
+      importance,
+      sortBy: sort_by,
+      sortOrder: sort_order,
+      limit,
+      cursor,
+      count: count === 'exact',
+      projection,
+      req
     });
+
+    sendTaskList(res, projection, tasks, meta);
   } catch (error) {
     next(error);
   }
@@ -220,17 +298,14 @@ const getTask = async (req, res, next) => {
     }
 
     // Vérifier les permissions
-    const hasAccess = await checkDelegationPermission(actorId, task.userId, 'view');
-    if (!hasAccess) {
+    const access = await resolveAccess(actorId, task.userId, req);
+    if (!hasPermission(access, 'view')) {
       return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
     // Vérifier si la catégorie est cachée
-    if (task.categoryId) {
-      const hiddenCategoryIds = await getHiddenCategoryIds(actorId, task.userId);
-      if (hiddenCategoryIds.includes(task.categoryId)) {
-        return res.status(403).json({ error: 'Accès non autorisé.' });
-      }
+    if (task.categoryId && access.hiddenCategoryIds.has(task.categoryId)) {
+      return res.status(403).json({ error: 'Accès non autorisé.' });
     }
 
     res.json({ task });
@@ -246,11 +321,9 @@ const createTask = async (req, res, next) => {
     const targetOwnerId = data.ownerId || actorId;
 
     // Vérifier les permissions si on crée pour quelqu'un d'autre
-    if (targetOwnerId !== actorId) {
-      const hasPermission = await checkDelegationPermission(actorId, targetOwnerId, 'create');
-      if (!hasPermission) {
-        return res.status(403).json({ error: 'Vous n\'avez pas la permission de créer des tâches.' });
-      }
+    const access = await resolveAccess(actorId, targetOwnerId, req);
+    if (!hasPermission(access, 'create')) {
+      return res.status(403).json({ error: 'Vous n\'avez pas la permission de créer des tâches.' });
     }
 
     // Verify category belongs to target owner if provided
@@ -263,38 +336,36 @@ const createTask = async (req, res, next) => {
       }
 
       // Vérifier que la catégorie n'est pas cachée pour le délégué
-      if (targetOwnerId !== actorId) {
-        const hiddenCategoryIds = await getHiddenCategoryIds(actorId, targetOwnerId);
-        if (hiddenCategoryIds.includes(data.categoryId)) {
-          return res.status(403).json({ error: 'Cette catégorie n\'est pas accessible.' });
-        }
+      if (access.hiddenCategoryIds.has(data.categoryId)) {
+        return res.status(403).json({ error: 'Cette catégorie n\'est pas accessible.' });
       }
     }
 
-    const task = await prisma.task.create({
-      data: {
-        userId: targetOwnerId,
-        title: data.title,
-        description: data.description || null,
-        importance: data.importance,
-        categoryId: data.categoryId || null,
-        dueDate: data.dueDate ? new Date(data.dueDate) : null,
-        dueTime: data.dueTime || null
-      },
-      include: {
-        category: true
-      }
-    });
-
-    // Log d'activité (pour owner ET actor si différents)
-    await logActivityForBoth({
-      ownerId: targetOwnerId,
-      actorId,
-      action: 'created_task',
-      entityType: 'task',
-      entityId: task.id,
-      entityTitle: task.title
-    });
+    // Mutation et log d'activité (pour owner ET actor si différents)
+    const task = await withActivityLog(
+      (db) => db.task.create({
+        data: {
+          userId: targetOwnerId,
+          title: data.title,
+          description: data.description || null,
+          importance: data.importance,
+          categoryId: data.categoryId || null,
+          dueDate: data.dueDate ? new Date(data.dueDate) : null,
+          dueTime: data.dueTime || null
+        },
+        include: {
+          category: true
+        }
+      }),
+      (task) => ({
+        ownerId: targetOwnerId,
+        actorId,
+        action: 'created_task',
+        entityType: 'task',
+        entityId: task.id,
+        entityTitle: task.title
+      })
+    );
 
     res.status(201).json({ task });
   } catch (error) {
@@ -317,8 +388,8 @@ const updateTask = async (req, res, next) => {
     }
 
     // Vérifier les permissions
-    const hasPermission = await checkDelegationPermission(actorId, existingTask.userId, 'edit');
-    if (!hasPermission) {
+    const access = await resolveAccess(actorId, existingTask.userId, req);
+    if (!hasPermission(access, 'edit')) {
       return res.status(403).json({ error: 'Vous n\'avez pas la permission de modifier cette tâche.' });
     }
 
@@ -332,11 +403,8 @@ const updateTask = async (req, res, next) => {
       }
 
       // Vérifier que la catégorie n'est pas cachée pour le délégué
-      if (existingTask.userId !== actorId) {
-        const hiddenCategoryIds = await getHiddenCategoryIds(actorId, existingTask.userId);
-        if (hiddenCategoryIds.includes(data.categoryId)) {
-          return res.status(403).json({ error: 'Cette catégorie n\'est pas accessible.' });
-        }
+      if (access.hiddenCategoryIds.has(data.categoryId)) {
+        return res.status(403).json({ error: 'Cette catégorie n\'est pas accessible.' });
       }
     }
 
@@ -346,32 +414,33 @@ const updateTask = async (req, res, next) => {
     if (data.status && data.status !== existingTask.status) changes.status = { old: existingTask.status, new: data.status };
     if (data.importance && data.importance !== existingTask.importance) changes.importance = { old: existingTask.importance, new: data.importance };
 
-    const task = await prisma.task.update({
-      where: { id: req.params.id },
-      data: {
-        ...(data.title && { title: data.title }),
-        ...(data.description !== undefined && { description: data.description }),
-        ...(data.importance && { importance: data.importance }),
-        ...(data.status && { status: data.status }),
-        ...(data.categoryId !== undefined && { categoryId: data.categoryId }),
-        ...(data.dueDate !== undefined && { dueDate: data.dueDate ? new Date(data.dueDate) : null }),
-        ...(data.dueTime !== undefined && { dueTime: data.dueTime })
-      },
-      include: {
-        category: true
-      }
-    });
-
-    // Log d'activité (pour owner ET actor si différents)
-    await logActivityForBoth({
-      ownerId: existingTask.userId,
-      actorId,
-      action: 'updated_task',
-      entityType: 'task',
-      entityId: task.id,
-      entityTitle: task.title,
-      details: Object.keys(changes).length > 0 ? changes : null
-    });
+    // Mutation et log d'activité (pour owner ET actor si différents)
+    const task = await withActivityLog(
+      (db) => db.task.update({
+        where: { id: req.params.id },
+        data: {
+          ...(data.title && { title: data.title }),
+          ...(data.description !== undefined && { description: data.description }),
+          ...(data.importance && { importance: data.importance }),
+          ...(data.status && { status: data.status }),
+          ...(data.categoryId !== undefined && { categoryId: data.categoryId }),
+          ...(data.dueDate !== undefined && { dueDate: data.dueDate ? new Date(data.dueDate) : null }),
+          ...(data.dueTime !== undefined && { dueTime: data.dueTime })
+        },
+        include: {
+          category: true
+        }
+      }),
+      (task) => ({
+        ownerId: existingTask.userId,
+        actorId,
+        action: 'updated_task',
+        entityType: 'task',
+        entityId: task.id,
+        entityTitle: task.title,
+        details: Object.keys(changes).length > 0 ? changes : null
+      })
+    );
 
     res.json({ task });
   } catch (error) {
@@ -393,24 +462,25 @@ const deleteTask = async (req, res, next) => {
     }
 
     // Vérifier les permissions
-    const hasPermission = await checkDelegationPermission(actorId, existingTask.userId, 'delete');
-    if (!hasPermission) {
+    const access = await resolveAccess(actorId, existingTask.userId, req);
+    if (!hasPermission(access, 'delete')) {
       return res.status(403).json({ error: 'Vous n\'avez pas la permission de supprimer cette tâche.' });
     }
 
-    await prisma.task.delete({
-      where: { id: req.params.id }
-    });
-
-    // Log d'activité (pour owner ET actor si différents)
-    await logActivityForBoth({
-      ownerId: existingTask.userId,
-      actorId,
-      action: 'deleted_task',
-      entityType: 'task',
-      entityId: existingTask.id,
-      entityTitle: existingTask.title
-    });
+    // Mutation et log d'activité (pour owner ET actor si différents)
+    await withActivityLog(
+      (db) => db.task.delete({
+        where: { id: req.params.id }
+      }),
+      () => ({
+        ownerId: existingTask.userId,
+        actorId,
+        action: 'deleted_task',
+        entityType: 'task',
+        entityId: existingTask.id,
+        entityTitle: existingTask.title
+      })
+    );
 
     res.status(204).send();
   } catch (error) {
@@ -432,28 +502,29 @@ const completeTask = async (req, res, next) => {
     }
 
     // Vérifier les permissions
-    const hasPermission = await checkDelegationPermission(actorId, existingTask.userId, 'edit');
-    if (!hasPermission) {
+    const access = await resolveAccess(actorId, existingTask.userId, req);
+    if (!hasPermission(access, 'edit')) {
       return res.status(403).json({ error: 'Vous n\'avez pas la permission de modifier cette tâche.' });
     }
 
-    const task = await prisma.task.update({
-      where: { id: req.params.id },
-      data: {
-        status: 'completed',
-        completedAt: new Date()
-      }
-    });
-
-    // Log d'activité (pour owner ET actor si différents)
-    await logActivityForBoth({
-      ownerId: existingTask.userId,
-      actorId,
-      action: 'completed_task',
-      entityType: 'task',
-      entityId: task.id,
-      entityTitle: task.title
-    });
+    // Mutation et log d'activité (pour owner ET actor si différents)
+    const task = await withActivityLog(
+      (db) => db.task.update({
+        where: { id: req.params.id },
+        data: {
+          status: 'completed',
+          completedAt: new Date()
+        }
+      }),
+      (task) => ({
+        ownerId: existingTask.userId,
+        actorId,
+        action: 'completed_task',
+        entityType: 'task',
+        entityId: task.id,
+        entityTitle: task.title
+      })
+    );
 
     res.json({ task });
   } catch (error) {
@@ -475,30 +546,59 @@ const reopenTask = async (req, res, next) => {
     }
 
     // Vérifier les permissions
-    const hasPermission = await checkDelegationPermission(actorId, existingTask.userId, 'edit');
-    if (!hasPermission) {
+    const access = await resolveAccess(actorId, existingTask.userId, req);
+    if (!hasPermission(access, 'edit')) {
       return res.status(403).json({ error: 'Vous n\'avez pas la permission de modifier cette tâche.' });
     }
 
-    const task = await prisma.task.update({
-      where: { id: req.params.id },
-      data: {
-        status: 'active',
-        completedAt: null
-      }
-    });
+    // Mutation et log d'activité (pour owner ET actor si différents)
+    const task = await withActivityLog(
+      (db) => db.task.update({
+        where: { id: req.params.id },
+        data: {
+          status: 'active',
+          completedAt: null
+        }
+      }),
+      (task) => ({
+        ownerId: existingTask.userId,
+        actorId,
+        action: 'reopened_task',
+        entityType: 'task',
+        entityId: task.id,
+        entityTitle: task.title
+      })
+    );
+
+    res.json({ task });
+  } catch (error) {
+    next(error);
+  }
+};
+
+// Lot d'opérations (create/update/complete/reopen/delete) appliqué en une transaction
+const batchTasks = async (req, res, next) => {
+  try {
+    const data = batchSchema.parse(req.body);
+    const actorId = req.user.id;
+    const targetOwnerId = data.ownerId || actorId;
 
-    // Log d'activité (pour owner ET actor si différents)
-    await logActivityForBoth({
-      ownerId: existingTask.userId,
+    const access = await resolveAccess(actorId, targetOwnerId, req);
+    if (!access) {
+      return res.status(403).json({ error: 'Accès non autorisé.' });
+    }
+
+    const result = await runTaskBatch({
       actorId,
-      action: 'reopened_task',
-      entityType: 'task',
-      entityId: task.id,
-      entityTitle: task.title
+      ownerId: targetOwnerId,
+      access,
+      apiToken: req.authMethod === 'pat' ? req.apiToken : null,
+      operations: data.operations,
+      atomic: data.atomic
     });
 
-    res.json({ task });
+    // Mode atomique : une opération invalide annule tout le lot
+    res.status(data.atomic && result.failed > 0 ? 400 : 200).json(result);
   } catch (error) {
     next(error);
   }
@@ -506,125 +606,24 @@ const reopenTask = async (req, res, next) => {
 
 const getStats = async (req, res, next) => {
   try {
-    const userId = req.user.id;
-
-    const [total, active, completed, highPriority, overdue] = await Promise.all([
-      prisma.task.count({ where: { userId } }),
-      prisma.task.count({ where: { userId, status: 'active' } }),
-      prisma.task.count({ where: { userId, status: 'completed' } }),
-      prisma.task.count({ where: { userId, importance: 'high', status: 'active' } }),
-      prisma.task.count({
-        where: {
-          userId,
-          status: 'active',
-          dueDate: { lt: new Date() }
-        }
-      })
-    ]);
-
-    res.json({
-      total_tasks: total,
-      active_tasks: active,
-      completed_tasks: completed,
-      high_priority_tasks: highPriority,
-      overdue_tasks: overdue,
-      completion_rate: total > 0 ? Math.round((completed / total) * 100 * 10) / 10 : 0
-    });
+    // Tous les compteurs en une requête (ou depuis les agrégats, cf. TASK_STATS_SOURCE)
+    const stats = await getUserTaskStats(req.user.id);
+    res.json(formatStats(stats));
   } catch (error) {
     next(error);
   }
 };
 
-// Export tasks in JSON or XML format
+// Export tasks in JSON or XML format (streamed in keyset batches, gzip if accepted)
 const exportTasks = async (req, res, next) => {
   try {
     const { format = 'json' } = req.query;
-    const userId = req.user.id;
 
-    // Get all tasks with categories
-    const tasks = await prisma.task.findMany({
-      where: { userId },
-      include: { category: true },
-      orderBy: { createdAt: 'desc' }
+    await streamTaskExport(req, res, {
+      userId: req.user.id,
+      format,
+      filename: `tasks-export-${new Date().toISOString().split('T')[0]}`
     });
-
-    // Format tasks for export
-    const exportData = tasks.map(task => ({
-      id: task.id,
-      title: task.title,
-      description: task.description,
-      status: task.status,
-      importance: task.importance,
-      category: task.category ? {
-        name: task.category.name,
-        color: task.category.color
-      } : null,
-      dueDate: task.dueDate,
-      dueTime: task.dueTime,
-      completedAt: task.completedAt,
-      createdAt: task.createdAt,
-      updatedAt: task.updatedAt
-    }));
-
-    if (format === 'xml') {
-      // Convert to XML
-      const tasksToXml = (tasks) => {
-        let xml = '<?xml version="1.0" encoding="UTF-8"?>\n<tasks>\n';
-
-        for (const task of tasks) {
-          xml += '  <task>\n';
-          xml += `    <id>${escapeXml(task.id)}</id>\n`;
-          xml += `    <title>${escapeXml(task.title)}</title>\n`;
-          xml += `    <description>${escapeXml(task.description || '')}</description>\n`;
-          xml += `    <status>${escapeXml(task.status)}</status>\n`;
-          xml += `    <importance>${escapeXml(task.importance)}</importance>\n`;
-
-          if (task.category) {
-            xml += '    <category>\n';
-            xml += `      <name>${escapeXml(task.category.name)}</name>\n`;
-            xml += `      <color>${escapeXml(task.category.color)}</color>\n`;
-            xml += '    </category>\n';
-          } else {
-            xml += '    <category/>\n';
-          }
-
-          xml += `    <dueDate>${task.dueDate ? task.dueDate.toISOString() : ''}</dueDate>\n`;
-          xml += `    <dueTime>${escapeXml(task.dueTime || '')}</dueTime>\n`;
-          xml += `    <completedAt>${task.completedAt ? task.completedAt.toISOString() : ''}</completedAt>\n`;
-          xml += `    <createdAt>${task.createdAt.toISOString()}</createdAt>\n`;
-          xml += `    <updatedAt>${task.updatedAt.toISOString()}</updatedAt>\n`;
-          xml += '  </task>\n';
-        }
-
-        xml += '</tasks>';
-        return xml;
-      };
-
-      const escapeXml = (str) => {
-        if (!str) return '';
-        return str
-          .replace(/&/g, '&amp;')
-          .replace(/</g, '&lt;')
-          .replace(/>/g, '&gt;')
-          .replace(/"/g, '&quot;')
-          .replace(/'/g, '&apos;');
-      };
-
-      const xml = tasksToXml(exportData);
-
-      res.set('Content-Type', 'application/xml');
-      res.set('Content-Disposition', `attachment; filename="tasks-export-${new Date().toISOString().split('T')[0]}.xml"`);
-      res.send(xml);
-    } else {
-      // JSON format (default)
-      res.set('Content-Type', 'application/json');
-      res.set('Content-Disposition', `attachment; filename="tasks-export-${new Date().toISOString().split('T')[0]}.json"`);
-      res.json({
-        exportDate: new Date().toISOString(),
-        totalTasks: exportData.length,
-        tasks: exportData
-      });
-    }
   } catch (error) {
     next(error);
   }
@@ -632,12 +631,14 @@ const exportTasks = async (req, res, next) => {
 
 module.exports = {
   getTasks,
+  getDelegatedTasks,
   getTask,
   createTask,
   updateTask,
   deleteTask,
   completeTask,
   reopenTask,
+  batchTasks,
   getStats,
   exportTasks
 };
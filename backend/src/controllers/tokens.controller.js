@@ -1,6 +1,8 @@
 const crypto = require('crypto')
 const prisma = require('../config/database')
 const { hashToken } = require('../middleware/pat')
+const { invalidateApiToken } = require('../services/authCache')
+const { getPendingTokenUsage } = require('../services/tokenUsage')
 
 /**
  * Génère un token PAT sécurisé
@@ -12,6 +14,19 @@ const generateToken = (userId) => {
   return `pat_${prefix}_${random}`
 }
 
+/**
+ * Applique le dernier usage encore en attente d'écriture (buffer tokenUsage)
+ */
+const withPendingUsage = (token) => {
+  const usage = getPendingTokenUsage(token.id)
+  if (!usage) return token
+  return {
+    ...token,
+    lastUsedAt: usage.lastUsedAt,
+    lastUsedIp: usage.lastUsedIp || token.lastUsedIp
+  }
+}
+
 /**
  * Liste les tokens de l'utilisateur connecté
  * GET /api/v1/tokens
@@ -39,7 +54,7 @@ const listTokens = async (req, res, next) => {
       orderBy: { createdAt: 'desc' }
     })
 
-    res.json({ tokens })
+    res.json({ tokens: tokens.map(withPendingUsage) })
   } catch (error) {
     next(error)
   }
@@ -177,7 +192,7 @@ const getToken = async (req, res, next) => {
       return res.status(404).json({ error: 'Token non trouvé.' })
     }
 
-    res.json({ token })
+    res.json({ token: withPendingUsage(token) })
   } catch (error) {
     next(error)
   }
@@ -245,6 +260,8 @@ const updateToken = async (req, res, next) => {
       }
     })
 
+    invalidateApiToken(existingToken.tokenHash)
+
     res.json({ message: 'Token mis à jour.', token })
   } catch (error) {
     next(error)
@@ -276,6 +293,8 @@ const revokeToken = async (req, res, next) => {
       data: { isActive: false }
     })
 
+    invalidateApiToken(existingToken.tokenHash)
+
     res.json({ message: 'Token révoqué avec succès.' })
   } catch (error) {
     next(error)
@@ -306,6 +325,8 @@ const deleteToken = async (req, res, next) => {
       where: { id }
     })
 
+    invalidateApiToken(existingToken.tokenHash)
+
     res.json({ message: 'Token supprimé définitivement.' })
   } catch (error) {
     next(error)
@@ -6,13 +6,74 @@ const {
   ListToolsRequestSchema
 } = require('@modelcontextprotocol/sdk/types.js')
 
-const prisma = require('../config/database')
 const { hashToken } = require('../middleware/pat')
+const { loadApiToken } = require('../services/authCache')
+const { recordTokenUsage } = require('../services/tokenUsage')
 const tasksTools = require('./tools/tasks.tools')
 const categoriesTools = require('./tools/categories.tools')
+const { sessionManager } = require('./sessionManager')
+const { METRICS_ENABLED, observeToolCall } = require('../services/metrics')
+
+// Registre des outils, construit une seule fois et partagé par toutes les sessions
+const TOOL_DEFINITIONS = [
+  ...tasksTools.getToolDefinitions(),
+  ...categoriesTools.getToolDefinitions()
+]
+
+const TOOL_HANDLERS = new Map(TOOL_DEFINITIONS.map(tool => [
+  tool.name,
+  tool.name.startsWith('tasks_') ? tasksTools.handleTool : categoriesTools.handleTool
+]))
+
+const listTools = async () => ({ tools: TOOL_DEFINITIONS })
+
+/**
+ * Exécute un outil pour un contexte d'authentification { user, apiToken }
+ */
+const callTool = async (authContext, request) => {
+  const { name, arguments: args } = request.params
+  const { user, apiToken } = authContext || {}
+
+  if (!user) {
+    return {
+      content: [{ type: 'text', text: 'Erreur: Utilisateur non authentifié.' }],
+      isError: true
+    }
+  }
+
+  const handler = TOOL_HANDLERS.get(name)
+  if (!handler) {
+    return {
+      content: [{ type: 'text', text: `Outil inconnu: ${name}` }],
+      isError: true
+    }
+  }
+
+  const start = process.hrtime.bigint()
+  let result
+  try {
+    result = await handler(name, args, user, apiToken)
+  } catch (error) {
+    console.error(`Erreur MCP tool ${name}:`, error)
+    result = {
+      content: [{ type: 'text', text: `Erreur: ${error.message}` }],
+      isError: true
+    }
+  }
+
+  if (METRICS_ENABLED) {
+    observeToolCall({
+      tool: name,
+      durationMs: Number(process.hrtime.bigint() - start) / 1e6,
+      failed: Boolean(result?.isError)
+    })
+  }
+  return result
+}
 
 /**
- * Crée une instance du serveur MCP pour un utilisateur authentifié
+ * Crée une instance du serveur MCP pour un utilisateur authentifié.
+ * Seul le contexte d'auth est propre à la session : les handlers sont partagés.
  * @param {Object} authContext - Contexte d'authentification { user, apiToken }
  */
 const createMcpServer = (authContext) => {
@@ -31,52 +92,8 @@ const createMcpServer = (authContext) => {
   // Stocker le contexte d'auth dans le serveur
   server.authContext = authContext
 
-  // Liste des outils disponibles
-  server.setRequestHandler(ListToolsRequestSchema, async () => {
-    return {
-      tools: [
-        ...tasksTools.getToolDefinitions(),
-        ...categoriesTools.getToolDefinitions()
-      ]
-    }
-  })
-
-  // Gestionnaire d'appel d'outils
-  server.setRequestHandler(CallToolRequestSchema, async (request) => {
-    const { name, arguments: args } = request.params
-
-    // Récupérer le contexte utilisateur depuis le serveur
-    const { user, apiToken } = server.authContext || {}
-
-    if (!user) {
-      return {
-        content: [{ type: 'text', text: 'Erreur: Utilisateur non authentifié.' }],
-        isError: true
-      }
-    }
-
-    try {
-      // Router vers le bon handler
-      if (name.startsWith('tasks_')) {
-        return await tasksTools.handleTool(name, args, user, apiToken)
-      }
-
-      if (name.startsWith('categories_')) {
-        return await categoriesTools.handleTool(name, args, user, apiToken)
-      }
-
-      return {
-        content: [{ type: 'text', text: `Outil inconnu: ${name}` }],
-        isError: true
-      }
-    } catch (error) {
-      console.error(`Erreur MCP tool ${name}:`, error)
-      return {
-        content: [{ type: 'text', text: `Erreur: ${error.message}` }],
-        isError: true
-      }
-    }
-  })
+  server.setRequestHandler(ListToolsRequestSchema, listTools)
+  server.setRequestHandler(CallToolRequestSchema, (request) => callTool(server.authContext, request))
 
   return server
 }
@@ -84,29 +101,14 @@ const createMcpServer = (authContext) => {
 /**
  * Authentifie un utilisateur via PAT pour MCP
  */
-const authenticatePat = async (token) => {
+const authenticatePat = async (token, ip) => {
   if (!token || !token.startsWith('pat_')) {
     return null
   }
 
   const tokenHash = hashToken(token)
 
-  const apiToken = await prisma.apiToken.findUnique({
-    where: { tokenHash },
-    include: {
-      user: {
-        select: {
-          id: true,
-          email: true,
-          username: true,
-          firstName: true,
-          lastName: true,
-          role: true,
-          isActive: true
-        }
-      }
-    }
-  })
+  const apiToken = await loadApiToken(tokenHash)
 
   if (!apiToken || !apiToken.isActive || !apiToken.user.isActive) {
     return null
@@ -117,11 +119,8 @@ const authenticatePat = async (token) => {
     return null
   }
 
-  // Mettre à jour lastUsedAt
-  prisma.apiToken.update({
-    where: { id: apiToken.id },
-    data: { lastUsedAt: new Date() }
-  }).catch(err => console.error('Erreur mise à jour lastUsedAt MCP:', err))
+  // Mettre à jour lastUsedAt (écriture groupée différée)
+  recordTokenUsage(apiToken.id, ip)
 
   return {
     user: apiToken.user,
@@ -144,11 +143,7 @@ const authenticatePat = async (token) => {
  * Configure les routes MCP (SSE + Streamable HTTP) sur l'application Express
  */
 const setupMcpRoutes = (app) => {
-  // Map pour stocker les transports actifs par sessionId (SSE)
-  const activeTransports = new Map()
-
-  // Map pour stocker les sessions Streamable HTTP
-  const streamableSessions = new Map()
+  // Sessions SSE et Streamable HTTP : voir sessionManager (TTL d'inactivité, plafonds)
 
   // Endpoint SSE pour la connexion MCP
   app.get('/mcp/sse', async (req, res) => {
@@ -159,7 +154,7 @@ const setupMcpRoutes = (app) => {
     }
 
     const token = authHeader.split(' ')[1]
-    const auth = await authenticatePat(token)
+    const auth = await authenticatePat(token, req.ip)
 
     if (!auth) {
       return res.status(401).json({ error: 'Token API invalide ou expiré.' })
@@ -176,8 +171,9 @@ const setupMcpRoutes = (app) => {
     // Récupérer le sessionId généré par le transport
     const sessionId = transport.sessionId
 
-    // Stocker le transport avec le contexte utilisateur
-    activeTransports.set(sessionId, {
+    // Enregistrer la session (peut fermer les plus anciennes de l'utilisateur)
+    sessionManager.add(sessionId, {
+      kind: 'sse',
       transport,
       context: auth,
       server
@@ -191,8 +187,7 @@ const setupMcpRoutes = (app) => {
     // Nettoyer à la déconnexion
     res.on('close', () => {
       console.log(`MCP SSE déconnexion: ${auth.user.username} (session: ${sessionId})`)
-      activeTransports.delete(sessionId)
-      server.close()
+      sessionManager.remove(sessionId)
     })
   })
 
@@ -206,9 +201,9 @@ const setupMcpRoutes = (app) => {
     }
 
     // Trouver le transport actif pour cette session
-    const session = activeTransports.get(sessionId)
+    const session = sessionManager.get(sessionId)
 
-    if (!session) {
+    if (!session || session.kind !== 'sse') {
       return res.status(400).json({ error: 'Session MCP non trouvée. Reconnectez-vous à /mcp/sse.' })
     }
 
@@ -216,7 +211,7 @@ const setupMcpRoutes = (app) => {
     const authHeader = req.headers.authorization
     if (authHeader && authHeader.startsWith('Bearer ')) {
       const token = authHeader.split(' ')[1]
-      const auth = await authenticatePat(token)
+      const auth = await authenticatePat(token, req.ip)
 
       if (auth && auth.user.id !== session.context.user.id) {
         return res.status(403).json({ error: 'Token ne correspond pas à la session.' })
@@ -251,7 +246,7 @@ const setupMcpRoutes = (app) => {
     }
 
     const token = authHeader.split(' ')[1]
-    const auth = await authenticatePat(token)
+    const auth = await authenticatePat(token, req.ip)
 
     if (!auth) {
       return res.status(401).json({
@@ -263,9 +258,9 @@ const setupMcpRoutes = (app) => {
 
     // Vérifier si c'est une session existante
     const sessionId = req.headers['mcp-session-id']
-    let session = sessionId ? streamableSessions.get(sessionId) : null
+    const session = sessionId ? sessionManager.get(sessionId) : null
 
-    if (session) {
+    if (session && session.kind === 'streamable') {
       // Session existante - utiliser le transport existant
       try {
         await session.transport.handleRequest(req, res)
@@ -289,28 +284,26 @@ const setupMcpRoutes = (app) => {
           sessionIdGenerator: () => require('crypto').randomUUID(),
           onsessioninitialized: (newSessionId) => {
             console.log(`MCP Streamable session créée: ${newSessionId}`)
-            streamableSessions.set(newSessionId, {
+            sessionManager.add(newSessionId, {
+              kind: 'streamable',
               transport,
               server,
-              context: auth,
-              createdAt: new Date()
+              context: auth
             })
           }
         })
 
-        // Connecter le serveur au transport
-        await server.connect(transport)
-
-        // Gérer la fermeture
+        // Gérer la fermeture (avant connect pour que le serveur chaîne son propre handler)
         transport.onclose = () => {
           const sid = transport.sessionId
-          if (sid) {
+          if (sid && sessionManager.remove(sid)) {
             console.log(`MCP Streamable session fermée: ${sid}`)
-            streamableSessions.delete(sid)
-            server.close()
           }
         }
 
+        // Connecter le serveur au transport
+        await server.connect(transport)
+
         // Traiter la requête
         await transport.handleRequest(req, res)
       } catch (error) {
@@ -338,8 +331,8 @@ const setupMcpRoutes = (app) => {
       })
     }
 
-    const session = streamableSessions.get(sessionId)
-    if (!session) {
+    const session = sessionManager.get(sessionId)
+    if (!session || session.kind !== 'streamable') {
       return res.status(404).json({
         jsonrpc: '2.0',
         error: { code: -32001, message: 'Session non trouvée.' },
@@ -351,7 +344,7 @@ const setupMcpRoutes = (app) => {
     const authHeader = req.headers.authorization
     if (authHeader && authHeader.startsWith('Bearer ')) {
       const token = authHeader.split(' ')[1]
-      const auth = await authenticatePat(token)
+      const auth = await authenticatePat(token, req.ip)
       if (auth && auth.user.id !== session.context.user.id) {
         return res.status(403).json({
           jsonrpc: '2.0',
@@ -387,8 +380,8 @@ const setupMcpRoutes = (app) => {
       })
     }
 
-    const session = streamableSessions.get(sessionId)
-    if (!session) {
+    const session = sessionManager.get(sessionId)
+    if (!session || session.kind !== 'streamable') {
       return res.status(404).json({
         jsonrpc: '2.0',
         error: { code: -32001, message: 'Session non trouvée.' },
@@ -400,7 +393,7 @@ const setupMcpRoutes = (app) => {
     const authHeader = req.headers.authorization
     if (authHeader && authHeader.startsWith('Bearer ')) {
       const token = authHeader.split(' ')[1]
-      const auth = await authenticatePat(token)
+      const auth = await authenticatePat(token, req.ip)
       if (auth && auth.user.id !== session.context.user.id) {
         return res.status(403).json({
           jsonrpc: '2.0',
@@ -412,8 +405,7 @@ const setupMcpRoutes = (app) => {
 
     try {
       await session.transport.handleRequest(req, res)
-      streamableSessions.delete(sessionId)
-      session.server.close()
+      sessionManager.remove(sessionId)
       console.log(`MCP Streamable session supprimée: ${sessionId}`)
     } catch (error) {
       console.error('Erreur MCP Streamable DELETE:', error)
@@ -446,17 +438,7 @@ const setupMcpRoutes = (app) => {
         }
       },
       authentication: 'Bearer Token (PAT)',
-      tools: [
-        'tasks_list',
-        'tasks_get',
-        'tasks_create',
-        'tasks_update',
-        'tasks_complete',
-        'tasks_reopen',
-        'tasks_delete',
-        'categories_list',
-        'categories_create'
-      ]
+      tools: TOOL_DEFINITIONS.map(tool => tool.name)
     })
   })
 
@@ -0,0 +1,184 @@
+/**
+ * Gestionnaire des sessions MCP (SSE legacy et Streamable HTTP)
+ * - éviction des sessions inactives (TTL)
+ * - plafonds par utilisateur et par token (la session la moins récemment utilisée est fermée) ;
+ *   en mode cluster, le processus principal les applique aussi à l'ensemble des workers
+ * - jauges exposées sur /health
+ */
+
+const { notifyPrimary, onBroadcast } = require('../services/clusterBus')
+
+const MCP_SESSION_IDLE_TTL_MS = parseInt(process.env.MCP_SESSION_IDLE_TTL_MS || String(30 * 60 * 1000), 10)
+const MCP_MAX_SESSIONS_PER_USER = parseInt(process.env.MCP_MAX_SESSIONS_PER_USER || '20', 10)
+const MCP_MAX_SESSIONS_PER_TOKEN = parseInt(process.env.MCP_MAX_SESSIONS_PER_TOKEN || '10', 10)
+const MCP_SESSION_SWEEP_MS = parseInt(process.env.MCP_SESSION_SWEEP_MS || '60000', 10)
+
+class McpSessionManager {
+  constructor () {
+    // sessionId -> { kind, transport, server, context, createdAt, lastActivityAt }
+    this.sessions = new Map()
+    this.counters = {
+      opened: 0,
+      closed: 0,
+      evictedIdle: 0,
+      evictedLimit: 0
+    }
+    this.sweepTimer = null
+  }
+
+  /**
+   * Enregistre une session ; ferme au besoin les plus anciennes du même utilisateur ou token
+   */
+  add (sessionId, { kind, transport, server, context }) {
+    this.enforceLimit(s => s.context.user.id === context.user.id, MCP_MAX_SESSIONS_PER_USER)
+    if (context.apiToken) {
+      this.enforceLimit(s => s.context.apiToken?.id === context.apiToken.id, MCP_MAX_SESSIONS_PER_TOKEN)
+    }
+
+    const now = Date.now()
+    this.sessions.set(sessionId, {
+      kind,
+      transport,
+      server,
+      context,
+      createdAt: now,
+      lastActivityAt: now
+    })
+    this.counters.opened++
+    this.startSweeper()
+    // Mode cluster : le processus principal route les requêtes de la session vers ce worker
+    // et applique les plafonds sur tout le cluster
+    notifyPrimary({
+      type: 'mcp-session-opened',
+      sessionId,
+      userId: context.user.id,
+      tokenId: context.apiToken ? context.apiToken.id : null
+    })
+  }
+
+  /**
+   * Retourne la session et met à jour son activité
+   */
+  get (sessionId) {
+    const session = this.sessions.get(sessionId)
+    if (session) session.lastActivityAt = Date.now()
+    return session || null
+  }
+
+  /**
+   * Retire une session et ferme son serveur (ce qui ferme aussi le transport) ;
+   * sans effet si déjà retirée
+   */
+  remove (sessionId) {
+    const session = this.sessions.get(sessionId)
+    if (!session) return null
+
+    this.sessions.delete(sessionId)
+    this.counters.closed++
+    notifyPrimary({ type: 'mcp-session-closed', sessionId })
+    session.server.close().catch(() => {})
+    return session
+  }
+
+  /**
+   * Ferme une session côté serveur (TTL ou plafond atteint)
+   */
+  evict (sessionId, reason) {
+    const session = this.remove(sessionId)
+    if (!session) return
+
+    if (reason === 'idle') this.counters.evictedIdle++
+    else if (reason === 'limit') this.counters.evictedLimit++
+
+    console.log(`MCP session évincée (${reason}): ${sessionId}`)
+  }
+
+  enforceLimit (matches, max) {
+    if (max <= 0) return
+
+    const owned = [...this.sessions].filter(([, s]) => matches(s))
+    if (owned.length < max) return
+
+    owned
+      .sort(([, a], [, b]) => a.lastActivityAt - b.lastActivityAt)
+      .slice(0, owned.length - max + 1)
+      .forEach(([sessionId]) => this.evict(sessionId, 'limit'))
+  }
+
+  sweep () {
+    if (MCP_SESSION_IDLE_TTL_MS <= 0) return
+
+    const cutoff = Date.now() - MCP_SESSION_IDLE_TTL_MS
+    for (const [sessionId, session] of this.sessions) {
+      if (session.lastActivityAt < cutoff) {
+        this.evict(sessionId, 'idle')
+      }
+    }
+  }
+
+  startSweeper () {
+    if (this.sweepTimer || MCP_SESSION_SWEEP_MS <= 0) return
+    this.sweepTimer = setInterval(() => this.sweep(), MCP_SESSION_SWEEP_MS)
+    this.sweepTimer.unref()
+  }
+
+  /**
+   * Ferme toutes les sessions (arrêt du serveur)
+   */
+  closeAll () {
+    if (this.sweepTimer) {
+      clearInterval(this.sweepTimer)
+      this.sweepTimer = null
+    }
+    for (const sessionId of [...this.sessions.keys()]) {
+      this.evict(sessionId, 'shutdown')
+    }
+  }
+
+  /**
+   * Jauges : sessions vivantes par transport, utilisateurs distincts, mémoire du process
+   */
+  stats () {
+    const byKind = { sse: 0, streamable: 0 }
+    const users = new Set()
+    let oldestIdleMs = 0
+    const now = Date.now()
+
+    for (const session of this.sessions.values()) {
+      byKind[session.kind] = (byKind[session.kind] || 0) + 1
+      users.add(session.context.user.id)
+      oldestIdleMs = Math.max(oldestIdleMs, now - session.lastActivityAt)
+    }
+
+    const memory = process.memoryUsage()
+
+    return {
+      live: this.sessions.size,
+      byTransport: byKind,
+      users: users.size,
+      oldestIdleMs,
+      ...this.counters,
+      limits: {
+        idleTtlMs: MCP_SESSION_IDLE_TTL_MS,
+        perUser: MCP_MAX_SESSIONS_PER_USER,
+        perToken: MCP_MAX_SESSIONS_PER_TOKEN
+      },
+      memory: {
+        rss: memory.rss,
+        heapUsed: memory.heapUsed
+      }
+    }
+  }
+}
+
+const sessionManager = new McpSessionManager()
+
+// Plafond atteint sur l'ensemble du cluster : le processus principal désigne la session à fermer
+onBroadcast('mcp:evict', (sessionId) => sessionManager.evict(sessionId, 'limit'))
+
+module.exports = {
+  MCP_MAX_SESSIONS_PER_USER,
+  MCP_MAX_SESSIONS_PER_TOKEN,
+  sessionManager,
+  getMcpSessionStats: () => sessionManager.stats()
+}
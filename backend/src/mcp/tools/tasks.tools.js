@@ -1,4 +1,35 @@
 const prisma = require('../../config/database')
+const { keysetPaginate, andWhere, clampLimit } = require('../../utils/pagination')
+const { searchTasks, sortByRank } = require('../../services/taskSearch')
+const { getUserTaskStats, formatStats } = require('../../services/taskStats')
+const { resolveAccess } = require('../../services/delegationResolver')
+const { runTaskBatch, TASK_BATCH_MAX_OPERATIONS } = require('../../services/taskBatch')
+const { getTaskChanges } = require('../../services/taskSync')
+const { listDelegatedTasks, DELEGATED_SORT_KEYS } = require('../../services/delegatedTasks')
+const { createTaskProjection, TASK_SCHEMAS, MCP_DEFAULT_FIELDS } = require('../../services/taskProjection')
+
+// Paramètres de projection communs aux outils de liste
+const PROJECTION_PROPERTIES = {
+  fields: {
+    type: 'array',
+    items: { type: 'string', enum: Object.keys(TASK_SCHEMAS.mcp) },
+    description: `Champs à renvoyer pour chaque tâche (id toujours inclus, défaut: ${MCP_DEFAULT_FIELDS.join(', ')})`
+  },
+  compact: {
+    type: 'boolean',
+    description: 'Réponse compacte : chaque tâche porte categoryId et les catégories sont listées une seule fois dans "categories"'
+  }
+}
+
+// Taille maximale des listes renvoyées aux agents (contexte limité)
+const MCP_LIST_MAX_LIMIT = 100
+
+// Ordre de tasks_list : échéance la plus proche, puis plus récentes
+const LIST_SORT_KEYS = [
+  { field: 'dueDate', direction: 'asc', type: 'date', nullable: true },
+  { field: 'createdAt', direction: 'desc', type: 'date' },
+  { field: 'id', direction: 'desc' }
+]
 
 /**
  * Définitions des outils MCP pour les tâches
@@ -26,12 +57,59 @@ const getToolDefinitions = () => [
         },
         search: {
           type: 'string',
-          description: 'Recherche dans le titre et la description'
+          description: 'Recherche plein texte dans le titre et la description (français/anglais, préfixes, fautes de frappe). Résultats triés par pertinence, sans pagination'
         },
         limit: {
           type: 'number',
-          description: 'Nombre maximum de tâches à retourner (défaut: 50)'
-        }
+          description: 'Nombre maximum de tâches à retourner (défaut: 50, max: 100)'
+        },
+        cursor: {
+          type: 'string',
+          description: 'Curseur de pagination (nextCursor renvoyé par l\'appel précédent)'
+        },
+        since: {
+          type: 'string',
+          description: 'Synchronisation incrémentale : "0" pour tout récupérer, puis le nextSince renvoyé. Retourne seulement les tâches modifiées et les IDs supprimés (autres filtres ignorés)'
+        },
+        ...PROJECTION_PROPERTIES
+      }
+    }
+  },
+  {
+    name: 'tasks_delegated',
+    description: 'Liste en une fois les tâches de tous les utilisateurs qui ont délégué leurs tâches à l\'utilisateur (catégories cachées exclues), chaque tâche indiquant son propriétaire',
+    inputSchema: {
+      type: 'object',
+      properties: {
+        ownerIds: {
+          type: 'array',
+          items: { type: 'string' },
+          description: 'Limiter à ces propriétaires (IDs, défaut: tous)'
+        },
+        status: {
+          type: 'string',
+          enum: ['all', 'active', 'completed'],
+          description: 'Filtrer par statut (défaut: all)'
+        },
+        priority: {
+          type: 'string',
+          enum: ['low', 'normal', 'high'],
+          description: 'Filtrer par priorité'
+        },
+        sortBy: {
+          type: 'string',
+          enum: Object.keys(DELEGATED_SORT_KEYS),
+          description: 'Tri (défaut: due_date, échéance la plus proche d\'abord)'
+        },
+        limit: {
+          type: 'number',
+          description: 'Nombre maximum de tâches à retourner (défaut: 50, max: 100)'
+        },
+        cursor: {
+          type: 'string',
+          description: 'Curseur de pagination (nextCursor renvoyé par l\'appel précédent)'
+        },
+        ...PROJECTION_PROPERTIES
       }
     }
   },
@@ -164,6 +242,72 @@ const getToolDefinitions = () => [
       },
       required: ['taskId']
     }
+  },
+  {
+    name: 'tasks_batch',
+    description: `Applique plusieurs opérations sur les tâches en un seul appel et une seule transaction (max ${TASK_BATCH_MAX_OPERATIONS}). Résultat détaillé par opération`,
+    inputSchema: {
+      type: 'object',
+      properties: {
+        operations: {
+          type: 'array',
+          description: 'Opérations à appliquer (une seule opération par tâche)',
+          items: {
+            type: 'object',
+            properties: {
+              op: {
+                type: 'string',
+                enum: ['create', 'update', 'complete', 'reopen', 'delete'],
+                description: 'Type d\'opération'
+              },
+              taskId: {
+                type: 'string',
+                description: 'ID de la tâche (requis sauf pour create)'
+              },
+              title: {
+                type: 'string',
+                description: 'Titre (requis pour create)'
+              },
+              description: {
+                type: 'string',
+                description: 'Description'
+              },
+              priority: {
+                type: 'string',
+                enum: ['low', 'normal', 'high'],
+                description: 'Priorité'
+              },
+              dueDate: {
+                type: 'string',
+                description: 'Date d\'échéance (YYYY-MM-DD)'
+              },
+              dueTime: {
+                type: 'string',
+                description: 'Heure d\'échéance (HH:MM)'
+              },
+              categoryId: {
+                type: 'string',
+                description: 'ID de catégorie (null pour retirer)'
+              }
+            },
+            required: ['op']
+          }
+        },
+        atomic: {
+          type: 'boolean',
+          description: 'Si une opération est invalide, n\'en appliquer aucune (défaut: false)'
+        }
+      },
+      required: ['operations']
+    }
+  },
+  {
+    name: 'tasks_stats',
+    description: 'Statistiques des tâches : total, actives, terminées, priorité haute, en retard, taux de complétion',
+    inputSchema: {
+      type: 'object',
+      properties: {}
+    }
   }
 ]
 
@@ -182,6 +326,8 @@ const handleTool = async (name, args, user, apiToken) => {
   switch (name) {
     case 'tasks_list':
       return await listTasks(args, user, apiToken)
+    case 'tasks_delegated':
+      return await listDelegated(args, user, apiToken)
     case 'tasks_get':
       return await getTask(args, user, apiToken)
     case 'tasks_create':
@@ -194,6 +340,10 @@ const handleTool = async (name, args, user, apiToken) => {
       return await reopenTask(args, user, apiToken)
     case 'tasks_delete':
       return await deleteTask(args, user, apiToken)
+    case 'tasks_batch':
+      return await batchTasks(args, user, apiToken)
+    case 'tasks_stats':
+      return await getStats(user, apiToken)
     default:
       return {
         content: [{ type: 'text', text: `Outil inconnu: ${name}` }],
@@ -213,7 +363,22 @@ const listTasks = async (args, user, apiToken) => {
     }
   }
 
-  const { status = 'all', priority, categoryId, search, limit = 50 } = args || {}
+  const { status = 'all', priority, categoryId, search, cursor, since, fields, compact } = args || {}
+  const limit = clampLimit(args?.limit, { max: MCP_LIST_MAX_LIMIT })
+
+  if (since !== undefined) {
+    return await listTaskChanges(user, since, args.limit)
+  }
+
+  let projection
+  try {
+    projection = createTaskProjection({ schema: 'mcp', fields, compact: compact === true })
+  } catch (error) {
+    return {
+      content: [{ type: 'text', text: error.message }],
+      isError: true
+    }
+  }
 
   const where = { userId: user.id }
 
@@ -224,25 +389,67 @@ const listTasks = async (args, user, apiToken) => {
 
   if (categoryId) where.categoryId = categoryId
 
-  if (search) {
-    where.OR = [
-      { title: { contains: search, mode: 'insensitive' } },
-      { description: { contains: search, mode: 'insensitive' } }
-    ]
+  // Recherche : résultats classés par pertinence, limités à `limit`
+  // (filtres repris dans la requête classée, avant la limite de résultats)
+  const searchFilter = search
+    ? await searchTasks(user.id, search, { status: where.status, importance: where.importance, categoryId: where.categoryId })
+    : null
+  if (searchFilter) {
+    where.AND = [searchFilter.where]
+
+    const matches = await prisma.task.findMany({
+      where,
+      select: projection.select(),
+      orderBy: searchFilter.rankedIds ? undefined : [{ dueDate: 'asc' }, { createdAt: 'desc' }]
+    })
+
+    return formatTaskList(projection, sortByRank(matches, searchFilter.rankedIds).slice(0, limit), { nextCursor: null })
   }
 
-  const tasks = await prisma.task.findMany({
-    where,
-    include: {
-      category: { select: { id: true, name: true, color: true } }
-    },
-    orderBy: [{ dueDate: 'asc' }, { createdAt: 'desc' }],
-    take: Math.min(limit, 100)
+  let keyset
+  try {
+    keyset = keysetPaginate({ keys: LIST_SORT_KEYS, cursor, limit })
+  } catch (error) {
+    return {
+      content: [{ type: 'text', text: error.message }],
+      isError: true
+    }
+  }
+
+  const rows = await prisma.task.findMany({
+    where: andWhere(where, keyset.where),
+    // Clés de tri lues pour le curseur même si elles ne sont pas demandées
+    select: projection.select(LIST_SORT_KEYS.map(k => k.field)),
+    orderBy: keyset.orderBy,
+    take: keyset.take
   })
 
+  const { items: tasks, nextCursor } = keyset.page(rows)
+
+  return formatTaskList(projection, tasks, { nextCursor })
+}
+
+/**
+ * tasks_list en mode synchronisation : tâches modifiées et supprimées depuis `since`
+ */
+const listTaskChanges = async (user, since, limit) => {
+  let changes
+  try {
+    changes = await getTaskChanges({ ownerId: user.id, since, limit })
+  } catch (error) {
+    if (error.status !== 400 && error.status !== 410) throw error
+    return {
+      content: [{ type: 'text', text: error.message }],
+      isError: true
+    }
+  }
+
   const result = {
-    count: tasks.length,
-    tasks: tasks.map(t => ({
+    count: changes.tasks.length,
+    hasMore: changes.hasMore,
+    nextSince: changes.nextSince,
+    deleted: changes.deleted,
+    tasks: changes.tasks.map(t => ({
       id: t.id,
       title: t.title,
       description: t.description,
@@ -250,9 +457,9 @@ const listTasks = async (args, user, apiToken) => {
       priority: t.importance,
       dueDate: t.dueDate?.toISOString().split('T')[0],
       dueTime: t.dueTime,
-      category: t.category ? { id: t.category.id, name: t.category.name, color: t.category.color } : null,
+      categoryId: t.categoryId,
       completedAt: t.completedAt?.toISOString(),
-      createdAt: t.createdAt.toISOString()
+      updatedAt: t.updatedAt.toISOString()
     }))
   }
 
@@ -261,6 +468,60 @@ const listTasks = async (args, user, apiToken) => {
   }
 }
 
+/**
+ * Réponse MCP d'une liste de tâches, écrite par le sérialiseur précompilé de la projection
+ */
+const formatTaskList = (projection, tasks, meta) => ({
+  content: [{ type: 'text', text: projection.render(tasks, { count: tasks.length, ...meta }) }]
+})
+
+/**
+ * Tâches de tous les owners ayant délégué à l'utilisateur
+ */
+const listDelegated = async (args, user, apiToken) => {
+  if (!checkPermission(apiToken, 'canReadTasks')) {
+    return {
+      content: [{ type: 'text', text: 'Permission refusée: canReadTasks requis.' }],
+      isError: true
+    }
+  }
+
+  const { ownerIds, status = 'all', priority, sortBy, cursor, fields, compact } = args || {}
+
+  let projection
+  let page
+  try {
+    // Le propriétaire de chaque tâche fait partie des champs par défaut
+    projection = createTaskProjection({ schema: 'mcp', fields, compact: compact === true, defaultFields: ['ownerId', ...MCP_DEFAULT_FIELDS] })
+    page = await listDelegatedTasks({
+      delegateId: user.id,
+      ownerIds: Array.isArray(ownerIds) ? ownerIds : null,
+      status,
+      importance: priority,
+      sortBy,
+      limit: clampLimit(args?.limit, { max: MCP_LIST_MAX_LIMIT }),
+      cursor,
+      projection
+    })
+  } catch (error) {
+    if (error.status !== 400 && error.status !== 403) throw error
+    return {
+      content: [{ type: 'text', text: error.message }],
+      isError: true
+    }
+  }
+
+  return formatTaskList(projection, page.tasks, {
+    nextCursor: page.nextCursor,
+    owners: page.owners.map(o => ({
+      id: o.id,
+      name: [o.firstName, o.lastName].filter(Boolean).join(' ') || o.username,
+      username: o.username,
+      permissions: o.permissions
+    }))
+  })
+}
+
 /**
  * Récupère une tâche
  */
@@ -592,6 +853,84 @@ const deleteTask = async (args, user, apiToken) => {
   }
 }
 
+/**
+ * Applique un lot d'opérations (mêmes règles que POST /api/v1/tasks/batch)
+ */
+const batchTasks = async (args, user, apiToken) => {
+  const { operations, atomic = false } = args || {}
+
+  // Nommage MCP (priority) -> colonnes (importance)
+  const normalized = Array.isArray(operations)
+    ? operations.map(operation => {
+      if (!operation || operation.priority === undefined) return operation
+      const { priority, ...rest } = operation
+      return { ...rest, importance: priority }
+    })
+    : operations
+
+  let batch
+  try {
+    batch = await runTaskBatch({
+      actorId: user.id,
+      ownerId: user.id,
+      access: await resolveAccess(user.id, user.id),
+      apiToken,
+      operations: normalized,
+      atomic: atomic === true
+    })
+  } catch (error) {
+    if (error.status !== 400) throw error
+    return {
+      content: [{ type: 'text', text: error.message }],
+      isError: true
+    }
+  }
+
+  const result = {
+    applied: batch.applied,
+    total: batch.total,
+    succeeded: batch.succeeded,
+    failed: batch.failed,
+    results: batch.results.map(({ task, ...item }) => ({
+      ...item,
+      ...(task && {
+        task: {
+          id: task.id,
+          title: task.title,
+          status: task.status,
+          priority: task.importance,
+          dueDate: task.dueDate?.toISOString().split('T')[0],
+          dueTime: task.dueTime,
+          categoryId: task.categoryId
+        }
+      })
+    }))
+  }
+
+  return {
+    content: [{ type: 'text', text: JSON.stringify(result, null, 2) }],
+    ...(atomic === true && batch.failed > 0 && { isError: true })
+  }
+}
+
+/**
+ * Statistiques des tâches (mêmes chiffres que GET /api/v1/tasks/stats)
+ */
+const getStats = async (user, apiToken) => {
+  if (!checkPermission(apiToken, 'canReadTasks')) {
+    return {
+      content: [{ type: 'text', text: 'Permission refusée: canReadTasks requis.' }],
+      isError: true
+    }
+  }
+
+  const stats = await getUserTaskStats(user.id)
+
+  return {
+    content: [{ type: 'text', text: JSON.stringify(formatStats(stats), null, 2) }]
+  }
+}
+
 module.exports = {
   getToolDefinitions,
   handleTool
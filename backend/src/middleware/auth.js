@@ -1,5 +1,5 @@
 const { verifyToken } = require('../utils/jwt');
-const prisma = require('../config/database');
+const { loadUser } = require('../services/authCache');
 
 const authMiddleware = async (req, res, next) => {
   try {
@@ -12,22 +12,7 @@ const authMiddleware = async (req, res, next) => {
     const token = authHeader.split(' ')[1];
     const decoded = verifyToken(token);
 
-    const user = await prisma.user.findUnique({
-      where: { id: decoded.userId },
-      select: {
-        id: true,
-        email: true,
-        username: true,
-        firstName: true,
-        lastName: true,
-        themePreference: true,
-        language: true,
-        role: true,
-        mustChangePassword: true,
-        isActive: true,
-        canCreateApiTokens: true
-      }
-    });
+    const user = await loadUser(decoded.userId);
 
     if (!user) {
       return res.status(401).json({ error: 'Utilisateur non trouvé.' });
@@ -0,0 +1,73 @@
+const {
+  METRICS_ENABLED,
+  observeHttpRequest,
+  trackHttpInFlight,
+  collectMetrics,
+  renderMetrics,
+  isMetricsRequestAuthorized
+} = require('../services/metrics');
+
+/**
+ * Mémorise le modèle de route dans res.locals.metricsRoute quand Express entre dans une route
+ * (affectation de req.route) : req.baseUrl est alors celui du routeur qui la porte.
+ * Il n'est pas reconstruit à la fermeture : après next(err), Express a déjà remis
+ * req.baseUrl à sa valeur hors du routeur.
+ */
+const captureRouteLabel = (req, res) => {
+  let route;
+  Object.defineProperty(req, 'route', {
+    configurable: true,
+    enumerable: true,
+    get: () => route,
+    set: (value) => {
+      route = value;
+      if (value) res.locals.metricsRoute = `${req.baseUrl}${value.path}`;
+    }
+  });
+};
+
+/**
+ * Mesure la durée de chaque requête, étiquetée par le modèle de route Express
+ * (ex. /api/v1/tasks/:id) pour garder un nombre de séries borné
+ */
+const requestMetrics = (req, res, next) => {
+  if (!METRICS_ENABLED) return next();
+
+  const start = process.hrtime.bigint();
+  trackHttpInFlight(1);
+  captureRouteLabel(req, res);
+
+  res.once('close', () => {
+    trackHttpInFlight(-1);
+    observeHttpRequest({
+      method: req.method,
+      // Pas de route trouvée (404, rate limiting...) : une seule série
+      route: res.locals.metricsRoute || 'unmatched',
+      status: res.statusCode,
+      durationMs: Number(process.hrtime.bigint() - start) / 1e6
+    });
+  });
+
+  next();
+};
+
+/**
+ * GET /metrics : format d'exposition Prometheus
+ * (en mode cluster, le processus principal répond avec les métriques de tous les workers)
+ */
+const metricsHandler = (req, res) => {
+  if (!METRICS_ENABLED) {
+    return res.status(404).json({ error: 'Route non trouvée' });
+  }
+  if (!isMetricsRequestAuthorized(req)) {
+    return res.status(401).json({ error: 'Token d\'authentification requis.' });
+  }
+
+  res.set('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+  res.send(renderMetrics(collectMetrics()));
+};
+
+module.exports = {
+  requestMetrics,
+  metricsHandler
+};
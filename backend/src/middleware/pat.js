@@ -1,5 +1,6 @@
 const crypto = require('crypto')
-const prisma = require('../config/database')
+const { loadApiToken } = require('../services/authCache')
+const { recordTokenUsage } = require('../services/tokenUsage')
 
 /**
  * Hash un token PAT avec SHA-256
@@ -35,24 +36,8 @@ const patMiddleware = async (req, res, next) => {
     // Hasher le token pour le comparer
     const tokenHash = hashToken(token)
 
-    // Rechercher le token en base
-    const apiToken = await prisma.apiToken.findUnique({
-      where: { tokenHash },
-      include: {
-        user: {
-          select: {
-            id: true,
-            email: true,
-            username: true,
-            firstName: true,
-            lastName: true,
-            role: true,
-            isActive: true,
-            canCreateApiTokens: true
-          }
-        }
-      }
-    })
+    // Rechercher le token (cache puis base)
+    const apiToken = await loadApiToken(tokenHash)
 
     if (!apiToken) {
       return res.status(401).json({ error: 'Token API invalide ou révoqué.' })
@@ -73,14 +58,8 @@ const patMiddleware = async (req, res, next) => {
       return res.status(403).json({ error: 'Compte utilisateur désactivé.' })
     }
 
-    // Mettre à jour la dernière utilisation (async, non bloquant)
-    prisma.apiToken.update({
-      where: { id: apiToken.id },
-      data: {
-        lastUsedAt: new Date(),
-        lastUsedIp: req.ip || req.connection?.remoteAddress
-      }
-    }).catch(err => console.error('Erreur mise à jour lastUsedAt:', err))
+    // Mettre à jour la dernière utilisation (écriture groupée différée)
+    recordTokenUsage(apiToken.id, req.ip || req.connection?.remoteAddress)
 
     // Ajouter les infos à la requête
     req.user = apiToken.user
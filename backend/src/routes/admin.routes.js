@@ -1,6 +1,7 @@
 const express = require('express');
 const {
   getStats,
+  reconcileStats,
   getUsers,
   getUser,
   updateUser,
@@ -10,7 +11,9 @@ const {
 } = require('../controllers/admin.controller');
 const {
   adminAnalyzeImport,
-  adminApplyImport
+  adminApplyImport,
+  adminStreamAnalyzeImport,
+  adminStreamApplyImport
 } = require('../controllers/import.controller');
 const authMiddleware = require('../middleware/auth');
 const adminMiddleware = require('../middleware/admin');
@@ -23,6 +26,7 @@ router.use(adminMiddleware);
 
 // Dashboard stats
 router.get('/stats', getStats);
+router.post('/stats/reconcile', reconcileStats);
 
 // Users management
 router.get('/users', getUsers);
@@ -35,5 +39,7 @@ router.get('/users/:id/export', exportUserTasks);
 // Import de tâches pour un utilisateur
 router.post('/users/:id/import/analyze', adminAnalyzeImport);
 router.post('/users/:id/import/apply', adminApplyImport);
+router.post('/users/:id/import/stream/analyze', adminStreamAnalyzeImport);
+router.post('/users/:id/import/stream/apply', adminStreamApplyImport);
 
 module.exports = router;
@@ -2,6 +2,7 @@ const express = require('express');
 const rateLimit = require('express-rate-limit');
 const { register, login, me, updateProfile, updateEmail, updatePassword, updateDefaultContext } = require('../controllers/auth.controller');
 const authMiddleware = require('../middleware/auth');
+const { createRateLimitStore } = require('../services/rateLimitStore');
 
 const router = express.Router();
 
@@ -9,7 +10,10 @@ const router = express.Router();
 const authLimiter = rateLimit({
   windowMs: 15 * 60 * 1000, // 15 minutes
   max: 10, // 10 attempts
-  message: { error: 'Trop de tentatives, veuillez réessayer dans 15 minutes.' }
+  message: { error: 'Trop de tentatives, veuillez réessayer dans 15 minutes.' },
+  store: createRateLimitStore('rl:auth:'),
+  // Pas de passOnStoreError : store indisponible = connexion refusée (erreur), jamais sans limite
+  passOnStoreError: false
 });
 
 // Public routes
@@ -0,0 +1,13 @@
+const express = require('express');
+const { streamEvents } = require('../controllers/events.controller');
+const { hybridAuthMiddleware, checkPatPermission } = require('../middleware/pat');
+
+const router = express.Router();
+
+// Authentification JWT ou PAT (header Authorization)
+router.use(hybridAuthMiddleware);
+
+// Flux SSE des changements de tâches et catégories
+router.get('/', checkPatPermission('canReadTasks'), streamEvents);
+
+module.exports = router;
@@ -1,18 +1,23 @@
 const express = require('express');
 const {
   getTasks,
+  getDelegatedTasks,
   getTask,
   createTask,
   updateTask,
   deleteTask,
   completeTask,
   reopenTask,
+  batchTasks,
   getStats,
   exportTasks
 } = require('../controllers/tasks.controller');
 const {
   analyzeImport,
-  applyImport
+  applyImport,
+  importProgress,
+  streamAnalyzeImport,
+  streamApplyImport
 } = require('../controllers/import.controller');
 const { hybridAuthMiddleware, checkPatPermission } = require('../middleware/pat');
 
@@ -27,9 +32,20 @@ router.get('/stats', checkPatPermission('canReadTasks'), getStats);
 // Export (lecture seule)
 router.get('/export', checkPatPermission('canReadTasks'), exportTasks);
 
+// Tâches de tous les owners ayant délégué à l'utilisateur (lecture seule)
+router.get('/delegated', checkPatPermission('canReadTasks'), getDelegatedTasks);
+
 // Import (nécessite permission de création)
 router.post('/import/analyze', checkPatPermission('canCreateTasks'), analyzeImport);
 router.post('/import/apply', checkPatPermission('canCreateTasks'), applyImport);
+router.get('/import/progress', checkPatPermission('canCreateTasks'), importProgress);
+
+// Import en streaming (fichier en corps brut, non lu par le body parser)
+router.post('/import/stream/analyze', checkPatPermission('canCreateTasks'), streamAnalyzeImport);
+router.post('/import/stream/apply', checkPatPermission('canCreateTasks'), streamApplyImport);
+
+// Lot d'opérations (permissions PAT vérifiées par opération)
+router.post('/batch', batchTasks);
 
 // CRUD avec vérification des permissions PAT
 router.get('/', checkPatPermission('canReadTasks'), getTasks);
@@ -0,0 +1,94 @@
+const cluster = require('cluster');
+const app = require('./app');
+const { sessionManager } = require('./mcp/sessionManager');
+const { closeAllEventStreams } = require('./controllers/events.controller');
+const { stopTokenUsageWriter } = require('./services/tokenUsage');
+const { stopActivityLogWriter } = require('./services/activityLog');
+const { startStatsReconciler, stopStatsReconciler } = require('./services/statsRollup');
+const { startTombstonePurge, stopTombstonePurge } = require('./services/taskSync');
+const { startChangeListener, stopChangeListener } = require('./services/changeStream');
+const { startActivityLogMaintenance, stopActivityLogMaintenance } = require('./services/activityLogRetention');
+const { notifyPrimary } = require('./services/clusterBus');
+const { collectMetrics } = require('./services/metrics');
+const { SHUTDOWN_TIMEOUT_MS } = require('./cluster');
+const prisma = require('./config/database');
+
+const PORT = process.env.PORT || 3000;
+
+/**
+ * Démarre le serveur HTTP : seul (port PORT) ou comme worker du cluster
+ * (port local libre, annoncé au processus principal qui lui transmet les requêtes)
+ */
+const startServer = () => {
+  const listenOptions = cluster.isWorker
+    ? { port: 0, host: '127.0.0.1', exclusive: true }
+    : { port: PORT };
+
+  const server = app.listen(listenOptions, () => {
+    if (cluster.isWorker) {
+      notifyPrimary({ type: 'listening', port: server.address().port });
+    } else {
+      console.log(`🚀 Server running on port ${PORT}`);
+    }
+    startStatsReconciler();
+    startTombstonePurge();
+    startActivityLogMaintenance();
+    startChangeListener();
+  });
+
+  let shuttingDown = false;
+
+  // Arrêt propre : finir les requêtes en cours, fermer les flux longs,
+  // vider les buffers d'écriture avant de fermer la connexion DB
+  const shutdown = async (reason) => {
+    if (shuttingDown) return;
+    shuttingDown = true;
+    console.log(`${reason} reçu, arrêt du serveur...`);
+
+    const forceExit = setTimeout(() => {
+      console.error(`Arrêt forcé après ${SHUTDOWN_TIMEOUT_MS} ms`);
+      process.exit(1);
+    }, SHUTDOWN_TIMEOUT_MS);
+    forceExit.unref();
+
+    const closed = new Promise(resolve => server.close(resolve));
+    server.closeIdleConnections();
+    sessionManager.closeAll();
+    closeAllEventStreams();
+    stopStatsReconciler();
+    stopTombstonePurge();
+    stopActivityLogMaintenance();
+    try {
+      await closed;
+      await stopTokenUsageWriter();
+      await stopActivityLogWriter();
+      await stopChangeListener();
+      await prisma.$disconnect();
+    } catch (error) {
+      console.error('Erreur lors de l\'arrêt:', error);
+    }
+    process.exit(0);
+  };
+
+  process.on('SIGTERM', () => shutdown('SIGTERM'));
+  process.on('SIGINT', () => shutdown('SIGINT'));
+
+  if (cluster.isWorker) {
+    process.on('message', (message) => {
+      if (!message) return;
+      if (message.type === 'shutdown') shutdown('Demande d\'arrêt du cluster');
+      // GET /metrics reçu par le processus principal
+      if (message.type === 'metrics-request') {
+        notifyPrimary({ type: 'metrics', requestId: message.requestId, families: collectMetrics() });
+      }
+    });
+    // Processus principal disparu : plus personne ne route les requêtes vers ce worker
+    process.on('disconnect', () => shutdown('Déconnexion du processus principal'));
+  }
+
+  return server;
+};
+
+module.exports = {
+  startServer
+};
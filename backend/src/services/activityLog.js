@@ -0,0 +1,222 @@
+const prisma = require('../config/database');
+const { broadcastAndWait, onBroadcast } = require('./clusterBus');
+
+// Durabilité du journal d'activité :
+// - write-behind  : file en mémoire écrite par lots (par défaut)
+// - sync          : écrit après la mutation, avant la réponse
+// - transaction   : écrit dans la même transaction que la mutation
+const ACTIVITY_LOG_MODE = ['write-behind', 'sync', 'transaction'].includes(process.env.ACTIVITY_LOG_MODE)
+  ? process.env.ACTIVITY_LOG_MODE
+  : 'write-behind';
+const ACTIVITY_LOG_FLUSH_MS = parseInt(process.env.ACTIVITY_LOG_FLUSH_MS || '1000', 10);
+const ACTIVITY_LOG_BATCH_SIZE = parseInt(process.env.ACTIVITY_LOG_BATCH_SIZE || '200', 10);
+const ACTIVITY_LOG_MAX_QUEUE = parseInt(process.env.ACTIVITY_LOG_MAX_QUEUE || '10000', 10);
+
+// Lignes en attente d'écriture (mode write-behind)
+const queue = [];
+
+const metrics = {
+  enqueued: 0,
+  written: 0,
+  dropped: 0,
+  flushes: 0,
+  failedFlushes: 0,
+  lastFlushMs: 0,
+  maxFlushMs: 0,
+  totalFlushMs: 0
+};
+
+let flushTimer = null;
+let flushing = null;
+
+/**
+ * Lignes du journal pour une action : une pour le owner, et une pour l'acteur
+ * s'il est différent (avec targetOwnerId pour le contexte)
+ */
+const buildRows = ({ ownerId, actorId, action, entityType, entityId, entityTitle, details, targetOwnerId }, bothSides) => {
+  const createdAt = new Date();
+  const base = {
+    actorId,
+    action,
+    entityType,
+    entityId: entityId || null,
+    entityTitle: entityTitle || null,
+    // Colonne JSONB : absente plutôt que null (JSON null)
+    details: details || undefined,
+    createdAt
+  };
+
+  const rows = [{ ...base, ownerId, targetOwnerId: targetOwnerId || null }];
+  if (bothSides && actorId !== ownerId) {
+    rows.push({ ...base, ownerId: actorId, targetOwnerId: ownerId });
+  }
+  return rows;
+};
+
+/**
+ * Écrit un lot ; en cas d'échec (ex: utilisateur supprimé entre-temps),
+ * réessaie ligne par ligne pour ne perdre que les lignes invalides.
+ */
+const writeRows = async (rows) => {
+  try {
+    await prisma.activityLog.createMany({ data: rows });
+    metrics.written += rows.length;
+  } catch (error) {
+    metrics.failedFlushes++;
+    console.error('Erreur écriture groupée du journal d\'activité:', error);
+
+    for (const row of rows) {
+      try {
+        await prisma.activityLog.create({ data: row });
+        metrics.written++;
+      } catch (err) {
+        metrics.dropped++;
+      }
+    }
+  }
+};
+
+/**
+ * Vide la file par lots de ACTIVITY_LOG_BATCH_SIZE (un seul flush à la fois)
+ */
+const flushActivityLogs = async () => {
+  while (flushing) await flushing;
+  if (queue.length === 0) return;
+
+  flushing = (async () => {
+    while (queue.length > 0) {
+      const startedAt = Date.now();
+      await writeRows(queue.splice(0, ACTIVITY_LOG_BATCH_SIZE));
+
+      const duration = Date.now() - startedAt;
+      metrics.flushes++;
+      metrics.lastFlushMs = duration;
+      metrics.totalFlushMs += duration;
+      metrics.maxFlushMs = Math.max(metrics.maxFlushMs, duration);
+    }
+  })().finally(() => {
+    flushing = null;
+  });
+
+  return flushing;
+};
+
+/**
+ * Vide la file de ce worker et celles des autres workers du cluster, pour relire
+ * un journal à jour quel que soit le worker qui a reçu les écritures
+ */
+const flushAllActivityLogs = async () => {
+  if (ACTIVITY_LOG_MODE !== 'write-behind') return;
+  await Promise.all([flushActivityLogs(), broadcastAndWait('activity:flush')]);
+};
+
+onBroadcast('activity:flush', flushActivityLogs);
+
+const enqueue = async (rows) => {
+  // File pleine : l'appelant attend l'écriture (contre-pression plutôt que perte)
+  if (queue.length + rows.length > ACTIVITY_LOG_MAX_QUEUE) {
+    await flushActivityLogs();
+  }
+
+  queue.push(...rows);
+  metrics.enqueued += rows.length;
+
+  if (queue.length >= ACTIVITY_LOG_BATCH_SIZE || ACTIVITY_LOG_FLUSH_MS <= 0) {
+    flushActivityLogs();
+    return;
+  }
+
+  if (!flushTimer) {
+    flushTimer = setInterval(flushActivityLogs, ACTIVITY_LOG_FLUSH_MS);
+    flushTimer.unref();
+  }
+};
+
+const write = async (rows, tx) => {
+  if (tx) {
+    // Même transaction que la mutation : une erreur annule l'ensemble
+    await tx.activityLog.createMany({ data: rows });
+    return;
+  }
+
+  if (ACTIVITY_LOG_MODE === 'write-behind') {
+    await enqueue(rows);
+    return;
+  }
+
+  await writeRows(rows);
+};
+
+// Une entrée ou un tableau d'entrées -> lignes du journal
+const buildAllRows = (entries, bothSides) => [].concat(entries).flatMap(entry => buildRows(entry, bothSides));
+
+/**
+ * Journalise une action (une ligne) ou un tableau d'actions
+ */
+const logActivity = (entry, { tx } = {}) => write(buildAllRows(entry, false), tx);
+
+/**
+ * Journalise une action (ou un tableau d'actions) pour le owner ET l'acteur s'ils sont différents
+ * (une seule requête)
+ */
+const logActivityForBoth = (entry, { tx } = {}) => write(buildAllRows(entry, true), tx);
+
+/**
+ * Exécute une mutation et journalise l'action selon ACTIVITY_LOG_MODE.
+ * mutate(db) reçoit le client (ou la transaction), describe(result) retourne l'entrée du journal
+ * (ou un tableau d'entrées). Avec { transaction }, la mutation s'exécute toujours dans une
+ * transaction (options passées à $transaction), quel que soit le mode.
+ */
+const withActivityLog = async (mutate, describe, { transaction } = {}) => {
+  if (ACTIVITY_LOG_MODE === 'transaction') {
+    return prisma.$transaction(async (tx) => {
+      const result = await mutate(tx);
+      await logActivityForBoth(describe(result), { tx });
+      return result;
+    }, transaction);
+  }
+
+  const result = transaction
+    ? await prisma.$transaction((tx) => mutate(tx), transaction)
+    : await mutate(prisma);
+  await logActivityForBoth(describe(result));
+  return result;
+};
+
+/**
+ * Métriques du writer (exposées sur /health)
+ */
+const getActivityLogStats = () => ({
+  mode: ACTIVITY_LOG_MODE,
+  queueDepth: queue.length,
+  maxQueue: ACTIVITY_LOG_MAX_QUEUE,
+  enqueued: metrics.enqueued,
+  written: metrics.written,
+  dropped: metrics.dropped,
+  flushes: metrics.flushes,
+  failedFlushes: metrics.failedFlushes,
+  lastFlushMs: metrics.lastFlushMs,
+  maxFlushMs: metrics.maxFlushMs,
+  avgFlushMs: metrics.flushes > 0 ? Math.round(metrics.totalFlushMs / metrics.flushes) : 0
+});
+
+/**
+ * Arrête le timer et écrit les entrées restantes (arrêt du serveur)
+ */
+const stopActivityLogWriter = async () => {
+  if (flushTimer) {
+    clearInterval(flushTimer);
+    flushTimer = null;
+  }
+  await flushActivityLogs();
+};
+
+module.exports = {
+  logActivity,
+  logActivityForBoth,
+  withActivityLog,
+  flushActivityLogs,
+  flushAllActivityLogs,
+  getActivityLogStats,
+  stopActivityLogWriter
+};
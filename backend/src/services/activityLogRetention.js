@@ -0,0 +1,174 @@
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+const { once } = require('events');
+const { finished } = require('stream/promises');
+const { Prisma } = require('@prisma/client');
+const prisma = require('../config/database');
+
+// Durée de conservation du journal d'activité en mois (0 = conserver indéfiniment, défaut).
+// La suppression des partitions n'est active que si elle est configurée explicitement.
+const ACTIVITY_LOG_RETENTION_MONTHS = parseInt(process.env.ACTIVITY_LOG_RETENTION_MONTHS || '0', 10);
+// Dossier des archives (.ndjson.gz) des partitions expirées, à placer sur un volume persistant.
+// Obligatoire pour la suppression : sans dossier, aucune partition n'est supprimée.
+const ACTIVITY_LOG_ARCHIVE_DIR = process.env.ACTIVITY_LOG_ARCHIVE_DIR || '';
+
+const MAINTENANCE_INTERVAL_MS = 24 * 60 * 60 * 1000;
+// Partitions créées à l'avance, pour que la partition par défaut reste vide
+const PARTITIONS_AHEAD = 2;
+const ARCHIVE_BATCH_SIZE = 1000;
+const ARCHIVE_TRANSACTION_TIMEOUT_MS = 10 * 60 * 1000;
+
+// Une partition expirée n'est traitée que par un worker à la fois
+const ARCHIVE_LOCK_KEY = 'activity_logs_archive';
+const PARTITION_NAME = /^activity_logs_p(\d{4})(\d{2})$/;
+
+let maintenanceTimer = null;
+let startupTimer = null;
+
+/**
+ * Partitions mensuelles existantes : [{ name, month: Date (UTC) }] par mois croissant
+ */
+const listPartitions = async () => {
+  const rows = await prisma.$queryRaw`
+    SELECT c."relname" AS "name"
+    FROM pg_inherits i
+    JOIN pg_class c ON c."oid" = i."inhrelid"
+    JOIN pg_class p ON p."oid" = i."inhparent"
+    WHERE p."relname" = 'activity_logs'
+    ORDER BY c."relname"
+  `;
+
+  return rows
+    .map(({ name }) => {
+      const match = PARTITION_NAME.exec(name);
+      return match && { name, month: new Date(Date.UTC(Number(match[1]), Number(match[2]) - 1, 1)) };
+    })
+    .filter(Boolean);
+};
+
+/**
+ * Écrit les lignes d'une partition en NDJSON compressé, par lots (fichier temporaire renommé à la fin)
+ */
+const archivePartition = async (tx, name) => {
+  await fs.promises.mkdir(ACTIVITY_LOG_ARCHIVE_DIR, { recursive: true });
+  const target = path.join(ACTIVITY_LOG_ARCHIVE_DIR, `${name}.ndjson.gz`);
+  const temporary = `${target}.tmp`;
+
+  const gzip = zlib.createGzip();
+  const file = fs.createWriteStream(temporary);
+  gzip.pipe(file);
+
+  const table = Prisma.raw(`"${name}"`);
+  // Parcours par id (préfixe de la clé primaire de la partition)
+  let afterId = null;
+  let count = 0;
+
+  try {
+    for (;;) {
+      const rows = await tx.$queryRaw`
+        SELECT "id", "owner_id" AS "ownerId", "actor_id" AS "actorId", "target_owner_id" AS "targetOwnerId",
+               "action", "entity_type" AS "entityType", "entity_id" AS "entityId", "entity_title" AS "entityTitle",
+               "details", "created_at" AS "createdAt"
+        FROM ${table}
+        WHERE ${afterId}::text IS NULL OR "id" > ${afterId}::text
+        ORDER BY "id"
+        LIMIT ${ARCHIVE_BATCH_SIZE}
+      `;
+      if (rows.length === 0) break;
+
+      const chunk = rows.map(row => JSON.stringify(row)).join('\n') + '\n';
+      if (!gzip.write(chunk)) await once(gzip, 'drain');
+
+      count += rows.length;
+      afterId = rows[rows.length - 1].id;
+    }
+
+    gzip.end();
+    await finished(file);
+    await fs.promises.rename(temporary, target);
+  } catch (error) {
+    gzip.destroy();
+    file.destroy();
+    await fs.promises.rm(temporary, { force: true });
+    throw error;
+  }
+
+  return { file: target, rows: count };
+};
+
+/**
+ * Archive dans ACTIVITY_LOG_ARCHIVE_DIR puis détache et supprime une partition.
+ * Le verrou exclusif du détachement n'est pris qu'en fin de transaction, après l'archivage.
+ */
+const expirePartition = (name) => prisma.$transaction(async (tx) => {
+  const [{ locked }] = await tx.$queryRaw`SELECT pg_try_advisory_xact_lock(hashtext(${ARCHIVE_LOCK_KEY})) AS "locked"`;
+  if (!locked) return null;
+
+  const archive = await archivePartition(tx, name);
+
+  const table = Prisma.raw(`"${name}"`);
+  await tx.$executeRaw`ALTER TABLE "activity_logs" DETACH PARTITION ${table}`;
+  await tx.$executeRaw`DROP TABLE ${table}`;
+
+  return { partition: name, ...archive };
+}, { timeout: ARCHIVE_TRANSACTION_TIMEOUT_MS });
+
+/**
+ * Crée les partitions à venir et traite celles plus anciennes que la durée de conservation
+ */
+const runActivityLogMaintenance = async () => {
+  const [{ created }] = await prisma.$queryRaw`
+    SELECT "activity_logs_ensure_partitions"(now()::timestamp, ${PARTITIONS_AHEAD}::int) AS "created"
+  `;
+
+  const expired = [];
+  if (ACTIVITY_LOG_RETENTION_MONTHS > 0 && !ACTIVITY_LOG_ARCHIVE_DIR) {
+    console.warn('Journal d\'activité : ACTIVITY_LOG_RETENTION_MONTHS ignoré, ACTIVITY_LOG_ARCHIVE_DIR non défini (aucune partition supprimée).');
+  } else if (ACTIVITY_LOG_RETENTION_MONTHS > 0) {
+    const now = new Date();
+    const cutoff = new Date(Date.UTC(now.getUTCFullYear(), now.getUTCMonth() - ACTIVITY_LOG_RETENTION_MONTHS, 1));
+
+    for (const { name, month } of await listPartitions()) {
+      if (month >= cutoff) continue;
+      const result = await expirePartition(name);
+      if (result) {
+        expired.push(result);
+        console.log(`Journal d'activité : partition ${name} archivée (${result.rows} lignes, ${result.file}) et supprimée`);
+      }
+    }
+  }
+
+  return { created, expired };
+};
+
+const runSafely = () => {
+  runActivityLogMaintenance().catch(err => console.error('Erreur maintenance du journal d\'activité:', err));
+};
+
+const startActivityLogMaintenance = () => {
+  if (maintenanceTimer) return;
+
+  // Au démarrage (le serveur a pu être arrêté pendant un changement de mois), puis chaque jour
+  startupTimer = setTimeout(runSafely, 5000);
+  startupTimer.unref();
+  maintenanceTimer = setInterval(runSafely, MAINTENANCE_INTERVAL_MS);
+  maintenanceTimer.unref();
+};
+
+const stopActivityLogMaintenance = () => {
+  if (startupTimer) {
+    clearTimeout(startupTimer);
+    startupTimer = null;
+  }
+  if (maintenanceTimer) {
+    clearInterval(maintenanceTimer);
+    maintenanceTimer = null;
+  }
+};
+
+module.exports = {
+  runActivityLogMaintenance,
+  startActivityLogMaintenance,
+  stopActivityLogMaintenance
+};
@@ -0,0 +1,141 @@
+const prisma = require('../config/database');
+const LruCache = require('../utils/lruCache');
+const { broadcast, onBroadcast } = require('./clusterBus');
+
+const AUTH_CACHE_TTL_MS = parseInt(process.env.AUTH_CACHE_TTL_MS || '30000', 10);
+const AUTH_CACHE_MAX = parseInt(process.env.AUTH_CACHE_MAX || '5000', 10);
+
+// Champs utilisateur exposés dans req.user pour l'authentification JWT
+const USER_SELECT = {
+  id: true,
+  email: true,
+  username: true,
+  firstName: true,
+  lastName: true,
+  themePreference: true,
+  language: true,
+  role: true,
+  mustChangePassword: true,
+  isActive: true,
+  canCreateApiTokens: true
+};
+
+// Champs utilisateur joints au token PAT
+const PAT_USER_SELECT = {
+  id: true,
+  email: true,
+  username: true,
+  firstName: true,
+  lastName: true,
+  role: true,
+  isActive: true,
+  canCreateApiTokens: true
+};
+
+const usersCache = new LruCache({ max: AUTH_CACHE_MAX, ttlMs: AUTH_CACHE_TTL_MS });
+const apiTokensCache = new LruCache({ max: AUTH_CACHE_MAX, ttlMs: AUTH_CACHE_TTL_MS });
+
+// Incrémenté à chaque invalidation : une lecture DB lancée avant une
+// invalidation ne doit pas réinsérer une valeur périmée dans le cache.
+let generation = 0;
+
+const isEnabled = () => AUTH_CACHE_TTL_MS > 0;
+
+/**
+ * Récupère l'utilisateur authentifié (JWT) depuis le cache ou la base
+ */
+const loadUser = async (userId) => {
+  if (isEnabled()) {
+    const cached = usersCache.get(userId);
+    if (cached) return cached;
+  }
+
+  const startGeneration = generation;
+  const user = await prisma.user.findUnique({
+    where: { id: userId },
+    select: USER_SELECT
+  });
+
+  if (user && isEnabled() && startGeneration === generation) {
+    usersCache.set(userId, user);
+  }
+
+  return user;
+};
+
+/**
+ * Récupère un token PAT (avec son utilisateur) depuis le cache ou la base
+ */
+const loadApiToken = async (tokenHash) => {
+  if (isEnabled()) {
+    const cached = apiTokensCache.get(tokenHash);
+    if (cached) return cached;
+  }
+
+  const startGeneration = generation;
+  const apiToken = await prisma.apiToken.findUnique({
+    where: { tokenHash },
+    include: {
+      user: { select: PAT_USER_SELECT }
+    }
+  });
+
+  if (apiToken && isEnabled() && startGeneration === generation) {
+    apiTokensCache.set(tokenHash, apiToken);
+  }
+
+  return apiToken;
+};
+
+/**
+ * Invalide un utilisateur et tous ses tokens PAT en cache
+ * (changement de rôle, désactivation, suppression, mot de passe, profil)
+ */
+const dropUser = (userId) => {
+  generation++;
+  usersCache.delete(userId);
+
+  for (const [tokenHash, entry] of apiTokensCache.entries) {
+    if (entry.value.userId === userId) {
+      apiTokensCache.delete(tokenHash);
+    }
+  }
+};
+
+const invalidateUser = (userId) => {
+  dropUser(userId);
+  // Mode cluster : les autres workers ont leur propre cache
+  broadcast('auth:user', userId);
+};
+
+/**
+ * Invalide un token PAT en cache (révocation, modification, suppression)
+ */
+const dropApiToken = (tokenHash) => {
+  generation++;
+  apiTokensCache.delete(tokenHash);
+};
+
+const invalidateApiToken = (tokenHash) => {
+  dropApiToken(tokenHash);
+  broadcast('auth:apiToken', tokenHash);
+};
+
+onBroadcast('auth:user', dropUser);
+onBroadcast('auth:apiToken', dropApiToken);
+
+/**
+ * Compteurs du cache d'authentification
+ */
+const getAuthCacheStats = () => ({
+  users: usersCache.stats(),
+  apiTokens: apiTokensCache.stats()
+});
+
+module.exports = {
+  loadUser,
+  loadApiToken,
+  invalidateUser,
+  invalidateApiToken,
+  getAuthCacheStats
+};
@@ -0,0 +1,420 @@
+const { Prisma } = require('@prisma/client');
+const prisma = require('../config/database');
+const { findDuplicates } = require('./importDuplicates');
+const { acquireSlot, releaseSlot, setSharedValue, getSharedValue, deleteSharedValue } = require('./clusterState');
+
+const IMPORT_CHUNK_SIZE = parseInt(process.env.IMPORT_CHUNK_SIZE || '500', 10);
+const IMPORT_TRANSACTION_TIMEOUT_MS = parseInt(process.env.IMPORT_TRANSACTION_TIMEOUT_MS || '120000', 10);
+
+const DEFAULT_CATEGORY_COLOR = '#6366f1';
+
+// Nombre maximum d'erreurs détaillées retournées par un import en streaming
+const MAX_REPORTED_ERRORS = 1000;
+
+const CONFLICT_POLICIES = ['skip', 'overwrite', 'duplicate'];
+
+const chunk = (items, size) => {
+  const chunks = [];
+  for (let i = 0; i < items.length; i += size) {
+    chunks.push(items.slice(i, i + size));
+  }
+  return chunks;
+};
+
+const parseDate = (value) => {
+  if (!value) return null;
+  const date = new Date(value);
+  if (Number.isNaN(date.getTime())) {
+    throw new Error(`Date invalide: ${value}`);
+  }
+  return date;
+};
+
+const hasTitle = (task) => Boolean(task) && typeof task.title === 'string' && task.title.trim() !== '';
+
+// Champs texte facultatifs d'une tâche importée
+const OPTIONAL_STRING_FIELDS = ['description', 'status', 'importance', 'dueTime'];
+
+const isOptionalString = (value) => value === undefined || value === null || typeof value === 'string';
+
+/**
+ * Vérifie les types d'une ligne avant écriture : une ligne invalide est rejetée
+ * seule (results.errors) au lieu de faire échouer la transaction.
+ */
+const validateTask = (taskData) => {
+  for (const field of OPTIONAL_STRING_FIELDS) {
+    if (!isOptionalString(taskData[field])) {
+      throw new Error(`Champ ${field} invalide : texte attendu`);
+    }
+  }
+
+  const { category } = taskData;
+  if (category !== undefined && category !== null) {
+    if (typeof category !== 'object' || !isOptionalString(category.name) || !isOptionalString(category.color)) {
+      throw new Error('Catégorie invalide : nom et couleur doivent être du texte');
+    }
+  }
+};
+
+/**
+ * Normalise une tâche importée en colonnes de la table tasks (sans catégorie)
+ */
+const toTaskRow = (taskData) => {
+  validateTask(taskData);
+
+  return {
+    title: taskData.title,
+    description: taskData.description || null,
+    status: taskData.status || 'active',
+    importance: taskData.importance || 'normal',
+    dueDate: parseDate(taskData.dueDate),
+    dueTime: taskData.dueTime || null,
+    completedAt: parseDate(taskData.completedAt)
+  };
+};
+
+/**
+ * Répartit les lignes du fichier selon les résolutions choisies par l'utilisateur
+ */
+const classifyRows = (rawTasks, resolutions, results) => {
+  const conflictResolutions = new Map();
+  if (resolutions.conflicts) {
+    resolutions.conflicts.forEach(r => conflictResolutions.set(r.index, r));
+  }
+
+  const newTaskIndices = new Set();
+  if (resolutions.newTasks) {
+    resolutions.newTasks.forEach(t => newTaskIndices.add(t.index));
+  }
+
+  const toCreate = [];
+  const toUpdate = [];
+
+  for (let i = 0; i < rawTasks.length; i++) {
+    const task = rawTasks[i];
+
+    if (!hasTitle(task)) {
+      results.errors.push({ index: i, error: 'Titre manquant' });
+      continue;
+    }
+
+    const resolution = conflictResolutions.get(i);
+    let target = null;
+
+    if (resolution) {
+      if (resolution.resolution === 'skip') {
+        results.skipped++;
+        continue;
+      } else if (resolution.resolution === 'overwrite' && resolution.existingTaskId) {
+        target = toUpdate;
+      } else if (resolution.resolution === 'duplicate') {
+        target = toCreate;
+      }
+    } else if (newTaskIndices.has(i)) {
+      target = toCreate;
+    }
+
+    if (!target) continue;
+
+    try {
+      target.push({
+        index: i,
+        task,
+        row: toTaskRow(task),
+        existingTaskId: resolution?.existingTaskId
+      });
+    } catch (err) {
+      results.errors.push({ index: i, title: task.title, error: err.message });
+    }
+  }
+
+  return { toCreate, toUpdate };
+};
+
+/**
+ * Résout toutes les catégories référencées en une passe :
+ * création groupée des manquantes puis relecture des ids.
+ */
+const resolveCategories = async (tx, userId, items) => {
+  const wanted = new Map();
+  for (const { task } of items) {
+    if (task.category && task.category.name) {
+      const key = task.category.name.toLowerCase();
+      if (!wanted.has(key)) {
+        wanted.set(key, { name: task.category.name, color: task.category.color || DEFAULT_CATEGORY_COLOR });
+      }
+    }
+  }
+
+  const categoryMap = new Map();
+  if (wanted.size === 0) return categoryMap;
+
+  const existing = await tx.category.findMany({
+    where: { userId },
+    select: { id: true, name: true }
+  });
+  existing.forEach(c => categoryMap.set(c.name.toLowerCase(), c.id));
+
+  const missing = [...wanted].filter(([key]) => !categoryMap.has(key)).map(([, c]) => c);
+  if (missing.length > 0) {
+    await tx.category.createMany({
+      data: missing.map(c => ({ userId, name: c.name, color: c.color })),
+      skipDuplicates: true
+    });
+
+    const created = await tx.category.findMany({
+      where: { userId, name: { in: missing.map(c => c.name) } },
+      select: { id: true, name: true }
+    });
+    created.forEach(c => categoryMap.set(c.name.toLowerCase(), c.id));
+  }
+
+  return categoryMap;
+};
+
+const categoryIdFor = (task, categoryMap) => {
+  if (!task.category || !task.category.name) return null;
+  return categoryMap.get(task.category.name.toLowerCase()) || null;
+};
+
+/**
+ * Met à jour un lot de tâches en un seul UPDATE ... FROM (VALUES ...).
+ * Seules les tâches appartenant à userId sont modifiées ; retourne les ids modifiés.
+ */
+const updateChunk = async (tx, userId, items, categoryMap, now) => {
+  const values = items.map(({ existingTaskId, task, row }) => Prisma.sql`(
+    ${existingTaskId}::text,
+    ${row.title}::text,
+    ${row.description}::text,
+    ${row.status}::text,
+    ${row.importance}::text,
+    ${categoryIdFor(task, categoryMap)}::text,
+    ${row.dueDate ? row.dueDate.toISOString() : null}::date,
+    ${row.dueTime}::text,
+    ${row.completedAt ? row.completedAt.toISOString() : null}::timestamp(3)
+  )`);
+
+  const updated = await tx.$queryRaw`
+    UPDATE "tasks" AS t
+    SET "title" = v.title,
+        "description" = v.description,
+        "status" = v.status,
+        "importance" = v.importance,
+        "category_id" = v.category_id,
+        "due_date" = v.due_date,
+        "due_time" = v.due_time,
+        "completed_at" = v.completed_at,
+        "updated_at" = ${now.toISOString()}::timestamp(3)
+    FROM (VALUES ${Prisma.join(values)})
+      AS v(id, title, description, status, importance, category_id, due_date, due_time, completed_at)
+    WHERE t."id" = v.id AND t."user_id" = ${userId}
+    RETURNING t."id"
+  `;
+
+  return new Set(updated.map(row => row.id));
+};
+
+/**
+ * Écrit des lignes classées dans une transaction :
+ * catégories en lot, créations par createMany et mises à jour groupées par paquets.
+ */
+const applyRows = async (tx, userId, { toCreate, toUpdate }, results, progress) => {
+  const categoryMap = await resolveCategories(tx, userId, [...toCreate, ...toUpdate]);
+
+  progress.setPhase('create');
+  for (const items of chunk(toCreate, IMPORT_CHUNK_SIZE)) {
+    const { count } = await tx.task.createMany({
+      data: items.map(({ task, row }) => ({
+        userId,
+        ...row,
+        categoryId: categoryIdFor(task, categoryMap)
+      }))
+    });
+    results.created += count;
+    progress.advance(items.length);
+  }
+
+  progress.setPhase('update');
+  const now = new Date();
+  for (const items of chunk(toUpdate, IMPORT_CHUNK_SIZE)) {
+    const updatedIds = await updateChunk(tx, userId, items, categoryMap, now);
+    results.updated += updatedIds.size;
+    for (const { index, task, existingTaskId } of items) {
+      if (!updatedIds.has(existingTaskId)) {
+        results.errors.push({ index, title: task.title, error: 'Tâche existante introuvable' });
+      }
+    }
+    progress.advance(items.length);
+  }
+};
+
+const importKey = (userId) => `import:${userId}`;
+
+/**
+ * Démarre le suivi d'un import. Un seul import à la fois par utilisateur cible dans tout
+ * le cluster (409 sinon) ; la progression { total, processed, phase, startedAt } est publiée
+ * dans l'état partagé (voir services/clusterState), lisible quel que soit le worker.
+ */
+const beginImport = async (userId, total, startedAt) => {
+  const key = importKey(userId);
+  if (!(await acquireSlot(key, 1))) {
+    throw Object.assign(new Error('Un import est déjà en cours pour cet utilisateur.'), { status: 409 });
+  }
+
+  const state = {
+    total,
+    processed: 0,
+    phase: 'categories',
+    startedAt: new Date(startedAt).toISOString()
+  };
+  const publish = () => setSharedValue(key, { ...state });
+  publish();
+
+  return {
+    setPhase: (phase) => {
+      state.phase = phase;
+      publish();
+    },
+    advance: (count) => {
+      state.processed += count;
+      publish();
+    },
+    end: () => {
+      deleteSharedValue(key);
+      releaseSlot(key);
+    }
+  };
+};
+
+const withThroughput = (results, startedAt) => {
+  const durationMs = Date.now() - startedAt;
+  const rows = results.created + results.updated;
+
+  return {
+    ...results,
+    durationMs,
+    rowsPerSecond: durationMs > 0 ? Math.round((rows / durationMs) * 1000) : rows
+  };
+};
+
+/**
+ * Applique un import de tâches de manière ensembliste, dans une seule transaction.
+ */
+const runBulkImport = async (userId, rawTasks, resolutions) => {
+  const startedAt = Date.now();
+  const results = {
+    created: 0,
+    updated: 0,
+    skipped: 0,
+    errors: []
+  };
+
+  const rows = classifyRows(rawTasks, resolutions, results);
+  const progress = await beginImport(userId, rows.toCreate.length + rows.toUpdate.length, startedAt);
+
+  try {
+    await prisma.$transaction(
+      (tx) => applyRows(tx, userId, rows, results, progress),
+      { maxWait: 10000, timeout: IMPORT_TRANSACTION_TIMEOUT_MS }
+    );
+  } finally {
+    progress.end();
+  }
+
+  return withThroughput(results, startedAt);
+};
+
+const pushError = (results, error) => {
+  if (results.errors.length < MAX_REPORTED_ERRORS) {
+    results.errors.push(error);
+  } else {
+    results.errorsTruncated = true;
+  }
+};
+
+/**
+ * Applique un import lu en streaming, lot par lot (une transaction par lot).
+ * Les doublons de titre sont résolus par une politique unique (onConflict)
+ * puisque le fichier n'est pas conservé entre l'analyse et l'application.
+ */
+const runStreamingImport = async (userId, batches, { onConflict = 'skip' } = {}) => {
+  const startedAt = Date.now();
+  const results = {
+    created: 0,
+    updated: 0,
+    skipped: 0,
+    errors: []
+  };
+  // Total inconnu : le fichier est lu au fil de l'import
+  const progress = await beginImport(userId, null, startedAt);
+
+  try {
+    let index = 0;
+
+    for await (const batch of batches) {
+      const rows = { toCreate: [], toUpdate: [] };
+      const duplicates = await findDuplicates(userId, batch);
+
+      for (const [position, task] of batch.entries()) {
+        const i = index++;
+
+        if (!hasTitle(task)) {
+          pushError(results, { index: i, error: 'Titre manquant' });
+          continue;
+        }
+
+        const duplicate = duplicates[position];
+        let target = rows.toCreate;
+        let existingTaskId;
+
+        if (duplicate) {
+          if (onConflict === 'skip') {
+            results.skipped++;
+            continue;
+          }
+          if (onConflict === 'overwrite') {
+            target = rows.toUpdate;
+            existingTaskId = duplicate.existingTasks[0].id;
+          }
+        }
+
+        try {
+          target.push({ index: i, task, row: toTaskRow(task), existingTaskId });
+        } catch (err) {
+          pushError(results, { index: i, title: task.title, error: err.message });
+        }
+      }
+
+      await prisma.$transaction(
+        (tx) => applyRows(tx, userId, rows, results, progress),
+        { maxWait: 10000, timeout: IMPORT_TRANSACTION_TIMEOUT_MS }
+      );
+    }
+  } finally {
+    progress.end();
+  }
+
+  return withThroughput(results, startedAt);
+};
+
+/**
+ * Progression de l'import en cours pour un utilisateur (ou null)
+ */
+const getImportProgress = async (userId) => {
+  const progress = await getSharedValue(importKey(userId));
+  if (!progress) return null;
+  // Total inconnu pour un import en streaming
+  let percent = null;
+  if (progress.total !== null) {
+    percent = progress.total > 0 ? Math.round((progress.processed / progress.total) * 100) : 100;
+  }
+  return { ...progress, percent };
+};
+
+module.exports = {
+  IMPORT_CHUNK_SIZE,
+  CONFLICT_POLICIES,
+  runBulkImport,
+  runStreamingImport,
+  getImportProgress
+};
@@ -0,0 +1,137 @@
+const EventEmitter = require('events');
+const { Client } = require('pg');
+
+// Flux de changements : notifications PostgreSQL (canal task_changes, voir migration
+// add_change_notifications) relayées aux abonnés SSE de cette instance
+const CHANGE_STREAM_ENABLED = process.env.CHANGE_STREAM_ENABLED !== 'false';
+const CHANGE_STREAM_CHANNEL = 'task_changes';
+const RECONNECT_MIN_MS = 1000;
+const RECONNECT_MAX_MS = 30000;
+
+const bus = new EventEmitter();
+bus.setMaxListeners(0);
+
+const stats = {
+  listening: false,
+  notifications: 0,
+  invalid: 0,
+  reconnects: 0
+};
+
+let client = null;
+let reconnectTimer = null;
+let reconnectDelay = RECONNECT_MIN_MS;
+let stopped = false;
+
+/**
+ * Notification -> événement { ownerId, entity, action, count, items }
+ * items : [{ id, categoryId, previousCategoryId }] ou null si trop nombreux
+ */
+const parseNotification = (payload) => {
+  const data = JSON.parse(payload);
+  return {
+    ownerId: data.o,
+    entity: data.e,
+    action: data.a,
+    count: data.n,
+    items: Array.isArray(data.i)
+      ? data.i.map(item => ({ id: item.i, categoryId: item.c || null, previousCategoryId: item.p || null }))
+      : null
+  };
+};
+
+const scheduleReconnect = () => {
+  if (stopped || reconnectTimer) return;
+
+  reconnectTimer = setTimeout(() => {
+    reconnectTimer = null;
+    stats.reconnects++;
+    connect();
+  }, reconnectDelay);
+  reconnectTimer.unref();
+  reconnectDelay = Math.min(reconnectDelay * 2, RECONNECT_MAX_MS);
+};
+
+// Connexion dédiée : LISTEN ne passe pas par le pool de Prisma
+const connect = async () => {
+  const listener = new Client({ connectionString: process.env.DATABASE_URL });
+  client = listener;
+
+  listener.on('notification', (message) => {
+    if (message.channel !== CHANGE_STREAM_CHANNEL) return;
+    try {
+      const event = parseNotification(message.payload);
+      stats.notifications++;
+      bus.emit('change', event);
+    } catch (error) {
+      stats.invalid++;
+    }
+  });
+
+  const onLost = (error) => {
+    if (client !== listener) return;
+    client = null;
+    stats.listening = false;
+    if (error) console.error('Flux de changements : connexion perdue:', error.message);
+    listener.end().catch(() => {});
+    // Des notifications ont pu être perdues : les clients se resynchronisent (?since=)
+    bus.emit('change', { resync: true });
+    scheduleReconnect();
+  };
+  listener.on('error', onLost);
+  listener.on('end', () => onLost(null));
+
+  try {
+    await listener.connect();
+    await listener.query(`LISTEN ${CHANGE_STREAM_CHANNEL}`);
+    stats.listening = true;
+    reconnectDelay = RECONNECT_MIN_MS;
+  } catch (error) {
+    onLost(error);
+  }
+};
+
+/**
+ * Démarre l'écoute des notifications (une connexion par instance)
+ */
+const startChangeListener = () => {
+  if (!CHANGE_STREAM_ENABLED || client) return;
+  stopped = false;
+  connect();
+};
+
+const stopChangeListener = async () => {
+  stopped = true;
+  if (reconnectTimer) {
+    clearTimeout(reconnectTimer);
+    reconnectTimer = null;
+  }
+  if (client) {
+    const listener = client;
+    client = null;
+    stats.listening = false;
+    await listener.end().catch(() => {});
+  }
+};
+
+/**
+ * S'abonne aux changements ; retourne la fonction de désabonnement
+ */
+const subscribe = (listener) => {
+  bus.on('change', listener);
+  return () => bus.off('change', listener);
+};
+
+const getChangeStreamStats = () => ({
+  enabled: CHANGE_STREAM_ENABLED,
+  ...stats,
+  subscribers: bus.listenerCount('change')
+});
+
+module.exports = {
+  CHANGE_STREAM_ENABLED,
+  startChangeListener,
+  stopChangeListener,
+  subscribe,
+  getChangeStreamStats
+};
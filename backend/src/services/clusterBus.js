@@ -0,0 +1,98 @@
+const cluster = require('cluster');
+
+// Messages IPC entre les workers du cluster, relayés par le processus principal (voir cluster.js).
+// Hors cluster, les fonctions sont sans effet.
+
+// Attente maximale d'une réponse du processus principal
+const REQUEST_TIMEOUT_MS = 2000;
+
+const handlers = new Map();
+// requestId -> résolution d'une requête en attente de réponse
+const pendingRequests = new Map();
+let lastRequestId = 0;
+
+/**
+ * Envoie un message au processus principal (sans effet hors worker)
+ */
+const notifyPrimary = (message) => {
+  if (!cluster.isWorker || !process.connected) return;
+  try {
+    process.send(message);
+  } catch (error) {
+    // Canal IPC fermé pendant l'arrêt : rien à faire
+  }
+};
+
+/**
+ * Envoie une requête au processus principal et attend sa réponse.
+ * Résout avec null hors worker, canal fermé ou sans réponse après REQUEST_TIMEOUT_MS.
+ */
+const requestPrimary = (message) => new Promise((resolve) => {
+  if (!cluster.isWorker || !process.connected) return resolve(null);
+
+  const requestId = ++lastRequestId;
+  const timer = setTimeout(() => {
+    pendingRequests.delete(requestId);
+    resolve(null);
+  }, REQUEST_TIMEOUT_MS);
+
+  pendingRequests.set(requestId, (payload) => {
+    clearTimeout(timer);
+    pendingRequests.delete(requestId);
+    resolve(payload);
+  });
+  notifyPrimary({ ...message, requestId });
+});
+
+/**
+ * Diffuse un événement aux autres workers (ex. invalidation d'un cache local)
+ */
+const broadcast = (event, payload) => {
+  notifyPrimary({ type: 'broadcast', event, payload });
+};
+
+/**
+ * Diffuse un événement aux autres workers et attend qu'ils l'aient traité
+ * (ex. écriture de leurs files avant une lecture)
+ */
+const broadcastAndWait = async (event, payload) => {
+  await requestPrimary({ type: 'broadcast', event, payload });
+};
+
+/**
+ * Traite un événement diffusé par un autre worker (ou par le processus principal) ;
+ * le handler peut être asynchrone
+ */
+const onBroadcast = (event, handler) => {
+  handlers.set(event, handler);
+};
+
+if (cluster.isWorker) {
+  process.on('message', async (message) => {
+    if (!message) return;
+
+    if (message.type === 'reply') {
+      const resolve = pendingRequests.get(message.requestId);
+      if (resolve) resolve(message.payload);
+      return;
+    }
+
+    if (message.type !== 'broadcast') return;
+    const handler = handlers.get(message.event);
+    try {
+      if (handler) await handler(message.payload);
+    } catch (error) {
+      console.error(`Erreur traitement de l'événement cluster ${message.event}:`, error);
+    }
+    // Diffusion avec attente : le processus principal compte les accusés de réception
+    if (message.ackId) notifyPrimary({ type: 'broadcast-ack', ackId: message.ackId });
+  });
+}
+
+module.exports = {
+  notifyPrimary,
+  requestPrimary,
+  broadcast,
+  broadcastAndWait,
+  onBroadcast
+};
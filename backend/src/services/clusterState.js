@@ -0,0 +1,139 @@
+const cluster = require('cluster');
+const { notifyPrimary, requestPrimary } = require('./clusterBus');
+
+// État partagé par les workers du cluster, tenu par le processus principal (voir cluster.js) :
+// - slots : compteurs bornés (ex. flux ouverts par utilisateur, import en cours) ;
+// - valeurs par clé (ex. progression d'un import).
+// Chaque entrée appartient au worker qui l'a posée et disparaît s'il s'arrête.
+// Hors cluster, le même état est tenu localement.
+
+class SharedState {
+  constructor () {
+    // clé -> Map(workerId -> slots détenus)
+    this.slots = new Map();
+    // clé -> { workerId, value }
+    this.values = new Map();
+  }
+
+  acquire (workerId, key, max) {
+    const holders = this.slots.get(key) || new Map();
+    let held = 0;
+    for (const count of holders.values()) held += count;
+    if (held >= max) return false;
+
+    holders.set(workerId, (holders.get(workerId) || 0) + 1);
+    this.slots.set(key, holders);
+    return true;
+  }
+
+  release (workerId, key) {
+    const holders = this.slots.get(key);
+    const count = holders && holders.get(workerId);
+    if (!count) return;
+
+    if (count > 1) holders.set(workerId, count - 1);
+    else holders.delete(workerId);
+    if (holders.size === 0) this.slots.delete(key);
+  }
+
+  set (workerId, key, value) {
+    this.values.set(key, { workerId, value });
+  }
+
+  get (key) {
+    const entry = this.values.get(key);
+    return entry ? entry.value : null;
+  }
+
+  delete (workerId, key) {
+    const entry = this.values.get(key);
+    if (entry && entry.workerId === workerId) this.values.delete(key);
+  }
+
+  /**
+   * Retire tout ce que détenait un worker arrêté
+   */
+  dropWorker (workerId) {
+    for (const [key, holders] of this.slots) {
+      holders.delete(workerId);
+      if (holders.size === 0) this.slots.delete(key);
+    }
+    for (const [key, entry] of this.values) {
+      if (entry.workerId === workerId) this.values.delete(key);
+    }
+  }
+
+  /**
+   * Traite un message state-* d'un worker (processus principal) ; retourne false sinon
+   */
+  handle (worker, message) {
+    const reply = (payload) => {
+      if (worker.isConnected()) worker.send({ type: 'reply', requestId: message.requestId, payload });
+    };
+
+    switch (message.type) {
+      case 'state-acquire':
+        reply(this.acquire(worker.id, message.key, message.max));
+        return true;
+      case 'state-release':
+        this.release(worker.id, message.key);
+        return true;
+      case 'state-set':
+        this.set(worker.id, message.key, message.value);
+        return true;
+      case 'state-get':
+        reply(this.get(message.key));
+        return true;
+      case 'state-delete':
+        this.delete(worker.id, message.key);
+        return true;
+      default:
+        return false;
+    }
+  }
+}
+
+const localState = new SharedState();
+const LOCAL_WORKER = 0;
+
+/**
+ * Prend un slot de key si moins de max sont pris dans tout le cluster.
+ * Processus principal injoignable : le slot est accordé (pas de blocage des utilisateurs).
+ */
+const acquireSlot = async (key, max) => {
+  if (!cluster.isWorker) return localState.acquire(LOCAL_WORKER, key, max);
+  const granted = await requestPrimary({ type: 'state-acquire', key, max });
+  return granted !== false;
+};
+
+const releaseSlot = (key) => {
+  if (!cluster.isWorker) return localState.release(LOCAL_WORKER, key);
+  notifyPrimary({ type: 'state-release', key });
+};
+
+/**
+ * Publie une valeur (JSON) lisible depuis tous les workers
+ */
+const setSharedValue = (key, value) => {
+  if (!cluster.isWorker) return localState.set(LOCAL_WORKER, key, value);
+  notifyPrimary({ type: 'state-set', key, value });
+};
+
+const getSharedValue = async (key) => {
+  if (!cluster.isWorker) return localState.get(key);
+  return requestPrimary({ type: 'state-get', key });
+};
+
+const deleteSharedValue = (key) => {
+  if (!cluster.isWorker) return localState.delete(LOCAL_WORKER, key);
+  notifyPrimary({ type: 'state-delete', key });
+};
+
+module.exports = {
+  SharedState,
+  acquireSlot,
+  releaseSlot,
+  setSharedValue,
+  getSharedValue,
+  deleteSharedValue
+};
@@ -0,0 +1,144 @@
+const prisma = require('../config/database');
+const { resolveAcceptedDelegations } = require('./delegationResolver');
+const { keysetPaginate, andWhere, clampLimit, cursorPageMeta } = require('../utils/pagination');
+
+// Clés de tri acceptées (sort_by) ; l'id complète l'ordre pour la pagination par curseur
+const DELEGATED_SORT_KEYS = {
+  due_date: { field: 'dueDate', type: 'date', nullable: true },
+  created_at: { field: 'createdAt', type: 'date' },
+  updated_at: { field: 'updatedAt', type: 'date' },
+  importance: { field: 'importance' },
+  title: { field: 'title' }
+};
+
+const listError = (message, status) => Object.assign(new Error(message), { status });
+
+/**
+ * Tâches visibles d'un owner : hors catégories cachées au délégué
+ */
+const ownerScope = (delegation) => {
+  if (delegation.hiddenCategoryIdList.length === 0) {
+    return { userId: delegation.ownerId };
+  }
+
+  return {
+    userId: delegation.ownerId,
+    OR: [
+      { categoryId: null },
+      { categoryId: { notIn: delegation.hiddenCategoryIdList } }
+    ]
+  };
+};
+
+/**
+ * Vue consolidée des tâches de tous les owners ayant délégué à delegateId :
+ * une requête pour les délégations acceptées, une requête pour les tâches (une branche par owner),
+ * triées et paginées par curseur. Chaque tâche porte son ownerId ; owners décrit les owners et permissions.
+ * Avec une projection, seules ses colonnes sont lues et les tâches sont renvoyées telles quelles.
+ */
+const listDelegatedTasks = async ({
+  delegateId,
+  ownerIds,
+  status,
+  importance,
+  sortBy = 'due_date',
+  sortOrder,
+  limit,
+  cursor,
+  count = false,
+  projection = null,
+  req
+}) => {
+  const sortKey = DELEGATED_SORT_KEYS[sortBy];
+  if (!sortKey) {
+    throw listError(`Tri invalide : ${Object.keys(DELEGATED_SORT_KEYS).join(', ')}.`, 400);
+  }
+
+  // Échéance la plus proche d'abord ; plus récentes d'abord pour les dates de création/modification
+  const direction = sortOrder === 'asc' || sortOrder === 'desc'
+    ? sortOrder
+    : (sortBy === 'created_at' || sortBy === 'updated_at' ? 'desc' : 'asc');
+  const take = clampLimit(limit);
+
+  // Curseur vérifié avant toute requête (erreur 400 si invalide)
+  const keyset = keysetPaginate({
+    keys: [
+      { ...sortKey, direction },
+      { field: 'id', direction }
+    ],
+    cursor,
+    limit: take
+  });
+
+  let delegations = await resolveAcceptedDelegations(delegateId, req);
+
+  if (ownerIds && ownerIds.length > 0) {
+    const requested = new Set(ownerIds);
+    delegations = delegations.filter(({ delegation }) => requested.has(delegation.ownerId));
+    if (delegations.length !== requested.size) {
+      throw listError('Accès non autorisé.', 403);
+    }
+  }
+
+  const owners = delegations.map(({ delegation, owner }) => ({
+    ...owner,
+    permissions: {
+      canCreateTasks: delegation.canCreateTasks,
+      canEditTasks: delegation.canEditTasks,
+      canDeleteTasks: delegation.canDeleteTasks,
+      canCreateCategories: delegation.canCreateCategories
+    }
+  }));
+
+  if (delegations.length === 0) {
+    return { tasks: [], owners, ...cursorPageMeta({ nextCursor: null, limit: take, total: count ? 0 : null }) };
+  }
+
+  const where = {
+    OR: delegations.map(({ delegation }) => ownerScope(delegation))
+  };
+
+  if (status && status !== 'all') {
+    where.status = status;
+  }
+
+  if (importance) {
+    where.importance = importance;
+  }
+
+  const [rows, total] = await Promise.all([
+    prisma.task.findMany({
+      where: andWhere(where, keyset.where),
+      orderBy: keyset.orderBy,
+      take: keyset.take,
+      // Projection (voir services/taskProjection) : colonnes demandées et clé de tri
+      ...(projection
+        ? { select: projection.select([sortKey.field]) }
+        : {
+            include: {
+              category: {
+                select: {
+                  id: true,
+                  name: true,
+                  color: true
+                }
+              }
+            }
+          })
+    }),
+    count ? prisma.task.count({ where }) : null
+  ]);
+
+  const { items, nextCursor } = keyset.page(rows);
+
+  return {
+    tasks: projection ? items : items.map(task => ({ ...task, ownerId: task.userId })),
+    owners,
+    ...cursorPageMeta({ nextCursor, limit: take, total })
+  };
+};
+
+module.exports = {
+  listDelegatedTasks,
+  DELEGATED_SORT_KEYS
+};
@@ -0,0 +1,201 @@
+const prisma = require('../config/database');
+const LruCache = require('../utils/lruCache');
+const { broadcast, onBroadcast } = require('./clusterBus');
+
+const DELEGATION_CACHE_TTL_MS = parseInt(process.env.DELEGATION_CACHE_TTL_MS || '60000', 10);
+const DELEGATION_CACHE_MAX = parseInt(process.env.DELEGATION_CACHE_MAX || '5000', 10);
+
+// Cache partagé entre requêtes : "ownerId:delegateId" -> permissions compilées (ou null)
+const delegationsCache = new LruCache({ max: DELEGATION_CACHE_MAX, ttlMs: DELEGATION_CACHE_TTL_MS });
+
+// Voir authCache : évite de réinsérer une valeur lue avant une invalidation
+let generation = 0;
+
+// Accès complet du propriétaire sur ses propres données
+const OWNER_ACCESS = Object.freeze({
+  isOwner: true,
+  delegationId: null,
+  canCreateTasks: true,
+  canEditTasks: true,
+  canDeleteTasks: true,
+  canCreateCategories: true,
+  hiddenCategoryIds: new Set(),
+  hiddenCategoryIdList: Object.freeze([])
+});
+
+const cacheKey = (ownerId, delegateId) => `${ownerId}:${delegateId}`;
+
+/**
+ * Compile une délégation acceptée en objet de permissions immuable.
+ * hiddenCategoryIds (CSV en base) est parsé une seule fois en Set.
+ */
+const compileDelegation = (delegation) => {
+  const hiddenCategoryIdList = delegation.hiddenCategoryIds
+    ? delegation.hiddenCategoryIds.split(',').filter(Boolean)
+    : [];
+
+  return Object.freeze({
+    isOwner: false,
+    delegationId: delegation.id,
+    ownerId: delegation.ownerId,
+    delegateId: delegation.delegateId,
+    canCreateTasks: delegation.canCreateTasks,
+    canEditTasks: delegation.canEditTasks,
+    canDeleteTasks: delegation.canDeleteTasks,
+    canCreateCategories: delegation.canCreateCategories,
+    hiddenCategoryIds: new Set(hiddenCategoryIdList),
+    hiddenCategoryIdList: Object.freeze(hiddenCategoryIdList)
+  });
+};
+
+const fetchDelegation = async (delegateId, ownerId) => {
+  const cached = delegationsCache.get(cacheKey(ownerId, delegateId));
+  if (cached !== undefined) return cached;
+
+  const startGeneration = generation;
+  const delegation = await prisma.taskDelegation.findFirst({
+    where: {
+      ownerId,
+      delegateId,
+      status: 'accepted'
+    }
+  });
+
+  const compiled = delegation ? compileDelegation(delegation) : null;
+
+  if (DELEGATION_CACHE_TTL_MS > 0 && startGeneration === generation) {
+    delegationsCache.set(cacheKey(ownerId, delegateId), compiled);
+  }
+
+  return compiled;
+};
+
+/**
+ * Retourne la délégation acceptée de ownerId vers delegateId (ou null).
+ * Mémoïsée sur la requête (req.delegations) puis dans le cache partagé.
+ */
+const resolveDelegation = (delegateId, ownerId, req) => {
+  if (!req) return fetchDelegation(delegateId, ownerId);
+
+  if (!req.delegations) req.delegations = new Map();
+
+  const key = cacheKey(ownerId, delegateId);
+  if (!req.delegations.has(key)) {
+    req.delegations.set(key, fetchDelegation(delegateId, ownerId));
+  }
+
+  return req.delegations.get(key);
+};
+
+/**
+ * Toutes les délégations acceptées reçues par delegateId, en une requête :
+ * [{ delegation: permissions compilées, owner: { id, username, firstName, lastName } }] par owner.
+ * Alimente le cache partagé et la mémoïsation de la requête pour les accès suivants owner par owner.
+ */
+const resolveAcceptedDelegations = async (delegateId, req) => {
+  const startGeneration = generation;
+  const delegations = await prisma.taskDelegation.findMany({
+    where: {
+      delegateId,
+      status: 'accepted'
+    },
+    include: {
+      owner: {
+        select: { id: true, username: true, firstName: true, lastName: true }
+      }
+    },
+    orderBy: { createdAt: 'asc' }
+  });
+
+  if (req && !req.delegations) req.delegations = new Map();
+
+  return delegations.map(({ owner, ...row }) => {
+    const compiled = compileDelegation(row);
+    const key = cacheKey(row.ownerId, delegateId);
+
+    if (DELEGATION_CACHE_TTL_MS > 0 && startGeneration === generation) {
+      delegationsCache.set(key, compiled);
+    }
+    if (req) req.delegations.set(key, Promise.resolve(compiled));
+
+    return { delegation: compiled, owner };
+  });
+};
+
+/**
+ * Retourne les permissions de actorId sur les données de ownerId :
+ * accès complet pour le propriétaire, délégation compilée ou null sinon.
+ */
+const resolveAccess = async (actorId, ownerId, req) => {
+  if (actorId === ownerId) return OWNER_ACCESS;
+  return resolveDelegation(actorId, ownerId, req);
+};
+
+/**
+ * Vérifie une permission sur un objet retourné par resolveAccess
+ */
+const hasPermission = (access, permission) => {
+  if (!access) return false;
+
+  switch (permission) {
+    case 'view':
+      return true;
+    case 'create':
+      return access.canCreateTasks;
+    case 'edit':
+      return access.canEditTasks;
+    case 'delete':
+      return access.canDeleteTasks;
+    case 'createCategory':
+      return access.canCreateCategories;
+    default:
+      return false;
+  }
+};
+
+/**
+ * Invalide la délégation entre un owner et un délégué
+ */
+const dropDelegation = ({ ownerId, delegateId }) => {
+  generation++;
+  delegationsCache.delete(cacheKey(ownerId, delegateId));
+};
+
+const invalidateDelegation = (ownerId, delegateId) => {
+  dropDelegation({ ownerId, delegateId });
+  // Mode cluster : les autres workers ont leur propre cache
+  broadcast('delegation', { ownerId, delegateId });
+};
+
+/**
+ * Invalide toutes les délégations impliquant un utilisateur (suppression de compte)
+ */
+const dropDelegationsForUser = (userId) => {
+  generation++;
+  for (const key of [...delegationsCache.entries.keys()]) {
+    const [ownerId, delegateId] = key.split(':');
+    if (ownerId === userId || delegateId === userId) {
+      delegationsCache.delete(key);
+    }
+  }
+};
+
+const invalidateDelegationsForUser = (userId) => {
+  dropDelegationsForUser(userId);
+  broadcast('delegation:user', userId);
+};
+
+onBroadcast('delegation', dropDelegation);
+onBroadcast('delegation:user', dropDelegationsForUser);
+
+const getDelegationCacheStats = () => delegationsCache.stats();
+
+module.exports = {
+  resolveDelegation,
+  resolveAcceptedDelegations,
+  resolveAccess,
+  hasPermission,
+  invalidateDelegation,
+  invalidateDelegationsForUser,
+  getDelegationCacheStats
+};
@@ -0,0 +1,157 @@
+const { Prisma } = require('@prisma/client');
+const prisma = require('../config/database');
+
+// Similarité trigramme minimale pour le niveau approximatif (0..1)
+const IMPORT_FUZZY_THRESHOLD = parseFloat(process.env.IMPORT_FUZZY_THRESHOLD || '0.6');
+
+// Candidats approximatifs retenus par tâche importée
+const FUZZY_MAX_CANDIDATES = 3;
+
+// Nombre de titres envoyés par requête
+const LOOKUP_CHUNK_SIZE = 1000;
+
+// Passe à false si pg_trgm n'est pas installé
+let fuzzyAvailable = true;
+
+/**
+ * Titre normalisé, identique à l'expression indexée lower(btrim(title))
+ */
+const titleKey = (title) => String(title).replace(/^ +| +$/g, '').toLowerCase();
+
+const dateKey = (value) => {
+  if (!value) return '';
+  const date = value instanceof Date ? value : new Date(value);
+  return Number.isNaN(date.getTime()) ? '' : date.toISOString().slice(0, 10);
+};
+
+const categoryKey = (name) => (name ? name.trim().toLowerCase() : '');
+
+/**
+ * Clé complète : titre normalisé + échéance + catégorie
+ */
+const importKey = (task) => `${titleKey(task.title)}|${dateKey(task.dueDate)}|${categoryKey(task.category?.name)}`;
+const existingKey = (row) => `${row.key}|${dateKey(row.dueDate)}|${categoryKey(row.categoryName)}`;
+
+const toExisting = (row) => ({
+  id: row.id,
+  title: row.title,
+  status: row.status,
+  importance: row.importance,
+  dueDate: row.dueDate,
+  category: row.categoryName,
+  ...(row.score !== undefined && { similarity: Math.round(row.score * 100) / 100 })
+});
+
+const chunk = (items, size) => {
+  const chunks = [];
+  for (let i = 0; i < items.length; i += size) {
+    chunks.push(items.slice(i, i + size));
+  }
+  return chunks;
+};
+
+/**
+ * Tâches existantes dont le titre normalisé figure dans keys (index tasks_user_id_title_key_idx)
+ */
+const findByTitleKeys = async (userId, keys) => {
+  const rows = [];
+  for (const part of chunk(keys, LOOKUP_CHUNK_SIZE)) {
+    rows.push(...await prisma.$queryRaw`
+      SELECT t."id", t."title", t."status", t."importance", t."due_date" AS "dueDate",
+             c."name" AS "categoryName", lower(btrim(t."title")) AS "key"
+      FROM "tasks" t
+      LEFT JOIN "categories" c ON c."id" = t."category_id"
+      WHERE t."user_id" = ${userId}
+        AND lower(btrim(t."title")) = ANY(${part}::text[])
+    `);
+  }
+  return rows;
+};
+
+/**
+ * Meilleurs candidats par similarité trigramme pour des titres sans correspondance exacte
+ */
+const findSimilar = async (userId, titles) => {
+  const rows = [];
+  for (const part of chunk(titles, LOOKUP_CHUNK_SIZE)) {
+    rows.push(...await prisma.$queryRaw`
+      SELECT i."title" AS "input", m."id", m."title", m."status", m."importance",
+             m."due_date" AS "dueDate", c."name" AS "categoryName", m."score"
+      FROM unnest(${part}::text[]) AS i("title")
+      CROSS JOIN LATERAL (
+        SELECT t."id", t."title", t."status", t."importance", t."due_date", t."category_id",
+               similarity(t."title", i."title") AS "score"
+        FROM "tasks" t
+        WHERE t."user_id" = ${userId} AND t."title" % i."title"
+        ORDER BY "score" DESC
+        LIMIT ${FUZZY_MAX_CANDIDATES}
+      ) m
+      LEFT JOIN "categories" c ON c."id" = m."category_id"
+      WHERE m."score" >= ${IMPORT_FUZZY_THRESHOLD}::float4
+    `);
+  }
+  return rows;
+};
+
+const group = (rows, keyOf) => {
+  const map = new Map();
+  for (const row of rows) {
+    const key = keyOf(row);
+    if (!map.has(key)) map.set(key, []);
+    map.get(key).push(row);
+  }
+  return map;
+};
+
+/**
+ * Détecte les doublons d'une liste de tâches importées, en temps linéaire.
+ * Retourne un tableau parallèle à tasks : null ou { matchType, existingTasks }
+ * - exact : même titre normalisé, même échéance et même catégorie
+ * - title : même titre normalisé
+ * - fuzzy : titre proche (similarité trigramme, seulement si options.fuzzy)
+ */
+const findDuplicates = async (userId, tasks, { fuzzy = false } = {}) => {
+  const keys = [...new Set(tasks.filter(t => t && t.title).map(t => titleKey(t.title)))];
+  const byTitle = group(await findByTitleKeys(userId, keys), row => row.key);
+  const byFullKey = group([...byTitle.values()].flat(), existingKey);
+
+  const matches = tasks.map(task => {
+    if (!task || !task.title) return null;
+
+    const exact = byFullKey.get(importKey(task));
+    if (exact) return { matchType: 'exact', existingTasks: exact.map(toExisting) };
+
+    const sameTitle = byTitle.get(titleKey(task.title));
+    if (sameTitle) return { matchType: 'title', existingTasks: sameTitle.map(toExisting) };
+
+    return null;
+  });
+
+  if (!fuzzy || !fuzzyAvailable) return matches;
+
+  const unmatched = [...new Set(tasks.filter((t, i) => t && t.title && !matches[i]).map(t => t.title))];
+  if (unmatched.length === 0) return matches;
+
+  let similar;
+  try {
+    similar = group(await findSimilar(userId, unmatched), row => row.input);
+  } catch (error) {
+    // 42883 : fonction similarity / opérateur % absents (pg_trgm non installé)
+    if (error instanceof Prisma.PrismaClientKnownRequestError && error.meta?.code === '42883') {
+      console.warn('Détection approximative des doublons indisponible (pg_trgm non installé).');
+      fuzzyAvailable = false;
+      return matches;
+    }
+    throw error;
+  }
+
+  return matches.map((match, i) => {
+    if (match || !tasks[i] || !tasks[i].title) return match;
+    const candidates = similar.get(tasks[i].title);
+    return candidates ? { matchType: 'fuzzy', existingTasks: candidates.map(toExisting) } : null;
+  });
+};
+
+module.exports = {
+  findDuplicates
+};
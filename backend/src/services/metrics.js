@@ -0,0 +1,282 @@
+// Métriques au format d'exposition Prometheus (texte), sans dépendance externe :
+// durées des requêtes SQL (Prisma), des routes HTTP et des outils MCP, requêtes en cours,
+// plus les compteurs déjà exposés sur /health (collecteurs enregistrés par l'application).
+
+const METRICS_ENABLED = process.env.METRICS_ENABLED !== 'false';
+// Jeton Bearer exigé sur /metrics (aucun si vide)
+const METRICS_TOKEN = process.env.METRICS_TOKEN || '';
+// Seuil du journal des requêtes SQL lentes (ms, 0 = désactivé)
+const SLOW_QUERY_MS = parseInt(process.env.SLOW_QUERY_MS || '500', 10);
+
+// Bornes des histogrammes, en secondes
+const DURATION_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+const SLOW_QUERY_SQL_MAX_LENGTH = 300;
+
+class Histogram {
+  constructor (name, help, labelNames) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    // clé des labels -> { labels, buckets, sum, count }
+    this.series = new Map();
+  }
+
+  observe (labels, seconds) {
+    const key = this.labelNames.map(name => labels[name]).join('\u0000');
+    let series = this.series.get(key);
+    if (!series) {
+      series = { labels, buckets: new Array(DURATION_BUCKETS.length).fill(0), sum: 0, count: 0 };
+      this.series.set(key, series);
+    }
+
+    for (let i = 0; i < DURATION_BUCKETS.length; i++) {
+      if (seconds <= DURATION_BUCKETS[i]) series.buckets[i]++;
+    }
+    series.sum += seconds;
+    series.count++;
+  }
+
+  collect () {
+    const samples = [];
+    for (const { labels, buckets, sum, count } of this.series.values()) {
+      DURATION_BUCKETS.forEach((le, i) => {
+        samples.push({ suffix: '_bucket', labels: { ...labels, le: String(le) }, value: buckets[i] });
+      });
+      samples.push({ suffix: '_bucket', labels: { ...labels, le: '+Inf' }, value: count });
+      samples.push({ suffix: '_sum', labels, value: sum });
+      samples.push({ suffix: '_count', labels, value: count });
+    }
+    return { name: this.name, help: this.help, type: 'histogram', samples };
+  }
+}
+
+class Counter {
+  constructor (name, help, labelNames) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.series = new Map();
+  }
+
+  inc (labels, value = 1) {
+    const key = this.labelNames.map(name => labels[name]).join('\u0000');
+    const series = this.series.get(key);
+    if (series) series.value += value;
+    else this.series.set(key, { labels, value });
+  }
+
+  collect () {
+    return {
+      name: this.name,
+      help: this.help,
+      type: 'counter',
+      samples: [...this.series.values()].map(({ labels, value }) => ({ suffix: '', labels, value }))
+    };
+  }
+}
+
+const queryDuration = new Histogram(
+  'taskmanager_db_query_duration_seconds',
+  'Durée des requêtes Prisma par modèle et opération',
+  ['model', 'action']
+);
+const queryErrors = new Counter(
+  'taskmanager_db_query_errors_total',
+  'Requêtes Prisma en erreur par modèle et opération',
+  ['model', 'action']
+);
+const slowQueries = new Counter(
+  'taskmanager_db_slow_queries_total',
+  'Requêtes Prisma plus longues que SLOW_QUERY_MS',
+  ['model', 'action']
+);
+const httpDuration = new Histogram(
+  'taskmanager_http_request_duration_seconds',
+  'Durée des requêtes HTTP par route',
+  ['method', 'route', 'status']
+);
+const toolDuration = new Histogram(
+  'taskmanager_mcp_tool_duration_seconds',
+  'Durée des appels d\'outils MCP',
+  ['tool', 'outcome']
+);
+
+let httpInFlight = 0;
+
+// Fonctions retournant des familles supplémentaires (ex. compteurs de /health)
+const collectors = [];
+
+/**
+ * Texte SQL d'une requête brute, pour le journal des requêtes lentes
+ */
+const describeRawQuery = (args) => {
+  const sql = Array.isArray(args) ? args[0] : args?.sql || args?.strings?.join('?');
+  if (typeof sql !== 'string') return null;
+  const text = sql.replace(/\s+/g, ' ').trim();
+  return text.length > SLOW_QUERY_SQL_MAX_LENGTH ? `${text.slice(0, SLOW_QUERY_SQL_MAX_LENGTH)}…` : text;
+};
+
+/**
+ * Enregistre une requête Prisma (voir config/database) ; journalise les requêtes lentes
+ */
+const observeQuery = ({ model, operation, args, durationMs, failed }) => {
+  const labels = { model: model || 'raw', action: operation };
+  if (METRICS_ENABLED) {
+    queryDuration.observe(labels, durationMs / 1000);
+    if (failed) queryErrors.inc(labels);
+  }
+
+  if (SLOW_QUERY_MS > 0 && durationMs >= SLOW_QUERY_MS) {
+    slowQueries.inc(labels);
+    const sql = model ? null : describeRawQuery(args);
+    console.warn(`Requête lente (${Math.round(durationMs)} ms) : ${model ? `${model}.${operation}` : operation}${sql ? ` - ${sql}` : ''}`);
+  }
+};
+
+const observeHttpRequest = ({ method, route, status, durationMs }) => {
+  httpDuration.observe({ method, route, status: String(status) }, durationMs / 1000);
+};
+
+const trackHttpInFlight = (delta) => {
+  httpInFlight += delta;
+};
+
+const observeToolCall = ({ tool, durationMs, failed }) => {
+  toolDuration.observe({ tool, outcome: failed ? 'error' : 'ok' }, durationMs / 1000);
+};
+
+const registerCollector = (collector) => {
+  collectors.push(collector);
+};
+
+/**
+ * Nom de métrique à partir d'un chemin d'objet (ex. caches.auth.users.hitRate -> caches_auth_users_hit_rate)
+ */
+const toMetricName = (parts) => parts
+  .join('_')
+  .replace(/([a-z0-9])([A-Z])/g, '$1_$2')
+  .replace(/[^a-zA-Z0-9_]/g, '_')
+  .toLowerCase();
+
+/**
+ * Convertit les valeurs numériques et booléennes d'un objet de statistiques en jauges
+ */
+const gaugesFromStats = (prefix, stats, help) => {
+  const families = [];
+  const walk = (value, path) => {
+    if (typeof value === 'number' && Number.isFinite(value)) {
+      families.push({ name: toMetricName([prefix, ...path]), help, type: 'gauge', samples: [{ suffix: '', labels: {}, value }] });
+    } else if (typeof value === 'boolean') {
+      families.push({ name: toMetricName([prefix, ...path]), help, type: 'gauge', samples: [{ suffix: '', labels: {}, value: value ? 1 : 0 }] });
+    } else if (value && typeof value === 'object' && !Array.isArray(value)) {
+      for (const [key, child] of Object.entries(value)) walk(child, [...path, key]);
+    }
+  };
+  walk(stats, []);
+  return families;
+};
+
+/**
+ * Familles de métriques du process (sérialisables, envoyées au processus principal en mode cluster)
+ */
+const collectMetrics = () => {
+  const memory = process.memoryUsage();
+  const families = [
+    queryDuration.collect(),
+    queryErrors.collect(),
+    slowQueries.collect(),
+    httpDuration.collect(),
+    {
+      name: 'taskmanager_http_requests_in_flight',
+      help: 'Requêtes HTTP en cours (flux SSE compris)',
+      type: 'gauge',
+      samples: [{ suffix: '', labels: {}, value: httpInFlight }]
+    },
+    toolDuration.collect(),
+    {
+      name: 'taskmanager_process_resident_memory_bytes',
+      help: 'Mémoire résidente du process',
+      type: 'gauge',
+      samples: [{ suffix: '', labels: {}, value: memory.rss }]
+    },
+    {
+      name: 'taskmanager_process_heap_used_bytes',
+      help: 'Tas JavaScript utilisé',
+      type: 'gauge',
+      samples: [{ suffix: '', labels: {}, value: memory.heapUsed }]
+    },
+    {
+      name: 'taskmanager_process_uptime_seconds',
+      help: 'Durée de vie du process',
+      type: 'gauge',
+      samples: [{ suffix: '', labels: {}, value: process.uptime() }]
+    }
+  ];
+
+  for (const collector of collectors) {
+    try {
+      families.push(...collector());
+    } catch (error) {
+      console.error('Erreur collecte des métriques:', error);
+    }
+  }
+  return families;
+};
+
+const escapeLabel = (value) => String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+
+/**
+ * Format d'exposition texte. Les familles de même nom (un process par worker) sont fusionnées.
+ */
+const renderMetrics = (families) => {
+  const merged = new Map();
+  for (const family of families) {
+    const existing = merged.get(family.name);
+    if (existing) existing.samples.push(...family.samples);
+    else merged.set(family.name, { ...family, samples: [...family.samples] });
+  }
+
+  const lines = [];
+  for (const { name, help, type, samples } of merged.values()) {
+    if (samples.length === 0) continue;
+    lines.push(`# HELP ${name} ${help}`);
+    lines.push(`# TYPE ${name} ${type}`);
+    for (const { suffix, labels, value } of samples) {
+      const entries = Object.entries(labels);
+      const labelText = entries.length > 0
+        ? `{${entries.map(([k, v]) => `${k}="${escapeLabel(v)}"`).join(',')}}`
+        : '';
+      lines.push(`${name}${suffix}${labelText} ${value}`);
+    }
+  }
+  return `${lines.join('\n')}\n`;
+};
+
+/**
+ * Ajoute un label à toutes les séries (ex. worker="2")
+ */
+const withLabel = (families, name, value) => families.map(family => ({
+  ...family,
+  samples: family.samples.map(sample => ({ ...sample, labels: { [name]: value, ...sample.labels } }))
+}));
+
+const isMetricsRequestAuthorized = (req) => {
+  if (!METRICS_TOKEN) return true;
+  return req.headers.authorization === `Bearer ${METRICS_TOKEN}`;
+};
+
+module.exports = {
+  METRICS_ENABLED,
+  SLOW_QUERY_MS,
+  observeQuery,
+  observeHttpRequest,
+  trackHttpInFlight,
+  observeToolCall,
+  registerCollector,
+  gaugesFromStats,
+  collectMetrics,
+  renderMetrics,
+  withLabel,
+  isMetricsRequestAuthorized
+};
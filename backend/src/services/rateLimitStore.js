@@ -0,0 +1,94 @@
+const path = require('path');
+const cluster = require('cluster');
+const prisma = require('../config/database');
+
+// Store des compteurs de express-rate-limit :
+// - memory : compteurs du process (défaut hors cluster)
+// - postgres : table rate_limits partagée par tous les workers (défaut en mode cluster)
+// - chemin d'un module exportant une fonction (options) => store compatible express-rate-limit
+const RATE_LIMIT_STORE = process.env.RATE_LIMIT_STORE || (cluster.isWorker ? 'postgres' : 'memory');
+
+// Fréquence minimale de purge des fenêtres expirées
+const PURGE_MIN_INTERVAL_MS = 60 * 1000;
+
+/**
+ * Compteurs en base : une ligne par clé, incrémentée par un upsert atomique.
+ * Une fenêtre expirée est remise à zéro par le même upsert.
+ */
+class PostgresRateLimitStore {
+  constructor ({ prefix = 'rl:' } = {}) {
+    this.prefix = prefix;
+    // Les compteurs ne sont pas propres au process
+    this.localKeys = false;
+    this.windowMs = 60 * 1000;
+    this.purgeTimer = null;
+  }
+
+  init (options) {
+    this.windowMs = options.windowMs;
+
+    if (!this.purgeTimer) {
+      this.purgeTimer = setInterval(() => {
+        this.purge().catch(err => console.error('Erreur purge du rate limiting:', err));
+      }, Math.max(this.windowMs, PURGE_MIN_INTERVAL_MS));
+      this.purgeTimer.unref();
+    }
+  }
+
+  async increment (key) {
+    const now = BigInt(Date.now());
+    const [row] = await prisma.$queryRaw`
+      INSERT INTO "rate_limits" ("key", "hits", "reset_at")
+      VALUES (${this.prefix + key}, 1, ${now + BigInt(this.windowMs)}::bigint)
+      ON CONFLICT ("key") DO UPDATE SET
+        "hits" = CASE WHEN "rate_limits"."reset_at" <= ${now}::bigint THEN 1 ELSE "rate_limits"."hits" + 1 END,
+        "reset_at" = CASE WHEN "rate_limits"."reset_at" <= ${now}::bigint THEN EXCLUDED."reset_at" ELSE "rate_limits"."reset_at" END
+      RETURNING "hits", "reset_at"::text AS "resetAt"
+    `;
+
+    return {
+      totalHits: row.hits,
+      resetTime: new Date(Number(row.resetAt))
+    };
+  }
+
+  async decrement (key) {
+    await prisma.$executeRaw`
+      UPDATE "rate_limits" SET "hits" = GREATEST("hits" - 1, 0)
+      WHERE "key" = ${this.prefix + key} AND "reset_at" > ${BigInt(Date.now())}::bigint
+    `;
+  }
+
+  async resetKey (key) {
+    await prisma.$executeRaw`DELETE FROM "rate_limits" WHERE "key" = ${this.prefix + key}`;
+  }
+
+  async purge () {
+    return prisma.$executeRaw`DELETE FROM "rate_limits" WHERE "reset_at" <= ${BigInt(Date.now())}::bigint`;
+  }
+
+  shutdown () {
+    if (this.purgeTimer) {
+      clearInterval(this.purgeTimer);
+      this.purgeTimer = null;
+    }
+  }
+}
+
+/**
+ * Store à passer à rateLimit({ store }) ; un store par limiteur, distingués par prefix.
+ * Retourne undefined pour le store mémoire par défaut de express-rate-limit.
+ */
+const createRateLimitStore = (prefix = 'rl:') => {
+  if (RATE_LIMIT_STORE === 'memory') return undefined;
+  if (RATE_LIMIT_STORE === 'postgres') return new PostgresRateLimitStore({ prefix });
+
+  const factory = require(path.resolve(RATE_LIMIT_STORE));
+  return factory({ prefix });
+};
+
+module.exports = {
+  RATE_LIMIT_STORE,
+  PostgresRateLimitStore,
+  createRateLimitStore
+};
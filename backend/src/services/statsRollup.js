@@ -0,0 +1,155 @@
+const prisma = require('../config/database');
+
+// Intervalle du job de réconciliation des agrégats (ms, 0 = désactivé)
+const STATS_RECONCILE_INTERVAL_MS = parseInt(process.env.STATS_RECONCILE_INTERVAL_MS || String(6 * 60 * 60 * 1000), 10);
+
+// Fenêtre (jours) recalculée pour les statistiques quotidiennes
+const STATS_RECONCILE_DAYS = parseInt(process.env.STATS_RECONCILE_DAYS || '35', 10);
+
+// Verrou consultatif : une seule réconciliation à la fois, même avec plusieurs instances
+const RECONCILE_LOCK_ID = 71001;
+
+let reconcileTimer = null;
+let lastReconcile = null;
+
+/**
+ * Recalcule les agrégats depuis la table tasks.
+ * Les compteurs par utilisateur sont remis à leur valeur exacte. Pour les jours récents,
+ * created/completed ne peuvent qu'augmenter (les tâches supprimées ne sont plus visibles).
+ */
+const reconcileTaskStats = async () => {
+  const startedAt = Date.now();
+
+  const result = await prisma.$transaction(async (tx) => {
+    const [{ locked }] = await tx.$queryRaw`SELECT pg_try_advisory_xact_lock(${RECONCILE_LOCK_ID}) AS locked`;
+    if (!locked) return null;
+
+    const users = await tx.$executeRaw`
+      INSERT INTO "user_task_stats" ("user_id", "total", "active", "completed", "updated_at")
+      SELECT u."id",
+             count(t."id"),
+             count(t."id") FILTER (WHERE t."status" = 'active'),
+             count(t."id") FILTER (WHERE t."status" = 'completed'),
+             CURRENT_TIMESTAMP
+      FROM "users" u
+      LEFT JOIN "tasks" t ON t."user_id" = u."id"
+      GROUP BY u."id"
+      ON CONFLICT ("user_id") DO UPDATE SET
+        "total" = EXCLUDED."total",
+        "active" = EXCLUDED."active",
+        "completed" = EXCLUDED."completed",
+        "updated_at" = EXCLUDED."updated_at"
+      WHERE ("user_task_stats"."total", "user_task_stats"."active", "user_task_stats"."completed")
+        IS DISTINCT FROM (EXCLUDED."total", EXCLUDED."active", EXCLUDED."completed")
+    `;
+
+    const days = await tx.$executeRaw`
+      INSERT INTO "task_daily_stats" ("day", "user_id", "created", "completed")
+      SELECT x."day", x."user_id", sum(x."created"), sum(x."completed")
+      FROM (
+        SELECT t."created_at"::date AS "day", t."user_id", 1 AS "created", 0 AS "completed"
+        FROM "tasks" t
+        WHERE t."created_at" >= CURRENT_DATE - ${STATS_RECONCILE_DAYS}::int
+        UNION ALL
+        SELECT t."completed_at"::date, t."user_id", 0, 1
+        FROM "tasks" t
+        WHERE t."completed_at" >= CURRENT_DATE - ${STATS_RECONCILE_DAYS}::int
+      ) x
+      GROUP BY x."day", x."user_id"
+      ON CONFLICT ("day", "user_id") DO UPDATE SET
+        "created" = GREATEST("task_daily_stats"."created", EXCLUDED."created"),
+        "completed" = GREATEST("task_daily_stats"."completed", EXCLUDED."completed")
+      WHERE "task_daily_stats"."created" < EXCLUDED."created"
+         OR "task_daily_stats"."completed" < EXCLUDED."completed"
+    `;
+
+    return { correctedUsers: users, correctedDays: days };
+  }, {
+    timeout: 60000
+  });
+
+  if (!result) {
+    return { skipped: true, reason: 'Réconciliation déjà en cours' };
+  }
+
+  lastReconcile = {
+    ...result,
+    at: new Date(),
+    durationMs: Date.now() - startedAt
+  };
+  return lastReconcile;
+};
+
+/**
+ * Statistiques de tâches du tableau de bord admin, lues dans les agrégats
+ */
+const getDashboardTaskStats = async ({ days = 30, top = 5 } = {}) => {
+  const since = new Date();
+  since.setUTCHours(0, 0, 0, 0);
+  since.setUTCDate(since.getUTCDate() - days);
+
+  const [totals, perDay, topUsers] = await Promise.all([
+    prisma.userTaskStats.aggregate({
+      _sum: { total: true, active: true, completed: true }
+    }),
+    prisma.taskDailyStats.groupBy({
+      by: ['day'],
+      where: { day: { gte: since } },
+      _sum: { created: true, completed: true, deleted: true },
+      orderBy: { day: 'asc' }
+    }),
+    prisma.userTaskStats.findMany({
+      where: { user: { role: 'user' } },
+      orderBy: { total: 'desc' },
+      take: top,
+      select: {
+        total: true,
+        user: {
+          select: { id: true, username: true, firstName: true, lastName: true }
+        }
+      }
+    })
+  ]);
+
+  return {
+    total: totals._sum.total || 0,
+    active: totals._sum.active || 0,
+    completed: totals._sum.completed || 0,
+    perDay: perDay.map(d => ({
+      date: d.day.toISOString().split('T')[0],
+      created: d._sum.created || 0,
+      completed: d._sum.completed || 0,
+      deleted: d._sum.deleted || 0
+    })),
+    topUsers
+  };
+};
+
+/**
+ * Démarre le job périodique de réconciliation
+ */
+const startStatsReconciler = () => {
+  if (reconcileTimer || STATS_RECONCILE_INTERVAL_MS <= 0) return;
+
+  reconcileTimer = setInterval(() => {
+    reconcileTaskStats().catch(err => console.error('Erreur réconciliation des statistiques:', err));
+  }, STATS_RECONCILE_INTERVAL_MS);
+  reconcileTimer.unref();
+};
+
+const stopStatsReconciler = () => {
+  if (reconcileTimer) {
+    clearInterval(reconcileTimer);
+    reconcileTimer = null;
+  }
+};
+
+const getLastReconcile = () => lastReconcile;
+
+module.exports = {
+  reconcileTaskStats,
+  getDashboardTaskStats,
+  startStatsReconciler,
+  stopStatsReconciler,
+  getLastReconcile
+};
@@ -0,0 +1,302 @@
+const crypto = require('crypto');
+const { z } = require('zod');
+const prisma = require('../config/database');
+const { hasPermission } = require('./delegationResolver');
+const { withActivityLog } = require('./activityLog');
+
+// Nombre maximum d'opérations par lot
+const TASK_BATCH_MAX_OPERATIONS = parseInt(process.env.TASK_BATCH_MAX_OPERATIONS || '500', 10);
+const TASK_BATCH_TRANSACTION_TIMEOUT_MS = parseInt(process.env.TASK_BATCH_TRANSACTION_TIMEOUT_MS || '30000', 10);
+
+// Opération -> permission de délégation, permission du token et action du journal
+const BATCH_OPERATIONS = {
+  create: { permission: 'create', tokenPermission: 'canCreateTasks', action: 'created_task', status: 'created' },
+  update: { permission: 'edit', tokenPermission: 'canUpdateTasks', action: 'updated_task', status: 'updated' },
+  complete: { permission: 'edit', tokenPermission: 'canUpdateTasks', action: 'completed_task', status: 'completed' },
+  reopen: { permission: 'edit', tokenPermission: 'canUpdateTasks', action: 'reopened_task', status: 'reopened' },
+  delete: { permission: 'delete', tokenPermission: 'canDeleteTasks', action: 'deleted_task', status: 'deleted' }
+};
+
+const taskFields = {
+  description: z.string().optional().nullable(),
+  importance: z.enum(['low', 'normal', 'high']).optional(),
+  categoryId: z.string().uuid().optional().nullable(),
+  dueDate: z.string().optional().nullable(),
+  dueTime: z.string().optional().nullable()
+};
+
+const operationSchema = z.discriminatedUnion('op', [
+  z.object({ op: z.literal('create'), title: z.string().trim().min(1, 'Titre requis').max(255), ...taskFields }),
+  z.object({ op: z.literal('update'), taskId: z.string().uuid(), title: z.string().trim().min(1).max(255).optional(), ...taskFields }),
+  z.object({ op: z.literal('complete'), taskId: z.string().uuid() }),
+  z.object({ op: z.literal('reopen'), taskId: z.string().uuid() }),
+  z.object({ op: z.literal('delete'), taskId: z.string().uuid() })
+]);
+
+const batchError = (message, status = 400) => Object.assign(new Error(message), { status });
+
+const parseDueDate = (value) => {
+  if (!value) return null;
+  const date = new Date(value);
+  if (Number.isNaN(date.getTime())) throw batchError(`Date invalide: ${value}`);
+  return date;
+};
+
+/**
+ * Colonnes modifiées par une opération create/update (seuls les champs fournis)
+ */
+const toTaskData = (item) => {
+  const data = {};
+  if (item.title !== undefined) data.title = item.title;
+  if (item.description !== undefined) data.description = item.description?.trim() || null;
+  if (item.importance !== undefined) data.importance = item.importance;
+  if (item.categoryId !== undefined) data.categoryId = item.categoryId || null;
+  if (item.dueDate !== undefined) data.dueDate = parseDueDate(item.dueDate);
+  if (item.dueTime !== undefined) data.dueTime = item.dueTime || null;
+  return data;
+};
+
+/**
+ * Valide les opérations : schéma, permissions, tâches et catégories du owner
+ * (deux requêtes pour tout le lot). Retourne les opérations valides et les erreurs par index.
+ */
+const validateOperations = async ({ ownerId, access, apiToken, operations }) => {
+  const errors = new Map();
+  const parsed = [];
+
+  operations.forEach((raw, index) => {
+    const result = operationSchema.safeParse(raw);
+    if (!result.success) {
+      errors.set(index, result.error.errors.map(e => [e.path.join('.'), e.message].filter(Boolean).join(': ')).join(', '));
+      return;
+    }
+
+    const item = result.data;
+    const spec = BATCH_OPERATIONS[item.op];
+
+    if (apiToken && apiToken.permissions?.[spec.tokenPermission] !== true) {
+      errors.set(index, `Permission refusée: ${spec.tokenPermission} requis.`);
+      return;
+    }
+    if (!hasPermission(access, spec.permission)) {
+      errors.set(index, 'Vous n\'avez pas la permission pour cette opération.');
+      return;
+    }
+
+    try {
+      parsed.push({ index, item, data: toTaskData(item) });
+    } catch (error) {
+      errors.set(index, error.message);
+    }
+  });
+
+  const taskIds = [...new Set(parsed.filter(p => p.item.taskId).map(p => p.item.taskId))];
+  const categoryIds = [...new Set(parsed.map(p => p.data.categoryId).filter(Boolean))];
+
+  const [tasks, categories] = await Promise.all([
+    taskIds.length > 0
+      ? prisma.task.findMany({ where: { id: { in: taskIds }, userId: ownerId } })
+      : [],
+    categoryIds.length > 0
+      ? prisma.category.findMany({ where: { id: { in: categoryIds }, userId: ownerId }, select: { id: true } })
+      : []
+  ]);
+
+  const tasksById = new Map(tasks.map(t => [t.id, t]));
+  const validCategoryIds = new Set(categories.map(c => c.id));
+  const seenTaskIds = new Set();
+  const valid = [];
+
+  for (const entry of parsed) {
+    const { index, item, data } = entry;
+
+    if (item.taskId) {
+      entry.existing = tasksById.get(item.taskId);
+      if (!entry.existing) {
+        errors.set(index, 'Tâche non trouvée.');
+        continue;
+      }
+      // Une tâche par lot : l'état lu à la validation reste celui sur lequel on écrit
+      if (seenTaskIds.has(item.taskId)) {
+        errors.set(index, 'Tâche présente plusieurs fois dans le lot.');
+        continue;
+      }
+      seenTaskIds.add(item.taskId);
+    }
+
+    if (data.categoryId) {
+      if (!validCategoryIds.has(data.categoryId)) {
+        errors.set(index, 'Catégorie invalide.');
+        continue;
+      }
+      if (access.hiddenCategoryIds.has(data.categoryId)) {
+        errors.set(index, 'Cette catégorie n\'est pas accessible.');
+        continue;
+      }
+    }
+
+    valid.push(entry);
+  }
+
+  return { valid, errors };
+};
+
+/**
+ * Écrit les opérations validées dans la transaction :
+ * créations en un createMany, complete/reopen/delete en un updateMany/deleteMany chacun,
+ * modifications une par une, puis relecture des tâches en une requête.
+ */
+const applyOperations = async (db, ownerId, entries) => {
+  const now = new Date();
+  const byOp = { create: [], update: [], complete: [], reopen: [], delete: [] };
+
+  for (const entry of entries) {
+    // complete/reopen sans effet : rien à écrire ni à journaliser
+    if ((entry.item.op === 'complete' && entry.existing.status === 'completed') ||
+        (entry.item.op === 'reopen' && entry.existing.status === 'active')) {
+      entry.unchanged = true;
+      continue;
+    }
+    byOp[entry.item.op].push(entry);
+  }
+
+  if (byOp.create.length > 0) {
+    byOp.create.forEach(entry => { entry.taskId = crypto.randomUUID(); });
+    await db.task.createMany({
+      data: byOp.create.map(({ taskId, data }) => ({
+        importance: 'normal',
+        ...data,
+        id: taskId,
+        userId: ownerId
+      }))
+    });
+  }
+
+  for (const entry of byOp.update) {
+    entry.taskId = entry.existing.id;
+    await db.task.update({ where: { id: entry.taskId }, data: entry.data });
+  }
+
+  if (byOp.complete.length > 0) {
+    await db.task.updateMany({
+      where: { id: { in: byOp.complete.map(e => e.existing.id) }, userId: ownerId },
+      data: { status: 'completed', completedAt: now }
+    });
+  }
+
+  if (byOp.reopen.length > 0) {
+    await db.task.updateMany({
+      where: { id: { in: byOp.reopen.map(e => e.existing.id) }, userId: ownerId },
+      data: { status: 'active', completedAt: null }
+    });
+  }
+
+  if (byOp.delete.length > 0) {
+    await db.task.deleteMany({
+      where: { id: { in: byOp.delete.map(e => e.existing.id) }, userId: ownerId }
+    });
+  }
+
+  const readBack = entries
+    .filter(e => !e.unchanged && e.item.op !== 'delete')
+    .map(e => e.taskId || e.existing.id);
+
+  const tasks = readBack.length > 0
+    ? await db.task.findMany({ where: { id: { in: readBack } }, include: { category: true } })
+    : [];
+
+  return new Map(tasks.map(t => [t.id, t]));
+};
+
+/**
+ * Entrées du journal d'activité, une par opération appliquée
+ */
+const describeOperations = (ownerId, actorId, entries, tasksById) => entries
+  .filter(entry => !entry.unchanged)
+  .map(({ item, existing, taskId }) => {
+    const task = tasksById.get(taskId || existing.id) || existing;
+    const entry = {
+      ownerId,
+      actorId,
+      action: BATCH_OPERATIONS[item.op].action,
+      entityType: 'task',
+      entityId: task.id,
+      entityTitle: task.title
+    };
+
+    if (item.op === 'update') {
+      const changes = {};
+      if (item.title && item.title !== existing.title) changes.title = { old: existing.title, new: item.title };
+      if (item.importance && item.importance !== existing.importance) changes.importance = { old: existing.importance, new: item.importance };
+      if (Object.keys(changes).length > 0) entry.details = changes;
+    }
+
+    return entry;
+  });
+
+/**
+ * Applique un lot d'opérations sur les tâches d'un owner (API REST et outil MCP tasks_batch).
+ * - access : permissions retournées par resolveAccess
+ * - apiToken : token PAT éventuel (permissions vérifiées par opération)
+ * - atomic : si une opération est invalide, aucune n'est appliquée
+ * Les opérations valides sont écrites dans une seule transaction ; le résultat est donné par opération.
+ */
+const runTaskBatch = async ({ actorId, ownerId, access, apiToken, operations, atomic = false }) => {
+  if (!Array.isArray(operations) || operations.length === 0) {
+    throw batchError('Aucune opération fournie.');
+  }
+  if (operations.length > TASK_BATCH_MAX_OPERATIONS) {
+    throw batchError(`Trop d'opérations (maximum ${TASK_BATCH_MAX_OPERATIONS}).`);
+  }
+
+  const { valid, errors } = await validateOperations({ ownerId, access, apiToken, operations });
+  const rejected = atomic && errors.size > 0;
+
+  let tasksById = new Map();
+  if (!rejected && valid.length > 0) {
+    tasksById = await withActivityLog(
+      (db) => applyOperations(db, ownerId, valid),
+      (result) => describeOperations(ownerId, actorId, valid, result),
+      { transaction: { timeout: TASK_BATCH_TRANSACTION_TIMEOUT_MS } }
+    );
+  }
+
+  const validByIndex = new Map(valid.map(entry => [entry.index, entry]));
+
+  const results = operations.map((raw, index) => {
+    const op = raw?.op;
+    if (errors.has(index)) {
+      return { index, op, status: 'error', taskId: raw?.taskId, error: errors.get(index) };
+    }
+
+    const entry = validByIndex.get(index);
+    const taskId = entry.taskId || entry.existing?.id;
+
+    if (rejected) {
+      return { index, op, status: 'skipped', taskId };
+    }
+    if (entry.unchanged) {
+      return { index, op, status: 'unchanged', taskId, task: entry.existing };
+    }
+    return {
+      index,
+      op,
+      status: BATCH_OPERATIONS[op].status,
+      taskId,
+      ...(op !== 'delete' && { task: tasksById.get(taskId) })
+    };
+  });
+
+  return {
+    applied: !rejected && valid.length > 0,
+    total: operations.length,
+    succeeded: rejected ? 0 : valid.length,
+    failed: errors.size,
+    results
+  };
+};
+
+module.exports = {
+  runTaskBatch,
+  TASK_BATCH_MAX_OPERATIONS
+};
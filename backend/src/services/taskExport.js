@@ -0,0 +1,182 @@
+const zlib = require('zlib');
+const prisma = require('../config/database');
+const { keysetPaginate, andWhere } = require('../utils/pagination');
+
+// Nombre de tâches lues par requête pendant un export
+const EXPORT_BATCH_SIZE = parseInt(process.env.EXPORT_BATCH_SIZE || '500', 10);
+
+const EXPORT_SORT_KEYS = [
+  { field: 'createdAt', direction: 'desc', type: 'date' },
+  { field: 'id', direction: 'desc' }
+];
+
+const escapeXml = (str) => {
+  if (!str) return '';
+  return String(str)
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&apos;');
+};
+
+const toExportTask = (task) => ({
+  id: task.id,
+  title: task.title,
+  description: task.description,
+  status: task.status,
+  importance: task.importance,
+  category: task.category ? {
+    name: task.category.name,
+    color: task.category.color
+  } : null,
+  dueDate: task.dueDate,
+  dueTime: task.dueTime,
+  completedAt: task.completedAt,
+  createdAt: task.createdAt,
+  updatedAt: task.updatedAt
+});
+
+const taskToXml = (task, indent) => {
+  const pad = ' '.repeat(indent);
+  let xml = `${pad}<task>\n`;
+  xml += `${pad}  <id>${escapeXml(task.id)}</id>\n`;
+  xml += `${pad}  <title>${escapeXml(task.title)}</title>\n`;
+  xml += `${pad}  <description>${escapeXml(task.description || '')}</description>\n`;
+  xml += `${pad}  <status>${escapeXml(task.status)}</status>\n`;
+  xml += `${pad}  <importance>${escapeXml(task.importance)}</importance>\n`;
+
+  if (task.category) {
+    xml += `${pad}  <category>\n`;
+    xml += `${pad}    <name>${escapeXml(task.category.name)}</name>\n`;
+    xml += `${pad}    <color>${escapeXml(task.category.color)}</color>\n`;
+    xml += `${pad}  </category>\n`;
+  } else {
+    xml += `${pad}  <category/>\n`;
+  }
+
+  xml += `${pad}  <dueDate>${task.dueDate ? task.dueDate.toISOString() : ''}</dueDate>\n`;
+  xml += `${pad}  <dueTime>${escapeXml(task.dueTime || '')}</dueTime>\n`;
+  xml += `${pad}  <completedAt>${task.completedAt ? task.completedAt.toISOString() : ''}</completedAt>\n`;
+  xml += `${pad}  <createdAt>${task.createdAt.toISOString()}</createdAt>\n`;
+  xml += `${pad}  <updatedAt>${task.updatedAt.toISOString()}</updatedAt>\n`;
+  xml += `${pad}</task>\n`;
+  return xml;
+};
+
+/**
+ * Lit les tâches d'un utilisateur par lots keyset (createdAt desc, id desc)
+ */
+async function* readTaskBatches(userId) {
+  let cursor = null;
+
+  do {
+    const page = keysetPaginate({ keys: EXPORT_SORT_KEYS, cursor, limit: EXPORT_BATCH_SIZE });
+    const rows = await prisma.task.findMany({
+      where: andWhere({ userId }, page.where),
+      include: { category: { select: { name: true, color: true } } },
+      orderBy: page.orderBy,
+      take: page.take
+    });
+
+    const { items, nextCursor } = page.page(rows);
+    if (items.length > 0) yield items;
+    cursor = nextCursor;
+  } while (cursor);
+}
+
+/**
+ * Écrit un fragment en respectant la contre-pression du flux de sortie
+ */
+const write = async (out, chunk) => {
+  if (out.destroyed) return;
+  if (!out.write(chunk)) {
+    await new Promise((resolve) => {
+      const done = () => {
+        out.off('drain', done);
+        out.off('close', done);
+        resolve();
+      };
+      out.once('drain', done);
+      out.once('close', done);
+    });
+  }
+};
+
+const acceptsGzip = (req) => /\bgzip\b/.test(req.headers['accept-encoding'] || '');
+
+/**
+ * Exporte les tâches d'un utilisateur en streaming (JSON ou XML).
+ * Les tâches sont lues par lots et écrites au fil de l'eau, compressées en gzip
+ * si le client l'accepte : la mémoire utilisée ne dépend pas du nombre de tâches.
+ *
+ * options :
+ * - header : champs JSON ajoutés avant totalTasks (ex: { user })
+ * - xmlRoot : 'tasks' (export utilisateur) ou 'export' (export admin avec <user>)
+ */
+const streamTaskExport = async (req, res, { userId, format, filename, header = {}, xmlRoot = 'tasks' }) => {
+  const totalTasks = await prisma.task.count({ where: { userId } });
+
+  res.set('Content-Type', format === 'xml' ? 'application/xml' : 'application/json');
+  res.set('Content-Disposition', `attachment; filename="${filename}.${format === 'xml' ? 'xml' : 'json'}"`);
+  res.set('Vary', 'Accept-Encoding');
+
+  let out = res;
+  if (acceptsGzip(req)) {
+    res.set('Content-Encoding', 'gzip');
+    out = zlib.createGzip();
+    out.pipe(res);
+  }
+
+  // Arrêter la lecture si le client se déconnecte
+  let aborted = false;
+  res.on('close', () => {
+    aborted = !res.writableFinished;
+    if (aborted && out !== res) out.destroy();
+  });
+
+  try {
+    if (format === 'xml') {
+      const indent = xmlRoot === 'export' ? 4 : 2;
+      if (xmlRoot === 'export') {
+        await write(out, '<?xml version="1.0" encoding="UTF-8"?>\n<export>\n');
+        await write(out, '  <user>\n');
+        await write(out, `    <username>${escapeXml(header.user?.username)}</username>\n`);
+        await write(out, `    <email>${escapeXml(header.user?.email)}</email>\n`);
+        await write(out, '  </user>\n  <tasks>\n');
+      } else {
+        await write(out, '<?xml version="1.0" encoding="UTF-8"?>\n<tasks>\n');
+      }
+
+      for await (const batch of readTaskBatches(userId)) {
+        if (aborted) return;
+        await write(out, batch.map(task => taskToXml(toExportTask(task), indent)).join(''));
+      }
+
+      await write(out, xmlRoot === 'export' ? '  </tasks>\n</export>' : '</tasks>');
+    } else {
+      const head = JSON.stringify({ exportDate: new Date().toISOString(), ...header, totalTasks });
+      await write(out, `${head.slice(0, -1)},"tasks":[`);
+
+      let first = true;
+      for await (const batch of readTaskBatches(userId)) {
+        if (aborted) return;
+        const json = batch.map(task => JSON.stringify(toExportTask(task))).join(',');
+        await write(out, first ? json : `,${json}`);
+        first = false;
+      }
+
+      await write(out, ']}');
+    }
+
+    out.end();
+  } catch (error) {
+    // Les en-têtes sont déjà envoyés : on ne peut plus répondre en JSON
+    console.error('Erreur pendant l\'export:', error);
+    res.destroy(error);
+  }
+};
+
+module.exports = {
+  streamTaskExport
+};
@@ -0,0 +1,197 @@
+const LruCache = require('../utils/lruCache');
+
+// Projection des listes de tâches (?fields=) et mode compact (?compact=true) :
+// - seules les colonnes demandées sont lues (select Prisma) ;
+// - en mode compact, chaque tâche ne porte que categoryId et les catégories sont envoyées
+//   une seule fois dans une table à part ;
+// - la sortie JSON est écrite par un sérialiseur précompilé par liste de champs.
+
+// Colonnes de catégorie renvoyées avec une tâche
+const CATEGORY_SELECT = { id: true, name: true, color: true };
+
+// Sérialiseurs précompilés, par schéma, mode et liste de champs
+const SERIALIZER_CACHE_MAX = 200;
+const serializers = new LruCache({ max: SERIALIZER_CACHE_MAX, ttlMs: Infinity });
+
+// Écriture JSON d'une valeur non nulle, par type
+const WRITERS = {
+  string: value => JSON.stringify(value),
+  number: value => String(value),
+  date: value => `"${value.toISOString()}"`,
+  // Date seule (YYYY-MM-DD)
+  day: value => `"${value.toISOString().slice(0, 10)}"`,
+  category: value => `{"id":${JSON.stringify(value.id)},"name":${JSON.stringify(value.name)},"color":${JSON.stringify(value.color)}}`
+};
+
+/**
+ * Schémas de sortie : nom public -> { field: champ Prisma, type, omitNull? }
+ * (omitNull : la clé est absente plutôt que null)
+ */
+const TASK_SCHEMAS = {
+  // API REST : noms des colonnes Prisma
+  rest: {
+    id: { field: 'id', type: 'string' },
+    userId: { field: 'userId', type: 'string' },
+    ownerId: { field: 'userId', type: 'string' },
+    categoryId: { field: 'categoryId', type: 'string' },
+    title: { field: 'title', type: 'string' },
+    description: { field: 'description', type: 'string' },
+    importance: { field: 'importance', type: 'string' },
+    status: { field: 'status', type: 'string' },
+    dueDate: { field: 'dueDate', type: 'date' },
+    dueTime: { field: 'dueTime', type: 'string' },
+    position: { field: 'position', type: 'number' },
+    completedAt: { field: 'completedAt', type: 'date' },
+    createdAt: { field: 'createdAt', type: 'date' },
+    updatedAt: { field: 'updatedAt', type: 'date' },
+    category: { field: 'category', type: 'category' }
+  },
+  // Outils MCP : noms et formats de tasks_list
+  mcp: {
+    id: { field: 'id', type: 'string' },
+    ownerId: { field: 'userId', type: 'string' },
+    title: { field: 'title', type: 'string' },
+    description: { field: 'description', type: 'string' },
+    status: { field: 'status', type: 'string' },
+    priority: { field: 'importance', type: 'string' },
+    dueDate: { field: 'dueDate', type: 'day', omitNull: true },
+    dueTime: { field: 'dueTime', type: 'string' },
+    categoryId: { field: 'categoryId', type: 'string' },
+    category: { field: 'category', type: 'category' },
+    completedAt: { field: 'completedAt', type: 'date', omitNull: true },
+    createdAt: { field: 'createdAt', type: 'date' },
+    updatedAt: { field: 'updatedAt', type: 'date' }
+  }
+};
+
+// Champs renvoyés sans ?fields (API REST : colonnes de la tâche et catégorie)
+const REST_DEFAULT_FIELDS = Object.keys(TASK_SCHEMAS.rest).filter(name => name !== 'ownerId');
+
+// Champs renvoyés par tasks_list sans ?fields
+const MCP_DEFAULT_FIELDS = ['id', 'title', 'description', 'status', 'priority', 'dueDate', 'dueTime', 'category', 'completedAt', 'createdAt'];
+
+const projectionError = (message) => Object.assign(new Error(message), { status: 400 });
+
+/**
+ * Liste de champs demandée (CSV ou tableau), validée ; id est toujours renvoyé.
+ * En mode compact, category est remplacé par categoryId.
+ */
+const parseFields = (schema, fields, defaultFields, compact) => {
+  let names = defaultFields;
+  if (fields !== undefined && fields !== null && fields !== '') {
+    names = (Array.isArray(fields) ? fields : String(fields).split(','))
+      .map(name => String(name).trim())
+      .filter(Boolean);
+  }
+
+  const unknown = names.filter(name => !Object.prototype.hasOwnProperty.call(schema, name));
+  if (unknown.length > 0) {
+    throw projectionError(`Champ(s) inconnu(s) : ${unknown.join(', ')}. Champs disponibles : ${Object.keys(schema).join(', ')}.`);
+  }
+
+  const result = ['id'];
+  for (const name of names) {
+    const resolved = compact && name === 'category' ? 'categoryId' : name;
+    if (!result.includes(resolved)) result.push(resolved);
+  }
+  return result;
+};
+
+/**
+ * Sérialiseur d'une tâche : les clés, leur ordre et l'écriture de chaque valeur sont fixés une fois
+ */
+const compileSerializer = (schema, fields) => {
+  const writers = fields.map(name => ({
+    // Préfixe de la première clé écrite, puis des suivantes
+    lead: `${JSON.stringify(name)}:`,
+    prefix: `,${JSON.stringify(name)}:`,
+    field: schema[name].field,
+    write: WRITERS[schema[name].type],
+    omitNull: schema[name].omitNull === true
+  }));
+  const count = writers.length;
+
+  return (task) => {
+    let out = '{';
+    let first = true;
+    for (let i = 0; i < count; i++) {
+      const writer = writers[i];
+      const value = task[writer.field];
+      if (value === null || value === undefined) {
+        if (writer.omitNull) continue;
+        out += (first ? writer.lead : writer.prefix) + 'null';
+      } else {
+        out += (first ? writer.lead : writer.prefix) + writer.write(value);
+      }
+      first = false;
+    }
+    return out + '}';
+  };
+};
+
+const getSerializer = (schemaName, fields) => {
+  const key = `${schemaName}|${fields.join(',')}`;
+  let serializer = serializers.get(key);
+  if (!serializer) {
+    serializer = compileSerializer(TASK_SCHEMAS[schemaName], fields);
+    serializers.set(key, serializer);
+  }
+  return serializer;
+};
+
+/**
+ * Table des catégories d'une page : { [id]: { name, color } }
+ */
+const serializeCategories = (tasks) => {
+  const seen = new Map();
+  for (const task of tasks) {
+    if (task.category && !seen.has(task.category.id)) {
+      seen.set(task.category.id, `${JSON.stringify(task.category.id)}:{"name":${JSON.stringify(task.category.name)},"color":${JSON.stringify(task.category.color)}}`);
+    }
+  }
+  return `{${[...seen.values()].join(',')}}`;
+};
+
+/**
+ * Prépare la projection d'une liste de tâches :
+ * - select(extraFields) : select Prisma (extraFields : colonnes lues mais non renvoyées, ex. clés de tri)
+ * - render(tasks, meta) : corps JSON { tasks, categories? (mode compact), ...meta }
+ */
+const createTaskProjection = ({ schema = 'rest', fields, compact = false, defaultFields } = {}) => {
+  const spec = TASK_SCHEMAS[schema];
+  const names = parseFields(spec, fields, defaultFields || (schema === 'mcp' ? MCP_DEFAULT_FIELDS : REST_DEFAULT_FIELDS), compact);
+  const withCategory = names.includes('category') || (compact && names.includes('categoryId'));
+  const serialize = getSerializer(schema, names);
+
+  const select = (extraFields = []) => {
+    const result = {};
+    for (const name of names) {
+      if (spec[name].type !== 'category') result[spec[name].field] = true;
+    }
+    for (const field of extraFields) result[field] = true;
+    if (withCategory) result.category = { select: CATEGORY_SELECT };
+    return result;
+  };
+
+  const render = (tasks, meta = {}) => {
+    let body = `{"tasks":[${tasks.map(serialize).join(',')}]`;
+    if (compact) body += `,"categories":${withCategory ? serializeCategories(tasks) : '{}'}`;
+    const rest = JSON.stringify(meta);
+    return rest === '{}' ? `${body}}` : `${body},${rest.slice(1)}`;
+  };
+
+  return { fields: names, compact, select, render };
+};
+
+/**
+ * ?compact=true|1
+ */
+const isCompact = (value) => value === true || value === 'true' || value === '1';
+
+module.exports = {
+  TASK_SCHEMAS,
+  REST_DEFAULT_FIELDS,
+  MCP_DEFAULT_FIELDS,
+  createTaskProjection,
+  isCompact
+};
@@ -0,0 +1,124 @@
+const { Prisma } = require('@prisma/client');
+const prisma = require('../config/database');
+
+// Nombre maximum de tâches retenues par une recherche (triées par pertinence)
+const SEARCH_MAX_RESULTS = parseInt(process.env.SEARCH_MAX_RESULTS || '1000', 10);
+
+// Passe à false si la migration add_task_search n'est pas appliquée
+let fullTextAvailable = true;
+
+/**
+ * Requête préfixe : "rapport trim" -> "rapport:* & trim:*"
+ */
+const toPrefixQuery = (search) => search
+  .split(/[^\p{L}\p{N}]+/u)
+  .filter(Boolean)
+  .map(word => `${word}:*`)
+  .join(' & ');
+
+const escapeLike = (value) => value.replace(/[\\%_]/g, char => `\\${char}`);
+
+/**
+ * Recherche classique ILIKE (repli si l'index plein texte est absent)
+ */
+const legacyFilter = (search) => ({
+  OR: [
+    { title: { contains: search, mode: 'insensitive' } },
+    { description: { contains: search, mode: 'insensitive' } }
+  ]
+});
+
+/**
+ * Filtres de la liste appliqués dans la requête classée, avant la limite SEARCH_MAX_RESULTS :
+ * { status, importance, categoryId (null = sans catégorie), hiddenCategoryIds }
+ */
+const filterConditions = ({ status, importance, categoryId, hiddenCategoryIds = [] }) => {
+  const conditions = [];
+
+  if (status) conditions.push(Prisma.sql`t."status" = ${status}`);
+  if (importance) conditions.push(Prisma.sql`t."importance" = ${importance}`);
+  if (categoryId === null) conditions.push(Prisma.sql`t."category_id" IS NULL`);
+  else if (categoryId !== undefined) conditions.push(Prisma.sql`t."category_id" = ${categoryId}`);
+
+  // Catégories cachées au délégué
+  if (hiddenCategoryIds.length > 0) {
+    conditions.push(Prisma.sql`(t."category_id" IS NULL OR NOT (t."category_id" = ANY(${[...hiddenCategoryIds]}::text[])))`);
+  }
+
+  return conditions.length > 0 ? Prisma.sql`AND ${Prisma.join(conditions, ' AND ')}` : Prisma.empty;
+};
+
+/**
+ * Ids des tâches d'un utilisateur correspondant à la recherche, par pertinence décroissante.
+ * Combine plein texte (français + anglais), préfixes et similarité trigramme sur le titre.
+ */
+const rankedTaskIds = async (userId, search, filters) => {
+  const prefixQuery = toPrefixQuery(search);
+  const likePattern = `%${escapeLike(search)}%`;
+
+  const rows = await prisma.$queryRaw`
+    WITH q AS (
+      SELECT
+        websearch_to_tsquery('french', ${search}) || websearch_to_tsquery('english', ${search}) AS fts,
+        CASE WHEN ${prefixQuery}::text = '' THEN NULL ELSE to_tsquery('simple', ${prefixQuery}::text) END AS prefix
+    )
+    SELECT t."id",
+           ts_rank(t."search_vector", q.fts) + similarity(t."title", ${search}) AS rank
+    FROM "tasks" t, q
+    WHERE t."user_id" = ${userId}
+      ${filterConditions(filters)}
+      AND (
+        t."search_vector" @@ q.fts
+        OR (q.prefix IS NOT NULL AND t."search_vector" @@ q.prefix)
+        OR t."title" ILIKE ${likePattern}
+        OR t."title" % ${search}
+      )
+    ORDER BY rank DESC, t."created_at" DESC
+    LIMIT ${SEARCH_MAX_RESULTS}
+  `;
+
+  return rows.map(row => row.id);
+};
+
+/**
+ * Construit le filtre Prisma d'une recherche texte sur les tâches d'un utilisateur.
+ * filters : filtres de la liste (voir filterConditions), appliqués avant la limite de résultats.
+ * Retourne { where, rankedIds } ; rankedIds est null en mode ILIKE de repli.
+ * Retourne null si la recherche est vide (espaces seulement) : pas de recherche.
+ */
+const searchTasks = async (userId, search, filters = {}) => {
+  const text = String(search || '').trim();
+  if (!text) return null;
+
+  if (fullTextAvailable) {
+    try {
+      const rankedIds = await rankedTaskIds(userId, text, filters);
+      return { where: { id: { in: rankedIds } }, rankedIds };
+    } catch (error) {
+      // 42703 : colonne search_vector absente, 42883 : pg_trgm non installé
+      const pgCode = error.meta?.code;
+      if (error instanceof Prisma.PrismaClientKnownRequestError && (pgCode === '42703' || pgCode === '42883')) {
+        console.warn('Recherche plein texte indisponible (migration add_task_search non appliquée), repli sur ILIKE.');
+        fullTextAvailable = false;
+      } else {
+        throw error;
+      }
+    }
+  }
+
+  return { where: legacyFilter(text), rankedIds: null };
+};
+
+/**
+ * Trie des tâches selon l'ordre de pertinence retourné par searchTasks
+ */
+const sortByRank = (tasks, rankedIds) => {
+  if (!rankedIds) return tasks;
+  const position = new Map(rankedIds.map((id, i) => [id, i]));
+  return [...tasks].sort((a, b) => position.get(a.id) - position.get(b.id));
+};
+
+module.exports = {
+  searchTasks,
+  sortByRank
+};
@@ -0,0 +1,102 @@
+const { Prisma } = require('@prisma/client');
+const prisma = require('../config/database');
+
+// Source des statistiques par utilisateur :
+// - query    : une seule requête groupée par statut sur l'index (user_id, status)
+// - counters : total/actif/terminé lus dans user_task_stats (maintenu par triggers),
+//              seules les tâches actives sont parcourues pour priorité haute et retard
+const TASK_STATS_SOURCE = process.env.TASK_STATS_SOURCE === 'counters' ? 'counters' : 'query';
+
+const completionRate = (total, completed) => (
+  total > 0 ? Math.round((completed / total) * 100 * 10) / 10 : 0
+);
+
+const withRate = (stats) => ({
+  ...stats,
+  completionRate: completionRate(stats.total, stats.completed)
+});
+
+/**
+ * Tous les compteurs en une passe : une ligne par statut
+ */
+const statsFromQuery = async (userId, now) => {
+  const rows = await prisma.$queryRaw`
+    SELECT "status",
+           count(*)::int AS "count",
+           count(*) FILTER (WHERE "importance" = 'high')::int AS "highPriority",
+           count(*) FILTER (WHERE "due_date" < ${now})::int AS "overdue"
+    FROM "tasks"
+    WHERE "user_id" = ${userId}
+    GROUP BY "status"
+  `;
+
+  const stats = { total: 0, active: 0, completed: 0, highPriority: 0, overdue: 0 };
+  for (const row of rows) {
+    stats.total += row.count;
+    if (row.status === 'active') {
+      stats.active = row.count;
+      stats.highPriority = row.highPriority;
+      stats.overdue = row.overdue;
+    } else if (row.status === 'completed') {
+      stats.completed = row.count;
+    }
+  }
+  return stats;
+};
+
+/**
+ * Compteurs maintenus par triggers + une passe sur les seules tâches actives.
+ * Retourne null si l'utilisateur n'a pas encore de ligne d'agrégats.
+ */
+const statsFromCounters = async (userId, now) => {
+  const [row] = await prisma.$queryRaw`
+    SELECT s."total", s."active", s."completed", a."highPriority", a."overdue"
+    FROM "user_task_stats" s
+    CROSS JOIN (
+      SELECT count(*) FILTER (WHERE t."importance" = 'high')::int AS "highPriority",
+             count(*) FILTER (WHERE t."due_date" < ${now})::int AS "overdue"
+      FROM "tasks" t
+      WHERE t."user_id" = ${userId} AND t."status" = 'active'
+    ) a
+    WHERE s."user_id" = ${userId}
+  `;
+  return row || null;
+};
+
+/**
+ * Statistiques de tâches d'un utilisateur (API REST et outil MCP tasks_stats)
+ */
+const getUserTaskStats = async (userId) => {
+  const now = new Date();
+
+  if (TASK_STATS_SOURCE === 'counters') {
+    try {
+      const stats = await statsFromCounters(userId, now);
+      if (stats) return withRate(stats);
+    } catch (error) {
+      // 42P01 : table user_task_stats absente (migration non appliquée)
+      if (!(error instanceof Prisma.PrismaClientKnownRequestError && error.meta?.code === '42P01')) {
+        throw error;
+      }
+    }
+  }
+
+  return withRate(await statsFromQuery(userId, now));
+};
+
+/**
+ * Format de réponse historique de GET /tasks/stats
+ */
+const formatStats = (stats) => ({
+  total_tasks: stats.total,
+  active_tasks: stats.active,
+  completed_tasks: stats.completed,
+  high_priority_tasks: stats.highPriority,
+  overdue_tasks: stats.overdue,
+  completion_rate: stats.completionRate
+});
+
+module.exports = {
+  getUserTaskStats,
+  formatStats
+};
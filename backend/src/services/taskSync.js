@@ -0,0 +1,215 @@
+const crypto = require('crypto');
+const prisma = require('../config/database');
+
+// Durée de conservation des tâches supprimées : un jeton plus ancien impose une resynchronisation complète
+const TASK_TOMBSTONE_RETENTION_DAYS = parseInt(process.env.TASK_TOMBSTONE_RETENTION_DAYS || '30', 10);
+const TOMBSTONE_PURGE_INTERVAL_MS = 24 * 60 * 60 * 1000;
+
+// Taille des pages de synchronisation
+const TASK_SYNC_DEFAULT_LIMIT = 500;
+const TASK_SYNC_MAX_LIMIT = 1000;
+
+let purgeTimer = null;
+
+const syncError = (message, status) => Object.assign(new Error(message), { status });
+
+/**
+ * Empreinte des catégories cachées au délégué ('' si aucune) : un jeton émis pour un autre
+ * ensemble de catégories cachées n'est plus valable (les tâches concernées n'ont pas changé de version)
+ */
+const hiddenCategoriesHash = (hiddenCategoryIds) => {
+  const ids = [...hiddenCategoryIds].sort();
+  if (ids.length === 0) return '';
+  return crypto.createHash('sha1').update(ids.join(',')).digest('base64url');
+};
+
+/**
+ * Jeton de synchronisation opaque :
+ * - s : version de départ (les écritures de transactions >= s sont renvoyées)
+ * - w : version de reprise de la passe en cours (pages suivantes seulement)
+ * - a : dernière position [version, id] renvoyée (pages suivantes seulement)
+ * - t : date à laquelle la version s a été lue (ms)
+ * - wt : date à laquelle la version w a été lue (pages suivantes seulement)
+ * - h : empreinte des catégories cachées au délégué (absente si aucune)
+ */
+const encodeSyncToken = (payload) => Buffer.from(JSON.stringify(payload)).toString('base64url');
+
+const decodeSyncToken = (since, hiddenHash) => {
+  // since=0 : synchronisation complète
+  if (String(since) === '0') return { s: '0', t: Date.now() };
+
+  let payload;
+  try {
+    payload = JSON.parse(Buffer.from(String(since), 'base64url').toString('utf8'));
+  } catch (e) {
+    throw syncError('Jeton de synchronisation invalide.', 400);
+  }
+
+  const isVersion = (value) => typeof value === 'string' && /^\d+$/.test(value);
+  if (!payload || !isVersion(payload.s) || !Number.isFinite(payload.t) ||
+      (payload.w !== undefined && (!isVersion(payload.w) || !Number.isFinite(payload.wt))) ||
+      (payload.a !== undefined && !(Array.isArray(payload.a) && isVersion(payload.a[0]) && typeof payload.a[1] === 'string')) ||
+      (payload.h !== undefined && typeof payload.h !== 'string')) {
+    throw syncError('Jeton de synchronisation invalide.', 400);
+  }
+
+  if (Date.now() - payload.t > TASK_TOMBSTONE_RETENTION_DAYS * 24 * 60 * 60 * 1000) {
+    throw syncError('Jeton de synchronisation expiré : resynchronisation complète nécessaire (since=0).', 410);
+  }
+
+  // Catégories cachées modifiées depuis l'émission du jeton : tâches à retirer ou à ajouter côté client
+  if ((payload.h || '') !== hiddenHash) {
+    throw syncError('Catégories accessibles modifiées : resynchronisation complète nécessaire (since=0).', 410);
+  }
+
+  return payload;
+};
+
+/**
+ * Tâches modifiées et supprimées depuis un jeton (since=0 pour tout récupérer).
+ * Les tâches sont renvoyées sans catégorie incluse ; celles d'une catégorie cachée au délégué
+ * sont renvoyées comme supprimées. Tant que hasMore est vrai, rappeler avec nextSince ;
+ * le dernier nextSince est le jeton à conserver pour la prochaine synchronisation.
+ */
+const getTaskChanges = async ({ ownerId, since, limit, hiddenCategoryIds = new Set() }) => {
+  const hiddenHash = hiddenCategoriesHash(hiddenCategoryIds);
+  const token = decodeSyncToken(since, hiddenHash);
+  const take = Math.min(Math.max(parseInt(limit, 10) || TASK_SYNC_DEFAULT_LIMIT, 1), TASK_SYNC_MAX_LIMIT);
+  const firstPage = token.w === undefined;
+
+  // Point de reprise lu AVANT les données : toute transaction non visible ici aura une version >= watermark
+  let watermark = token.w;
+  let watermarkAt = token.wt;
+  if (firstPage) {
+    watermarkAt = Date.now();
+    const [row] = await prisma.$queryRaw`SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS "xmin"`;
+    watermark = row.xmin;
+  }
+
+  const after = token.a || null;
+  const [changed, tombstones] = await Promise.all([
+    prisma.$queryRaw`
+      SELECT t."id", t."sync_version"::text AS "version"
+      FROM "tasks" t
+      WHERE t."user_id" = ${ownerId}
+        AND t."sync_version" >= ${token.s}::bigint
+        AND (${after ? after[0] : null}::bigint IS NULL
+             OR (t."sync_version", t."id") > (${after ? after[0] : null}::bigint, ${after ? after[1] : null}::text))
+      ORDER BY t."sync_version", t."id"
+      LIMIT ${take + 1}
+    `,
+    // Suppressions : première page uniquement, inutiles pour une synchronisation complète
+    firstPage && token.s !== '0'
+      ? prisma.$queryRaw`
+          SELECT d."task_id" AS "id"
+          FROM "task_tombstones" d
+          WHERE d."user_id" = ${ownerId}
+            AND d."sync_version" >= ${token.s}::bigint
+            AND NOT EXISTS (SELECT 1 FROM "tasks" t WHERE t."id" = d."task_id")
+        `
+      : []
+  ]);
+
+  const hasMore = changed.length > take;
+  const page = changed.slice(0, take);
+
+  const rows = page.length > 0
+    ? await prisma.task.findMany({ where: { id: { in: page.map(r => r.id) } } })
+    : [];
+  const rowsById = new Map(rows.map(t => [t.id, t]));
+
+  const tasks = [];
+  const deleted = tombstones.map(r => r.id);
+  for (const { id } of page) {
+    const task = rowsById.get(id);
+    // Supprimée entre les deux requêtes : la suppression arrivera à la prochaine synchronisation
+    if (!task) continue;
+    if (task.categoryId && hiddenCategoryIds.has(task.categoryId)) {
+      // Tâche passée dans une catégorie cachée : à retirer côté client
+      if (token.s !== '0') deleted.push(task.id);
+    } else {
+      tasks.push(task);
+    }
+  }
+
+  const last = page[page.length - 1];
+  const nextSince = hasMore
+    ? encodeSyncToken({ s: token.s, t: token.t, w: watermark, wt: watermarkAt, a: [last.version, last.id], ...(hiddenHash && { h: hiddenHash }) })
+    : encodeSyncToken({ s: watermark, t: watermarkAt, ...(hiddenHash && { h: hiddenHash }) });
+
+  return { tasks, deleted, nextSince, hasMore };
+};
+
+/**
+ * Version des données d'un owner (tâches, suppressions, catégories) pour les ETag.
+ * Toute écriture change le nombre de lignes, la somme des versions des tâches,
+ * la dernière suppression ou la dernière modification de catégorie.
+ */
+const getOwnerDataVersion = async (ownerId) => {
+  const [row] = await prisma.$queryRaw`
+    SELECT concat_ws(':',
+      (SELECT count(*) || '.' || coalesce(sum("sync_version"), 0) FROM "tasks" WHERE "user_id" = ${ownerId}),
+      (SELECT coalesce(max("sync_version"), 0) FROM "task_tombstones" WHERE "user_id" = ${ownerId}),
+      (SELECT count(*) || '.' || coalesce(max("updated_at")::text, '') FROM "categories" WHERE "user_id" = ${ownerId})
+    ) AS "version"
+  `;
+  return row.version;
+};
+
+/**
+ * GET conditionnel : pose un ETag calculé depuis la version des données de l'owner,
+ * l'URL et les catégories cachées, et répond 304 si If-None-Match correspond.
+ * Retourne true si la réponse a été envoyée.
+ */
+const sendIfNotModified = async (req, res, { ownerId, hiddenCategoryIds = [] }) => {
+  const version = await getOwnerDataVersion(ownerId);
+  const hash = crypto.createHash('sha1')
+    .update(`${version}|${req.originalUrl}|${[...hiddenCategoryIds].sort().join(',')}`)
+    .digest('base64url');
+
+  res.set('ETag', `W/"${hash}"`);
+  res.set('Cache-Control', 'private, no-cache');
+
+  if (req.fresh) {
+    res.status(304).end();
+    return true;
+  }
+  return false;
+};
+
+/**
+ * Supprime les traces de suppression plus anciennes que la durée de conservation
+ */
+const purgeTombstones = async () => {
+  const { count } = await prisma.taskTombstone.deleteMany({
+    where: {
+      deletedAt: { lt: new Date(Date.now() - TASK_TOMBSTONE_RETENTION_DAYS * 24 * 60 * 60 * 1000) }
+    }
+  });
+  return count;
+};
+
+const startTombstonePurge = () => {
+  if (purgeTimer) return;
+
+  purgeTimer = setInterval(() => {
+    purgeTombstones().catch(err => console.error('Erreur purge des suppressions:', err));
+  }, TOMBSTONE_PURGE_INTERVAL_MS);
+  purgeTimer.unref();
+};
+
+const stopTombstonePurge = () => {
+  if (purgeTimer) {
+    clearInterval(purgeTimer);
+    purgeTimer = null;
+  }
+};
+
+module.exports = {
+  getTaskChanges,
+  getOwnerDataVersion,
+  sendIfNotModified,
+  purgeTombstones,
+  startTombstonePurge,
+  stopTombstonePurge
+};
@@ -0,0 +1,95 @@
+const { Prisma } = require('@prisma/client');
+const prisma = require('../config/database');
+
+// Fenêtre de fraîcheur : les usages sont regroupés puis écrits au plus tard après ce délai
+const TOKEN_USAGE_FLUSH_MS = parseInt(process.env.TOKEN_USAGE_FLUSH_MS || '10000', 10);
+
+// Dernier usage connu par token, en attente d'écriture : tokenId -> { lastUsedAt, lastUsedIp }
+const pending = new Map();
+
+let flushTimer = null;
+let flushing = null;
+
+/**
+ * Enregistre l'utilisation d'un token PAT (non bloquant).
+ * Les appels successifs sur un même token sont fusionnés en mémoire.
+ */
+const recordTokenUsage = (tokenId, ip) => {
+  const previous = pending.get(tokenId);
+
+  pending.set(tokenId, {
+    lastUsedAt: new Date(),
+    lastUsedIp: ip || previous?.lastUsedIp || null
+  });
+
+  if (TOKEN_USAGE_FLUSH_MS <= 0) {
+    flushTokenUsage();
+    return;
+  }
+
+  if (!flushTimer) {
+    flushTimer = setInterval(flushTokenUsage, TOKEN_USAGE_FLUSH_MS);
+    flushTimer.unref();
+  }
+};
+
+/**
+ * Écrit tous les usages en attente en un seul UPDATE ... FROM (VALUES ...)
+ */
+const flushTokenUsage = async () => {
+  if (flushing) return flushing;
+  if (pending.size === 0) return;
+
+  const batch = new Map(pending);
+  pending.clear();
+
+  const rows = [...batch].map(([tokenId, usage]) => Prisma.sql`(
+    ${tokenId}::text,
+    ${usage.lastUsedAt.toISOString()}::timestamp(3),
+    ${usage.lastUsedIp}::text
+  )`);
+
+  flushing = prisma.$executeRaw`
+    UPDATE "api_tokens" AS t
+    SET "last_used_at" = v.last_used_at,
+        "last_used_ip" = COALESCE(v.last_used_ip, t."last_used_ip")
+    FROM (VALUES ${Prisma.join(rows)}) AS v(id, last_used_at, last_used_ip)
+    WHERE t."id" = v.id
+  `
+    .catch(err => {
+      console.error('Erreur écriture groupée lastUsedAt:', err);
+      // Remettre en file les usages qui n'ont pas été remplacés entre-temps
+      for (const [tokenId, usage] of batch) {
+        if (!pending.has(tokenId)) pending.set(tokenId, usage);
+      }
+    })
+    .finally(() => {
+      flushing = null;
+    });
+
+  return flushing;
+};
+
+/**
+ * Usage en attente pour un token (affichage quasi temps réel dans la liste des tokens)
+ */
+const getPendingTokenUsage = (tokenId) => pending.get(tokenId) || null;
+
+/**
+ * Arrête le timer et écrit les derniers usages (arrêt du serveur)
+ */
+const stopTokenUsageWriter = async () => {
+  if (flushTimer) {
+    clearInterval(flushTimer);
+    flushTimer = null;
+  }
+  if (flushing) await flushing;
+  await flushTokenUsage();
+};
+
+module.exports = {
+  recordTokenUsage,
+  flushTokenUsage,
+  getPendingTokenUsage,
+  stopTokenUsageWriter
+};
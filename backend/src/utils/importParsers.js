@@ -0,0 +1,317 @@
+/**
+ * Parseurs incrémentaux pour l'import de tâches (XML et JSON).
+ * Chaque parseur reçoit le fichier par morceaux via write(chunk) et retourne
+ * les tâches complètes au fur et à mesure : la mémoire utilisée dépend de la
+ * taille d'une tâche, pas de celle du fichier.
+ */
+
+const XML_ENTITIES = {
+  amp: '&',
+  lt: '<',
+  gt: '>',
+  quot: '"',
+  apos: "'"
+};
+
+const unescapeXml = (str) => {
+  if (!str) return str;
+  return str.replace(/&(#x[0-9a-fA-F]+|#[0-9]+|[a-z]+);/g, (match, entity) => {
+    if (entity[0] === '#') {
+      const code = entity[1] === 'x' ? parseInt(entity.slice(2), 16) : parseInt(entity.slice(1), 10);
+      return Number.isNaN(code) ? match : String.fromCodePoint(code);
+    }
+    return XML_ENTITIES[entity] ?? match;
+  });
+};
+
+const parseError = (message) => {
+  const error = new Error(message);
+  error.status = 400;
+  return error;
+};
+
+/**
+ * Tokenizer XML de type SAX limité au format d'export :
+ * <tasks><task><title>...</title>...<category><name/><color/></category></task></tasks>
+ */
+class XmlTaskParser {
+  constructor() {
+    this.buffer = '';
+    this.stack = [];
+    this.text = '';
+    this.current = null;
+    this.category = null;
+  }
+
+  write(chunk) {
+    this.buffer += chunk;
+    const tasks = [];
+
+    while (this.buffer.length > 0) {
+      const lt = this.buffer.indexOf('<');
+
+      if (lt === -1) {
+        this.onText(this.buffer);
+        this.buffer = '';
+        break;
+      }
+
+      if (lt > 0) {
+        this.onText(this.buffer.slice(0, lt));
+        this.buffer = this.buffer.slice(lt);
+      }
+
+      // Commentaires, CDATA et déclarations ont leur propre terminateur
+      let end;
+      let consumed;
+      if (this.buffer.startsWith('<!--')) {
+        end = this.buffer.indexOf('-->');
+        if (end === -1) break;
+        consumed = end + 3;
+      } else if (this.buffer.startsWith('<![CDATA[')) {
+        end = this.buffer.indexOf(']]>');
+        if (end === -1) break;
+        this.text += this.buffer.slice(9, end);
+        consumed = end + 3;
+      } else {
+        if (this.buffer.length < 9 && '<![CDATA['.startsWith(this.buffer)) break;
+        end = this.buffer.indexOf('>');
+        if (end === -1) break;
+        const task = this.onTag(this.buffer.slice(1, end));
+        if (task) tasks.push(task);
+        consumed = end + 1;
+      }
+
+      this.buffer = this.buffer.slice(consumed);
+    }
+
+    return tasks;
+  }
+
+  end() {
+    if (this.buffer.trim() || this.current) {
+      throw parseError('Fichier XML incomplet.');
+    }
+    return [];
+  }
+
+  onText(text) {
+    if (this.current) this.text += text;
+  }
+
+  onTag(raw) {
+    if (raw.startsWith('?') || raw.startsWith('!')) return null;
+
+    const selfClosing = raw.endsWith('/');
+    const closing = raw.startsWith('/');
+    const name = raw.replace(/^\//, '').replace(/\/$/, '').trim().split(/\s+/)[0];
+
+    if (closing) return this.onClose(name);
+
+    this.onOpen(name);
+    if (selfClosing) return this.onClose(name);
+    return null;
+  }
+
+  onOpen(name) {
+    this.stack.push(name);
+    this.text = '';
+
+    if (name === 'task' && !this.current) {
+      this.current = {};
+    } else if (name === 'category' && this.current) {
+      this.category = {};
+    }
+  }
+
+  onClose(name) {
+    if (this.stack[this.stack.length - 1] !== name) {
+      throw parseError(`Balise XML inattendue: </${name}>.`);
+    }
+    this.stack.pop();
+
+    const value = unescapeXml(this.text.trim());
+    this.text = '';
+
+    if (!this.current) return null;
+
+    if (name === 'task') {
+      const task = this.current;
+      this.current = null;
+      return {
+        id: task.id || null,
+        title: task.title || null,
+        description: task.description || null,
+        status: task.status || 'active',
+        importance: task.importance || 'normal',
+        category: task.category || null,
+        dueDate: task.dueDate || null,
+        dueTime: task.dueTime || null,
+        completedAt: task.completedAt || null,
+        createdAt: task.createdAt || null,
+        updatedAt: task.updatedAt || null
+      };
+    }
+
+    if (name === 'category') {
+      if (this.category && this.category.name) {
+        this.current.category = {
+          name: this.category.name,
+          color: this.category.color || '#6366f1'
+        };
+      }
+      this.category = null;
+      return null;
+    }
+
+    if (this.category) {
+      this.category[name] = value;
+    } else if (this.stack[this.stack.length - 1] === 'task') {
+      this.current[name] = value;
+    }
+
+    return null;
+  }
+}
+
+/**
+ * Parseur JSON incrémental : extrait un à un les éléments du tableau de tâches,
+ * soit le tableau racine, soit la propriété "tasks" de l'objet racine
+ * (format de GET /tasks/export). Chaque élément est parsé seul avec JSON.parse.
+ */
+class JsonTaskParser {
+  constructor() {
+    this.depth = 0;
+    this.inString = false;
+    this.escaped = false;
+    this.rootType = null;
+    this.targetDepth = null;
+    this.lastKey = null;
+    this.keyBuffer = null;
+    this.element = null;
+    this.started = false;
+  }
+
+  write(chunk) {
+    const tasks = [];
+    let captureFrom = this.element !== null ? 0 : -1;
+
+    for (let i = 0; i < chunk.length; i++) {
+      const char = chunk[i];
+
+      if (this.inString) {
+        if (this.keyBuffer !== null && !this.escaped && char !== '"') this.keyBuffer += char;
+        if (this.escaped) {
+          this.escaped = false;
+        } else if (char === '\\') {
+          this.escaped = true;
+        } else if (char === '"') {
+          this.inString = false;
+          if (this.keyBuffer !== null) {
+            this.lastKey = this.keyBuffer;
+            this.keyBuffer = null;
+          }
+        }
+        continue;
+      }
+
+      if (char === '"') {
+        this.inString = true;
+        // Mémoriser les clés de premier niveau pour repérer "tasks"
+        if (this.rootType === 'object' && this.depth === 1 && this.element === null) {
+          this.keyBuffer = '';
+        }
+        continue;
+      }
+
+      if (char === '{' || char === '[') {
+        if (!this.started) {
+          this.started = true;
+          this.rootType = char === '[' ? 'array' : 'object';
+          if (this.rootType === 'array') this.targetDepth = 1;
+        } else if (this.targetDepth === null && this.depth === 1 && char === '[' && this.lastKey === 'tasks') {
+          this.targetDepth = 2;
+        } else if (this.depth === this.targetDepth && this.element === null) {
+          this.element = '';
+          captureFrom = i;
+        }
+        this.depth++;
+        continue;
+      }
+
+      if (char === '}' || char === ']') {
+        this.depth--;
+        if (this.depth < 0) throw parseError('Format JSON invalide.');
+
+        if (this.element !== null && this.depth === this.targetDepth) {
+          const raw = this.element + chunk.slice(captureFrom, i + 1);
+          this.element = null;
+          captureFrom = -1;
+          try {
+            tasks.push(JSON.parse(raw));
+          } catch (e) {
+            throw parseError('Format JSON invalide.');
+          }
+        } else if (this.depth === this.targetDepth - 1 && char === ']') {
+          // Fin du tableau de tâches
+          this.targetDepth = -1;
+        }
+      }
+    }
+
+    if (this.element !== null && captureFrom !== -1) {
+      this.element += chunk.slice(captureFrom);
+    }
+
+    return tasks;
+  }
+
+  end() {
+    if (!this.started || this.depth !== 0 || this.inString) {
+      throw parseError('Format JSON invalide.');
+    }
+    return [];
+  }
+}
+
+const createTaskParser = (format) => (format === 'xml' ? new XmlTaskParser() : new JsonTaskParser());
+
+/**
+ * Lit un flux (requête HTTP brute) et produit les tâches par lots bornés.
+ * La lecture du flux est suspendue pendant le traitement de chaque lot.
+ */
+async function* readTaskBatches(stream, format, batchSize) {
+  const parser = createTaskParser(format);
+  let pending = [];
+
+  if (typeof stream.setEncoding === 'function') stream.setEncoding('utf8');
+
+  for await (const chunk of stream) {
+    pending.push(...parser.write(chunk));
+    while (pending.length >= batchSize) {
+      yield pending.slice(0, batchSize);
+      pending = pending.slice(batchSize);
+    }
+  }
+
+  pending.push(...parser.end());
+  if (pending.length > 0) yield pending;
+}
+
+/**
+ * Parse un contenu complet (import classique avec le fichier dans le body JSON)
+ */
+const parseTasks = (content, format) => {
+  const parser = createTaskParser(format);
+  const tasks = parser.write(content);
+  parser.end();
+  return tasks;
+};
+
+module.exports = {
+  XmlTaskParser,
+  JsonTaskParser,
+  readTaskBatches,
+  parseTasks,
+  unescapeXml
+};
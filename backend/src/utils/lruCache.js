@@ -0,0 +1,74 @@
+/**
+ * Cache LRU borné avec expiration (TTL) par entrée.
+ * S'appuie sur l'ordre d'insertion des Map : la première clé est la moins
+ * récemment utilisée.
+ */
+class LruCache {
+  constructor({ max = 1000, ttlMs = 30000 } = {}) {
+    this.max = max;
+    this.ttlMs = ttlMs;
+    this.entries = new Map();
+    this.hits = 0;
+    this.misses = 0;
+    this.evictions = 0;
+  }
+
+  get(key) {
+    const entry = this.entries.get(key);
+
+    if (!entry) {
+      this.misses++;
+      return undefined;
+    }
+
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(key);
+      this.misses++;
+      return undefined;
+    }
+
+    // Remettre l'entrée en fin de Map (la plus récemment utilisée)
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.hits++;
+    return entry.value;
+  }
+
+  set(key, value, ttlMs = this.ttlMs) {
+    this.entries.delete(key);
+    this.entries.set(key, { value, expiresAt: Date.now() + ttlMs });
+
+    while (this.entries.size > this.max) {
+      const oldestKey = this.entries.keys().next().value;
+      this.entries.delete(oldestKey);
+      this.evictions++;
+    }
+  }
+
+  delete(key) {
+    return this.entries.delete(key);
+  }
+
+  clear() {
+    this.entries.clear();
+  }
+
+  get size() {
+    return this.entries.size;
+  }
+
+  stats() {
+    const lookups = this.hits + this.misses;
+    return {
+      size: this.entries.size,
+      max: this.max,
+      ttlMs: this.ttlMs,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+      hitRate: lookups > 0 ? Math.round((this.hits / lookups) * 1000) / 10 : 0
+    };
+  }
+}
+
+module.exports = LruCache;
@@ -0,0 +1,153 @@
+/**
+ * Pagination par curseur (keyset) sur une liste de clés de tri.
+ *
+ * Une clé : { field, direction: 'asc' | 'desc', type?: 'date', nullable?: boolean }
+ * La dernière clé doit être unique (ex: id) pour garantir un ordre total.
+ * Les valeurs nulles sont toujours triées en dernier.
+ */
+
+// Taille des pages des listes : défaut et maximum (?limit=)
+const PAGE_DEFAULT_LIMIT = 50;
+const PAGE_MAX_LIMIT = 200;
+
+const invalidCursor = () => {
+  const error = new Error('Curseur de pagination invalide.');
+  error.status = 400;
+  return error;
+};
+
+const signature = (keys) => keys.map(k => `${k.field}:${k.direction}`).join(',');
+
+/**
+ * Encode la position de la dernière ligne d'une page en curseur opaque
+ */
+const encodeCursor = (keys, row) => {
+  const values = keys.map(k => {
+    const value = row[k.field];
+    if (value === null || value === undefined) return null;
+    return value instanceof Date ? value.toISOString() : value;
+  });
+
+  return Buffer.from(JSON.stringify({ k: signature(keys), v: values })).toString('base64url');
+};
+
+/**
+ * Décode un curseur ; lève une erreur 400 s'il ne correspond pas au tri demandé
+ */
+const decodeCursor = (keys, cursor) => {
+  let payload;
+  try {
+    payload = JSON.parse(Buffer.from(String(cursor), 'base64url').toString('utf8'));
+  } catch (e) {
+    throw invalidCursor();
+  }
+
+  if (!payload || payload.k !== signature(keys) || !Array.isArray(payload.v) || payload.v.length !== keys.length) {
+    throw invalidCursor();
+  }
+
+  return payload.v.map((value, i) => {
+    if (value === null) {
+      if (!keys[i].nullable) throw invalidCursor();
+      return null;
+    }
+    if (keys[i].type === 'date') {
+      const date = new Date(value);
+      if (Number.isNaN(date.getTime())) throw invalidCursor();
+      return date;
+    }
+    return value;
+  });
+};
+
+/**
+ * orderBy Prisma correspondant aux clés
+ */
+const buildOrderBy = (keys) => keys.map(k => ({
+  [k.field]: k.nullable ? { sort: k.direction, nulls: 'last' } : k.direction
+}));
+
+/**
+ * Condition "strictement après la position du curseur" (ordre lexicographique)
+ */
+const buildKeysetWhere = (keys, values) => {
+  const branches = [];
+
+  for (let i = 0; i < keys.length; i++) {
+    const key = keys[i];
+    const value = values[i];
+
+    // Les nulls sont en dernier : rien ne suit un null sur cette clé
+    if (value === null) continue;
+
+    const op = key.direction === 'asc' ? 'gt' : 'lt';
+    const after = key.nullable
+      ? { OR: [{ [key.field]: { [op]: value } }, { [key.field]: null }] }
+      : { [key.field]: { [op]: value } };
+
+    const equals = keys.slice(0, i).map((k, j) => ({ [k.field]: values[j] }));
+    branches.push(equals.length > 0 ? { AND: [...equals, after] } : after);
+  }
+
+  return branches.length > 0 ? { OR: branches } : { id: { in: [] } };
+};
+
+/**
+ * Prépare une requête paginée par curseur.
+ * Retourne { where, orderBy, take } à combiner avec les filtres de l'appelant,
+ * et page(rows) qui découpe le résultat et calcule nextCursor.
+ */
+const keysetPaginate = ({ keys, cursor, limit }) => {
+  const values = cursor ? decodeCursor(keys, cursor) : null;
+
+  return {
+    where: values ? buildKeysetWhere(keys, values) : null,
+    orderBy: buildOrderBy(keys),
+    // Une ligne de plus pour savoir s'il existe une page suivante
+    take: limit + 1,
+    page: (rows) => {
+      const hasMore = rows.length > limit;
+      const items = hasMore ? rows.slice(0, limit) : rows;
+      return {
+        items,
+        nextCursor: hasMore ? encodeCursor(keys, items[items.length - 1]) : null
+      };
+    }
+  };
+};
+
+/**
+ * ?limit= borné à [1, max] ; défaut si absent ou invalide
+ */
+const clampLimit = (limit, { defaultLimit = PAGE_DEFAULT_LIMIT, max = PAGE_MAX_LIMIT } = {}) => (
+  Math.min(Math.max(parseInt(limit, 10) || defaultLimit, 1), max)
+);
+
+/**
+ * Métadonnées d'une page en mode curseur, identiques pour toutes les listes :
+ * { nextCursor, limit, total? } au même niveau que les éléments
+ */
+const cursorPageMeta = ({ nextCursor, limit, total = null }) => ({
+  nextCursor,
+  limit,
+  ...(total !== null && { total })
+});
+
+/**
+ * Ajoute une condition à un where Prisma existant sans écraser OR/AND
+ */
+const andWhere = (where, condition) => {
+  if (!condition) return where;
+  return { AND: [where, condition] };
+};
+
+module.exports = {
+  PAGE_DEFAULT_LIMIT,
+  PAGE_MAX_LIMIT,
+  clampLimit,
+  cursorPageMeta,
+  keysetPaginate,
+  andWhere,
+  encodeCursor,
+  decodeCursor
+};
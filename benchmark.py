@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Banc de charge de l'API Task Manager.
+
+Rejoue en parallèle les scénarios des scripts test_*.py (délégation, journal
+d'activité, contexte par défaut, tâches) contre une stack locale
+(docker-compose up), puis affiche la latence p50/p95/p99 et le débit par
+endpoint et enregistre les résultats en JSON pour comparer deux exécutions.
+
+Prérequis : pip install aiohttp
+Le rate limiting global (100 requêtes / 15 min par IP) doit être relevé pour
+le backend testé, par exemple RATE_LIMIT_MAX=1000000 dans le .env.
+
+Exemples :
+    python3 benchmark.py --users 50 --concurrency 32 --duration 60
+    python3 benchmark.py --scenarios delegation,tasks --compare benchmark-results/avant.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import aiohttp
+
+PASSWORD = "Test1234"
+
+
+def percentile(sorted_values, pct):
+    """Percentile au rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Latences et statuts par endpoint"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def add(self, name, elapsed_ms, status):
+        self.latencies.setdefault(name, []).append(elapsed_ms)
+        by_status = self.statuses.setdefault(name, {})
+        by_status[str(status)] = by_status.get(str(status), 0) + 1
+        if status == "error" or status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, duration_s):
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput": round(len(values) / duration_s, 2) if duration_s else None,
+                "mean_ms": round(sum(values) / len(values), 2),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "max_ms": round(values[-1], 2),
+                "statuses": self.statuses[name],
+            }
+        return endpoints
+
+
+class Client:
+    """Session HTTP partagée (pool de connexions keep-alive) et mesure de chaque appel"""
+
+    def __init__(self, base_url, session, recorder):
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+        self.recorder = recorder
+
+    async def call(self, name, method, path, token=None, expected=(200, 201), **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs) as r:
+                body = await r.read()
+                status = r.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.recorder.add(name, (time.perf_counter() - start) * 1000, "error")
+            return None
+        self.recorder.add(name, (time.perf_counter() - start) * 1000, status)
+
+        if status not in expected:
+            return None
+        return json.loads(body) if body else {}
+
+
+async def gather_limited(concurrency, coros):
+    """asyncio.gather avec au plus `concurrency` coroutines en cours"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+# === Données de départ ===
+
+async def register_user(client, prefix, index):
+    username = f"{prefix}_u{index}"
+    data = await client.call("POST /auth/register", "POST", "/auth/register", json={
+        "username": username,
+        "email": f"{username}@bench.test",
+        "password": PASSWORD,
+        "firstName": "Bench",
+        "lastName": f"User {index}",
+    })
+    if not data or not data.get("token"):
+        raise RuntimeError(f"Création de l'utilisateur {username} impossible (rate limiting ?)")
+    return {"username": username, "id": data["user"]["id"], "token": data["token"], "tasks": [], "owners": []}
+
+
+async def seed_tasks(client, user, count):
+    category = await client.call("POST /categories", "POST", "/categories", user["token"], json={
+        "name": "Bench",
+        "color": "#3B82F6",
+    })
+    user["categoryId"] = (category or {}).get("category", {}).get("id")
+
+    # Par lots : une requête POST /tasks/batch pour 100 tâches
+    for offset in range(0, count, 100):
+        operations = [
+            {"op": "create", "title": f"Tâche {i}", "description": "Créée par benchmark.py",
+             "importance": random.choice(["low", "normal", "high"]), "categoryId": user["categoryId"]}
+            for i in range(offset, min(offset + 100, count))
+        ]
+        data = await client.call("POST /tasks/batch", "POST", "/tasks/batch", user["token"], json={"operations": operations})
+        if data:
+            user["tasks"].extend(r["taskId"] for r in data["results"] if r["status"] == "created")
+
+
+async def seed_delegation(client, owner, delegate):
+    data = await client.call("POST /delegations", "POST", "/delegations", owner["token"], json={
+        "delegateId": delegate["id"],
+        "canCreateTasks": True,
+        "canEditTasks": True,
+        "canDeleteTasks": True,
+        "canCreateCategories": True,
+    })
+    if not data:
+        return
+    delegation_id = data["delegation"]["id"]
+    if await client.call("POST /delegations/:id/accept", "POST", f"/delegations/{delegation_id}/accept", delegate["token"]) is not None:
+        delegate["owners"].append(owner)
+
+
+async def seed(client, args, prefix):
+    """N utilisateurs, leurs tâches, et des délégations en anneau (i délègue à i+1..i+k)"""
+    users = await gather_limited(args.concurrency, [register_user(client, prefix, i) for i in range(args.users)])
+    await gather_limited(args.concurrency, [seed_tasks(client, u, args.tasks_per_user) for u in users])
+
+    k = min(args.delegations_per_user, len(users) - 1)
+    pairs = [(users[i], users[(i + j) % len(users)]) for i in range(len(users)) for j in range(1, k + 1)]
+    await gather_limited(args.concurrency, [seed_delegation(client, o, d) for o, d in pairs])
+    return users
+
+
+# === Scénarios (une itération par appel) ===
+
+async def scenario_tasks(client, user):
+    """Le propriétaire liste, crée, complète puis supprime une tâche"""
+    token = user["token"]
+    await client.call("GET /tasks", "GET", "/tasks?limit=50", token)
+    await client.call("GET /tasks/stats", "GET", "/tasks/stats", token)
+    data = await client.call("POST /tasks", "POST", "/tasks", token, json={"title": "Tâche bench", "categoryId": user.get("categoryId")})
+    if not data:
+        return
+    task_id = data["task"]["id"]
+    await client.call("PATCH /tasks/:id/complete", "PATCH", f"/tasks/{task_id}/complete", token)
+    await client.call("DELETE /tasks/:id", "DELETE", f"/tasks/{task_id}", token)
+
+
+async def scenario_delegation(client, user):
+    """test_delegation.py : le délégué lit et modifie les tâches d'un owner"""
+    if not user["owners"]:
+        return await scenario_tasks(client, user)
+    token = user["token"]
+    owner = random.choice(user["owners"])
+    await client.call("GET /delegations", "GET", "/delegations", token)
+    await client.call("GET /tasks?ownerId", "GET", f"/tasks?ownerId={owner['id']}&limit=50", token)
+    await client.call("GET /delegations/:ownerId/categories", "GET", f"/delegations/{owner['id']}/categories", token)
+    data = await client.call("POST /tasks (délégué)", "POST", "/tasks", token, json={
+        "title": "Tâche créée par le délégué",
+        "ownerId": owner["id"],
+    })
+    if data:
+        await client.call("PUT /tasks/:id (délégué)", "PUT", f"/tasks/{data['task']['id']}", token, json={
+            "title": "Tâche modifiée par le délégué",
+        })
+
+
+async def scenario_activity_log(client, user):
+    """test_activity_log.py : écritures du délégué puis lecture du journal des deux côtés"""
+    if not user["owners"]:
+        return await client.call("GET /activity", "GET", "/activity?limit=50", user["token"])
+    token = user["token"]
+    owner = random.choice(user["owners"])
+    data = await client.call("POST /tasks (délégué)", "POST", "/tasks", token, json={
+        "title": "Tâche journalisée",
+        "ownerId": owner["id"],
+    })
+    if data:
+        await client.call("DELETE /tasks/:id (délégué)", "DELETE", f"/tasks/{data['task']['id']}", token)
+    await client.call("GET /activity?ownerId", "GET", f"/activity?ownerId={owner['id']}&limit=50", token)
+    await client.call("GET /activity", "GET", "/activity?limit=50", owner["token"])
+
+
+async def scenario_default_context(client, user):
+    """test_default_context.py : bascule du contexte par défaut puis relecture du profil"""
+    token = user["token"]
+    context = random.choice(user["owners"])["id"] if user["owners"] else "self"
+    await client.call("PATCH /auth/default-context", "PATCH", "/auth/default-context", token, json={"defaultContext": context})
+    await client.call("GET /auth/me", "GET", "/auth/me", token)
+    await client.call("PATCH /auth/default-context", "PATCH", "/auth/default-context", token, json={"defaultContext": "self"})
+
+
+SCENARIOS = {
+    "tasks": scenario_tasks,
+    "delegation": scenario_delegation,
+    "activity_log": scenario_activity_log,
+    "default_context": scenario_default_context,
+}
+
+
+async def run_load(client, users, scenarios, args):
+    """`concurrency` utilisateurs virtuels enchaînent les scénarios jusqu'à la fin de la durée"""
+    deadline = time.perf_counter() + args.duration
+    iterations = {name: 0 for name in scenarios}
+
+    async def virtual_user(index):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            name = rng.choice(scenarios)
+            await SCENARIOS[name](client, rng.choice(users))
+            iterations[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(args.concurrency)))
+    return time.perf_counter() - start, iterations
+
+
+# === Rapport ===
+
+def print_table(title, endpoints):
+    print(f"\n{title}")
+    print(f"  {'Endpoint':<40} {'n':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, s in endpoints.items():
+        print(f"  {name:<40} {s['count']:>7} {s['errors']:>5} {s['throughput']:>8} "
+              f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}")
+
+
+def compare(previous, current, threshold):
+    """Compare p95 et débit par endpoint ; retourne le nombre de régressions"""
+    regressions = 0
+    print(f"\nComparaison avec {previous['startedAt']} (seuil {threshold:.0%})")
+    if previous["config"] != current["config"]:
+        print("  Attention : configurations différentes, comparaison indicative")
+    for name, cur in current["load"]["endpoints"].items():
+        prev = previous["load"]["endpoints"].get(name)
+        if not prev:
+            print(f"  {name:<40} nouveau")
+            continue
+        p95_delta = (cur["p95_ms"] - prev["p95_ms"]) / prev["p95_ms"] if prev["p95_ms"] else 0
+        rps_delta = (cur["throughput"] - prev["throughput"]) / prev["throughput"] if prev["throughput"] else 0
+        flag = ""
+        if p95_delta > threshold or rps_delta < -threshold:
+            flag = "  <-- régression"
+            regressions += 1
+        print(f"  {name:<40} p95 {prev['p95_ms']:>8} -> {cur['p95_ms']:>8} ({p95_delta:+.0%})  "
+              f"req/s {prev['throughput']:>8} -> {cur['throughput']:>8} ({rps_delta:+.0%}){flag}")
+    return regressions
+
+
+async def main(args):
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Scénarios inconnus : {', '.join(unknown)} (disponibles : {', '.join(SCENARIOS)})")
+
+    prefix = f"bench_{uuid.uuid4().hex[:6]}"
+    started_at = datetime.now(timezone.utc).isoformat()
+    connector = aiohttp.TCPConnector(limit=args.connections or args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        seed_recorder = Recorder()
+        print(f"=== Préparation : {args.users} utilisateurs, {args.tasks_per_user} tâches chacun, "
+              f"{args.delegations_per_user} délégation(s) par utilisateur ({prefix}) ===")
+        seed_start = time.perf_counter()
+        users = await seed(Client(args.base_url, session, seed_recorder), args, prefix)
+        seed_duration = time.perf_counter() - seed_start
+        seed_endpoints = seed_recorder.summary(seed_duration)
+        print_table(f"Préparation ({seed_duration:.1f} s)", seed_endpoints)
+
+        load_recorder = Recorder()
+        print(f"\n=== Charge : {args.concurrency} utilisateurs virtuels pendant {args.duration} s, "
+              f"scénarios {', '.join(scenarios)} ===")
+        duration, iterations = await run_load(Client(args.base_url, session, load_recorder), users, scenarios, args)
+        load_endpoints = load_recorder.summary(duration)
+        print_table(f"Charge ({duration:.1f} s, {sum(iterations.values())} itérations)", load_endpoints)
+
+    total = sum(s["count"] for s in load_endpoints.values())
+    errors = sum(s["errors"] for s in load_endpoints.values())
+    print(f"\n  Total : {total} requêtes, {errors} erreurs, {total / duration:.1f} req/s")
+
+    result = {
+        "startedAt": started_at,
+        "baseUrl": args.base_url,
+        "config": {
+            "users": args.users,
+            "tasksPerUser": args.tasks_per_user,
+            "delegationsPerUser": args.delegations_per_user,
+            "concurrency": args.concurrency,
+            "connections": args.connections or args.concurrency,
+            "duration": args.duration,
+            "scenarios": scenarios,
+        },
+        "seed": {"durationS": round(seed_duration, 3), "endpoints": seed_endpoints},
+        "load": {
+            "durationS": round(duration, 3),
+            "iterations": iterations,
+            "requests": total,
+            "errors": errors,
+            "throughput": round(total / duration, 2),
+            "endpoints": load_endpoints,
+        },
+    }
+
+    output = args.output or os.path.join("benchmark-results", f"{started_at[:19].replace(':', '-')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"  Résultats enregistrés dans {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        if compare(previous, result, args.threshold) > 0:
+            return 1
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Banc de charge de l'API Task Manager")
+    parser.add_argument("--base-url", default=os.environ.get("BASE_URL", "http://localhost:3000/api/v1"))
+    parser.add_argument("--users", type=int, default=20, help="utilisateurs créés (défaut 20)")
+    parser.add_argument("--tasks-per-user", type=int, default=50, help="tâches créées par utilisateur (défaut 50)")
+    parser.add_argument("--delegations-per-user", type=int, default=2, help="délégations accordées par utilisateur (défaut 2)")
+    parser.add_argument("--concurrency", type=int, default=16, help="utilisateurs virtuels simultanés (défaut 16)")
+    parser.add_argument("--connections", type=int, default=0, help="taille du pool HTTP (défaut : --concurrency)")
+    parser.add_argument("--duration", type=float, default=30, help="durée de la phase de charge en secondes (défaut 30)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"parmi {', '.join(SCENARIOS)}")
+    parser.add_argument("--timeout", type=float, default=30, help="timeout par requête en secondes")
+    parser.add_argument("--output", help="fichier JSON de résultats (défaut benchmark-results/<date>.json)")
+    parser.add_argument("--compare", help="résultats d'une exécution précédente à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression signalée au-delà de cet écart (défaut 0.10)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
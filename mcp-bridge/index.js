@@ -5,10 +5,27 @@
  */
 
 const readline = require('readline');
+const http = require('http');
+const https = require('https');
 
 const API_URL = process.env.MCP_API_URL || 'http://localhost:3000';
 const AUTH_TOKEN = process.env.MCP_AUTH_TOKEN;
 
+// Connexions keep-alive réutilisées entre les appels
+const MAX_SOCKETS = parseInt(process.env.MCP_BRIDGE_MAX_SOCKETS || '8', 10);
+const REQUEST_TIMEOUT_MS = parseInt(process.env.MCP_BRIDGE_TIMEOUT_MS || '30000', 10);
+
+// Requêtes JSON-RPC traitées en parallèle (les réponses portent leur id)
+const MAX_CONCURRENCY = parseInt(process.env.MCP_BRIDGE_MAX_CONCURRENCY || '8', 10);
+
+// Cache des outils en lecture seule (ms, 0 = désactivé)
+const CACHE_TTL_MS = parseInt(process.env.MCP_BRIDGE_CACHE_TTL_MS || '5000', 10);
+const CATEGORIES_CACHE_TTL_MS = parseInt(process.env.MCP_BRIDGE_CATEGORIES_CACHE_TTL_MS || '60000', 10);
+const CACHE_MAX_ENTRIES = 200;
+
+// Latence de chaque appel sur stderr (stdout est réservé au protocole)
+const LOG_LATENCY = process.env.MCP_BRIDGE_LOG_LATENCY !== 'false';
+
 if (!AUTH_TOKEN) {
   console.error(JSON.stringify({
     jsonrpc: '2.0',
@@ -29,7 +46,26 @@ const tools = [
         status: { type: 'string', enum: ['active', 'completed', 'all'], description: 'Filtre par statut' },
         categoryId: { type: 'string', description: 'Filtre par catégorie (UUID)' },
         importance: { type: 'string', enum: ['low', 'normal', 'high'], description: 'Filtre par importance' },
-        limit: { type: 'number', description: 'Nombre max de résultats (défaut: 50)' }
+        limit: { type: 'number', description: 'Nombre max de résultats (défaut: 50)' },
+        since: { type: 'string', description: 'Synchronisation incrémentale : "0" puis le nextSince renvoyé (tâches modifiées et IDs supprimés)' },
+        fields: { type: 'array', items: { type: 'string' }, description: 'Champs à renvoyer (ex: title, status, dueDate, category ; id toujours inclus)' },
+        compact: { type: 'boolean', description: 'Catégories listées une seule fois dans "categories", chaque tâche ne portant que categoryId' }
+      }
+    }
+  },
+  {
+    name: 'tasks_delegated',
+    description: 'Liste en une fois les tâches de tous les utilisateurs qui vous ont délégué leurs tâches, avec leur propriétaire',
+    inputSchema: {
+      type: 'object',
+      properties: {
+        ownerIds: { type: 'array', items: { type: 'string' }, description: 'Limiter à ces propriétaires (UUID)' },
+        status: { type: 'string', enum: ['active', 'completed', 'all'], description: 'Filtre par statut' },
+        importance: { type: 'string', enum: ['low', 'normal', 'high'], description: 'Filtre par importance' },
+        limit: { type: 'number', description: 'Nombre max de résultats (défaut: 50)' },
+        cursor: { type: 'string', description: 'Curseur de pagination (nextCursor renvoyé)' },
+        fields: { type: 'array', items: { type: 'string' }, description: 'Champs à renvoyer (ex: title, status, dueDate, ownerId ; id toujours inclus)' },
+        compact: { type: 'boolean', description: 'Catégories listées une seule fois dans "categories", chaque tâche ne portant que categoryId' }
       }
     }
   },
@@ -110,6 +146,37 @@ const tools = [
       required: ['taskId']
     }
   },
+  {
+    name: 'tasks_batch',
+    description: 'Applique plusieurs opérations (create, update, complete, reopen, delete) en une seule transaction',
+    inputSchema: {
+      type: 'object',
+      properties: {
+        operations: {
+          type: 'array',
+          description: 'Opérations : { op, taskId, title, description, importance, categoryId, dueDate, dueTime }',
+          items: {
+            type: 'object',
+            properties: {
+              op: { type: 'string', enum: ['create', 'update', 'complete', 'reopen', 'delete'], description: 'Type d\'opération' },
+              taskId: { type: 'string', description: 'ID de la tâche (UUID, sauf pour create)' }
+            },
+            required: ['op']
+          }
+        },
+        atomic: { type: 'boolean', description: 'N\'appliquer aucune opération si l\'une est invalide' }
+      },
+      required: ['operations']
+    }
+  },
+  {
+    name: 'tasks_stats',
+    description: 'Statistiques des tâches (total, actives, terminées, priorité haute, en retard)',
+    inputSchema: {
+      type: 'object',
+      properties: {}
+    }
+  },
   {
     name: 'categories_list',
     description: 'Liste toutes les catégories de l\'utilisateur',
@@ -132,33 +199,146 @@ const tools = [
   }
 ];
 
+const client = new URL(API_URL).protocol === 'https:' ? https : http;
+const agent = new client.Agent({ keepAlive: true, maxSockets: MAX_SOCKETS });
+
 // Fonction pour appeler l'API TaskManager
-async function callApi(method, path, body = null) {
-  const url = `${API_URL}${path}`;
-  const options = {
-    method,
-    headers: {
-      'Authorization': `Bearer ${AUTH_TOKEN}`,
-      'Content-Type': 'application/json'
-    }
+function callApi(method, path, body = null) {
+  const payload = body ? JSON.stringify(body) : null;
+  const headers = {
+    'Authorization': `Bearer ${AUTH_TOKEN}`,
+    'Accept': 'application/json'
   };
 
-  if (body) {
-    options.body = JSON.stringify(body);
+  if (payload) {
+    headers['Content-Type'] = 'application/json';
+    headers['Content-Length'] = Buffer.byteLength(payload);
   }
 
-  try {
-    const response = await fetch(url, options);
-    const data = await response.json();
+  return new Promise((resolve) => {
+    const req = client.request(new URL(`${API_URL}${path}`), {
+      method,
+      headers,
+      agent,
+      timeout: REQUEST_TIMEOUT_MS
+    }, (res) => {
+      const chunks = [];
+      res.on('data', (chunk) => chunks.push(chunk));
+      res.on('end', () => {
+        const text = Buffer.concat(chunks).toString('utf8');
+        let data = {};
+
+        try {
+          if (text) data = JSON.parse(text);
+        } catch (error) {
+          resolve({ error: 'Réponse invalide de l\'API', status: res.statusCode });
+          return;
+        }
+
+        if (res.statusCode >= 400) {
+          resolve({ error: data.error || 'Erreur API', status: res.statusCode });
+          return;
+        }
+
+        resolve(data);
+      });
+      res.on('error', (error) => resolve({ error: error.message }));
+    });
+
+    req.on('timeout', () => req.destroy(new Error('Délai de réponse dépassé')));
+    req.on('error', (error) => resolve({ error: error.message }));
+
+    if (payload) req.write(payload);
+    req.end();
+  });
+}
+
+// Outils en lecture seule mis en cache, et durée de vie des entrées
+const CACHED_TOOLS = {
+  tasks_list: CACHE_TTL_MS,
+  tasks_delegated: CACHE_TTL_MS,
+  tasks_get: CACHE_TTL_MS,
+  tasks_stats: CACHE_TTL_MS,
+  categories_list: CATEGORIES_CACHE_TTL_MS
+};
+
+// Outils en écriture -> outils en lecture dont le cache devient obsolète
+const INVALIDATES = {
+  tasks_create: ['tasks_'],
+  tasks_update: ['tasks_'],
+  tasks_complete: ['tasks_'],
+  tasks_reopen: ['tasks_'],
+  tasks_delete: ['tasks_'],
+  tasks_batch: ['tasks_'],
+  categories_create: ['categories_', 'tasks_']
+};
+
+// "outil:arguments" -> { value, expiresAt }
+const cache = new Map();
 
-    if (!response.ok) {
-      return { error: data.error || 'Erreur API', status: response.status };
+// Incrémenté à chaque écriture : une lecture commencée avant n'est pas mise en cache
+let cacheGeneration = 0;
+
+function cacheKey(name, args) {
+  return `${name}:${JSON.stringify(args)}`;
+}
+
+function invalidateCache(prefixes) {
+  cacheGeneration++;
+  for (const key of [...cache.keys()]) {
+    if (prefixes.some((prefix) => key.startsWith(prefix))) {
+      cache.delete(key);
     }
+  }
+}
 
-    return data;
-  } catch (error) {
-    return { error: error.message };
+// Exécute un outil en passant par le cache si possible ; retourne { result, cached }
+async function executeToolCached(name, args) {
+  const ttl = CACHED_TOOLS[name];
+  const prefixes = INVALIDATES[name];
+
+  if (prefixes) {
+    invalidateCache(prefixes);
+    const result = await executeTool(name, args);
+    invalidateCache(prefixes);
+    return { result, cached: false };
+  }
+
+  if (!ttl || ttl <= 0) {
+    return { result: await executeTool(name, args), cached: false };
+  }
+
+  const key = cacheKey(name, args);
+  const entry = cache.get(key);
+  if (entry && entry.expiresAt > Date.now()) {
+    return { result: entry.value, cached: true };
+  }
+
+  const generation = cacheGeneration;
+  const result = await executeTool(name, args);
+
+  // Les erreurs ne sont pas mises en cache
+  if (!result.error && generation === cacheGeneration) {
+    cache.delete(key);
+    cache.set(key, { value: result, expiresAt: Date.now() + ttl });
+    if (cache.size > CACHE_MAX_ENTRIES) {
+      cache.delete(cache.keys().next().value);
+    }
   }
+
+  return { result, cached: false };
+}
+
+function logLatency(label, startedAt, detail) {
+  if (!LOG_LATENCY) return;
+  const ms = Number(process.hrtime.bigint() - startedAt) / 1e6;
+  console.error(`[mcp-bridge] ${label} ${ms.toFixed(1)}ms${detail ? ` (${detail})` : ''}`);
+}
+
+// Projection des listes : ?fields=a,b et ?compact=true
+function appendProjection(params, args) {
+  if (Array.isArray(args.fields) && args.fields.length > 0) params.append('fields', args.fields.join(','));
+  if (args.compact === true) params.append('compact', 'true');
 }
 
 // Exécuter un outil
@@ -170,10 +350,24 @@ async function executeTool(name, args) {
       if (args.categoryId) params.append('categoryId', args.categoryId);
       if (args.importance) params.append('importance', args.importance);
       if (args.limit) params.append('limit', args.limit);
+      if (args.since !== undefined) params.append('since', args.since);
+      appendProjection(params, args);
       const query = params.toString();
       return await callApi('GET', `/api/v1/tasks${query ? '?' + query : ''}`);
     }
 
+    case 'tasks_delegated': {
+      const params = new URLSearchParams();
+      if (Array.isArray(args.ownerIds) && args.ownerIds.length > 0) params.append('ownerIds', args.ownerIds.join(','));
+      if (args.status && args.status !== 'all') params.append('status', args.status);
+      if (args.importance) params.append('importance', args.importance);
+      if (args.limit) params.append('limit', args.limit);
+      if (args.cursor) params.append('cursor', args.cursor);
+      appendProjection(params, args);
+      const query = params.toString();
+      return await callApi('GET', `/api/v1/tasks/delegated${query ? '?' + query : ''}`);
+    }
+
     case 'tasks_get':
       return await callApi('GET', `/api/v1/tasks/${args.taskId}`);
 
@@ -194,6 +388,12 @@ async function executeTool(name, args) {
     case 'tasks_delete':
       return await callApi('DELETE', `/api/v1/tasks/${args.taskId}`);
 
+    case 'tasks_batch':
+      return await callApi('POST', '/api/v1/tasks/batch', args);
+
+    case 'tasks_stats':
+      return await callApi('GET', '/api/v1/tasks/stats');
+
     case 'categories_list':
       return await callApi('GET', '/api/v1/categories');
 
@@ -238,7 +438,9 @@ async function handleRequest(request) {
 
     case 'tools/call': {
       const { name, arguments: args } = params;
-      const result = await executeTool(name, args || {});
+      const startedAt = process.hrtime.bigint();
+      const { result, cached } = await executeToolCached(name, args || {});
+      logLatency(`tools/call ${name}`, startedAt, cached ? 'cache' : result.error ? `erreur${result.status ? ' ' + result.status : ''}` : null);
 
       return {
         jsonrpc: '2.0',
@@ -270,7 +472,8 @@ const rl = readline.createInterface({
   terminal: false
 });
 
-rl.on('line', async (line) => {
+// Traite une ligne et écrit la réponse éventuelle
+async function processLine(line) {
   try {
     const request = JSON.parse(line);
     const response = await handleRequest(request);
@@ -285,6 +488,37 @@ rl.on('line', async (line) => {
       id: null
     }));
   }
+}
+
+// Requêtes en attente et en cours : jusqu'à MAX_CONCURRENCY traitées en même temps
+const pending = [];
+let active = 0;
+let inputClosed = false;
+
+function drain() {
+  while (active < MAX_CONCURRENCY && pending.length > 0) {
+    active++;
+    processLine(pending.shift()).finally(() => {
+      active--;
+      drain();
+    });
+  }
+
+  // Entrée fermée et tout est traité : libérer les connexions keep-alive
+  if (inputClosed && active === 0 && pending.length === 0) {
+    agent.destroy();
+  }
+}
+
+rl.on('line', (line) => {
+  if (!line.trim()) return;
+  pending.push(line);
+  drain();
+});
+
+rl.on('close', () => {
+  inputClosed = true;
+  drain();
 });
 
 // Gérer la fermeture propre